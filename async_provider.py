@@ -0,0 +1,310 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import quote
+
+import pandas as pd
+
+from data_providers import MarketDataProvider, OptionChain, latest_bars_frame, period_start
+from instrumentation import count
+
+YAHOO_BASE_URL = 'https://query2.finance.yahoo.com'
+YAHOO_COOKIE_URL = 'https://fc.yahoo.com'
+QUOTE_SUMMARY_MODULES = ('financialData', 'defaultKeyStatistics', 'summaryDetail')
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/124.0 Safari/537.36')
+
+class UpstreamError(Exception):
+    """The upstream answered with an error, or could not be reached, after every retry."""
+
+class RateLimitedError(UpstreamError):
+    """The upstream kept answering 429 Too Many Requests after every retry."""
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter shared by every request of a client.
+
+    :param rate: Tokens added per second, i.e. the sustained request rate.
+    :param capacity: Largest burst allowed after an idle period.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds`, e.g. after the upstream asked us to back off."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class AsyncYahooClient:
+    """
+    asyncio client for Yahoo Finance's chart, options and quoteSummary JSON endpoints.
+
+    All requests share one pooled aiohttp session and one token bucket. Responses of 429,
+    5xx, timeouts and connection errors are retried with full-jitter exponential backoff
+    (honouring Retry-After); a 429 also pauses the bucket so the other in-flight requests
+    back off too. Failures surface as UpstreamError / RateLimitedError rather than empty data.
+
+    :param base_url: Root of the JSON API; point it at upstream_server for offline runs.
+    :param cookie_url: Page visited once to obtain the session cookie for the crumb, or None.
+    :param rate: Sustained requests per second.
+    :param burst: Requests allowed back to back after an idle period.
+    :param max_connections: Size of the keep-alive connection pool.
+    :param timeout: Seconds allowed per request attempt.
+    :param max_retries: Retries after the first attempt before giving up.
+    :param backoff_base: Backoff ceiling of the first retry, doubled on each further retry.
+    :param backoff_cap: Largest backoff ceiling, in seconds.
+    """
+
+    def __init__(self, base_url=YAHOO_BASE_URL, cookie_url=YAHOO_COOKIE_URL, rate=5.0, burst=10,
+                 max_connections=16, timeout=10.0, max_retries=5, backoff_base=0.5, backoff_cap=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.cookie_url = cookie_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter = TokenBucket(rate, burst)
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'timeouts': 0}
+        self._session = None
+        self._crumb = None
+        self._crumb_lock = None
+
+    async def session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': USER_AGENT},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def _request(self, path, params=None, as_text=False):
+        import aiohttp
+        session = await self.session()
+        url = path if path.startswith('http') else self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.stats['requests'] += 1
+            retry_after = None
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        return await (response.text() if as_text else response.json(content_type=None))
+                    reason = response.status
+                    if response.status == 429:
+                        self.stats['throttled'] += 1
+                        retry_after = _retry_after(response.headers.get('Retry-After'))
+                    elif response.status == 401 and self._crumb is not None:
+                        self._crumb = None  # Expired crumb; fetch a new one on the next attempt
+                        params = dict(params or {}, crumb=await self.crumb())
+                    elif response.status < 500:
+                        raise UpstreamError(f"{url} answered {response.status}")
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                reason = 'timeout'
+            except aiohttp.ClientError as e:
+                reason = type(e).__name__
+
+            if attempt == self.max_retries:
+                break
+            self.stats['retries'] += 1
+            count('upstream_retries', reason=reason)
+            delay = self._backoff(attempt, retry_after)
+            if reason == 429:
+                # Hold back every other request too, not just this one
+                self.limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+        if reason == 429:
+            raise RateLimitedError(f"Rate limited by upstream after {self.max_retries} retries: {url}")
+        raise UpstreamError(f"{url} failed after {self.max_retries} retries ({reason})")
+
+    async def crumb(self):
+        """The anti-CSRF crumb quoteSummary and options require, fetched once per session."""
+        if self._crumb_lock is None:
+            self._crumb_lock = asyncio.Lock()
+        async with self._crumb_lock:
+            if self._crumb is None:
+                if self.cookie_url:
+                    session = await self.session()
+                    try:
+                        async with session.get(self.cookie_url, allow_redirects=True):
+                            pass  # Only the cookie it sets matters
+                    except Exception:
+                        pass
+                self._crumb = (await self._request('/v1/test/getcrumb', as_text=True)).strip()
+        return self._crumb
+
+    async def history(self, ticker, period="1y", interval="1d", start=None):
+        start = pd.Timestamp(start) if start is not None else period_start(period)
+        payload = await self._request(f"/v8/finance/chart/{quote(ticker)}", params={
+            'period1': str(int(start.timestamp())),
+            'period2': str(int(time.time())),
+            'interval': interval,
+        })
+        result = _chart_result(payload, ticker)
+        timestamps = result.get('timestamp') or []
+        quotes = result['indicators']['quote'][0] if timestamps else {}
+        index = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(
+            result.get('meta', {}).get('exchangeTimezoneName', 'America/New_York'))
+        intraday = _is_intraday(interval)
+        if not intraday:
+            index = index.normalize()
+        hist = pd.DataFrame({column.capitalize(): pd.array(quotes.get(column, []), dtype='Float64').astype(float)
+                             for column in ('open', 'high', 'low', 'close', 'volume')},
+                            index=pd.DatetimeIndex(index, name='Datetime' if intraday else 'Date'))
+        hist = hist.dropna(subset=['Close'])
+        # The current bar can appear twice (last bar and live quote); keep the latest
+        return hist[~hist.index.duplicated(keep='last')]
+
+    async def info(self, ticker):
+        payload = await self._request(f"/v10/finance/quoteSummary/{quote(ticker)}", params={
+            'modules': ','.join(QUOTE_SUMMARY_MODULES), 'crumb': await self.crumb()})
+        results = (payload.get('quoteSummary') or {}).get('result') or []
+        if not results:
+            raise UpstreamError(f"No quoteSummary for {ticker}")
+        info = {}
+        for module in results[0].values():
+            if isinstance(module, dict):
+                # Values come as {"raw": 1.5, "fmt": "1.50"}; flatten them like yfinance's .info
+                info.update({key: value.get('raw') if isinstance(value, dict) else value
+                             for key, value in module.items() if not isinstance(value, dict) or 'raw' in value})
+        return info
+
+    async def _options_result(self, ticker, expiration=None):
+        params = {'crumb': await self.crumb()}
+        if expiration is not None:
+            params['date'] = str(int(pd.Timestamp(expiration, tz='UTC').timestamp()))
+        payload = await self._request(f"/v7/finance/options/{quote(ticker)}", params=params)
+        results = (payload.get('optionChain') or {}).get('result') or []
+        if not results:
+            raise UpstreamError(f"No option chain for {ticker}")
+        return results[0]
+
+    async def options(self, ticker):
+        result = await self._options_result(ticker)
+        return [pd.Timestamp(epoch, unit='s').strftime('%Y-%m-%d') for epoch in result.get('expirationDates', [])]
+
+    async def option_chain(self, ticker, expiration):
+        result = await self._options_result(ticker, expiration)
+        chains = (result.get('options') or [{}])[0]
+        return OptionChain(calls=_contracts_frame(chains.get('calls', [])),
+                           puts=_contracts_frame(chains.get('puts', [])),
+                           underlying=result.get('quote', {}))
+
+def _is_intraday(interval):
+    """Minute and hour intervals ('5m', '1h'); days, weeks and months are stamped with the session date."""
+    return interval.endswith(('m', 'h'))
+
+class AsyncProvider(MarketDataProvider):
+    """
+    Blocking MarketDataProvider facade over AsyncYahooClient.
+
+    The client runs on one event loop in a background thread, so the existing thread-pool
+    callers (bar store, option chain scans) share its session, rate limit and retries.
+    Coroutine callers can use `client` directly, or `gather_histories` for a whole universe.
+    """
+
+    def __init__(self, client=None, **client_options):
+        self.client = client or AsyncYahooClient(**client_options)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='async-provider', daemon=True).start()
+        return self._loop
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._event_loop()).result()
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        return self.run(self.client.history(ticker, period=period, interval=interval, start=start))
+
+    def info(self, ticker):
+        return self.run(self.client.info(ticker))
+
+    def options(self, ticker):
+        return self.run(self.client.options(ticker))
+
+    def option_chain(self, ticker, expiration):
+        return self.run(self.client.option_chain(ticker, expiration))
+
+    def latest_bars(self, tickers):
+        histories = self.gather_histories(tickers, period="5d")
+        return latest_bars_frame({ticker: dict(hist.iloc[-1], Date=hist.index[-1]) for ticker, hist in histories.items()
+                              if isinstance(hist, pd.DataFrame) and not hist.empty})
+
+    def gather_histories(self, tickers, period="1y", start=None):
+        """Fetch many histories concurrently; returns {ticker: DataFrame or the exception raised}."""
+        async def fetch_all():
+            results = await asyncio.gather(*(self.client.history(ticker, period=period, start=start) for ticker in tickers),
+                                           return_exceptions=True)
+            return dict(zip(tickers, results))
+        return self.run(fetch_all())
+
+    def close(self):
+        if self._loop is not None:
+            self.run(self.client.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+def _retry_after(value):
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _chart_result(payload, ticker):
+    chart = payload.get('chart') or {}
+    if chart.get('error'):
+        raise UpstreamError(f"{ticker}: {chart['error'].get('description', chart['error'])}")
+    results = chart.get('result') or []
+    if not results:
+        raise UpstreamError(f"No chart data for {ticker}")
+    return results[0]
+
+def _contracts_frame(contracts):
+    frame = pd.DataFrame(contracts)
+    for column in ('contractSymbol', 'strike', 'lastPrice', 'bid', 'ask', 'volume', 'openInterest', 'impliedVolatility'):
+        if column not in frame:
+            frame[column] = pd.Series(dtype=float)
+    return frame
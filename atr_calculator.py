@@ -1,30 +1,42 @@
-import yfinance as yf
-from diskcache import Cache
-from market_time_utils import get_next_friday_market_close
-import datetime
+from bar_aggregation import INTRADAY_TTL, TIMEFRAMES, get_bars
+from cache_utils import cache
+from instrumentation import traced
 
-cache = Cache('./cache')
+# History each timeframe needs for 14 bars of ATR
+ATR_PERIODS = {'1d': '3mo', '1wk': '6mo', '1mo': '2y'}
 
-def calculate_14_day_ATR(ticker):
-    cache_key = f"{ticker}_14_day_ATR"
-    if cache_key in cache:
+@traced('compute')
+def calculate_ATR_series(data, window=14):
+    data['High-Low'] = data['High'] - data['Low']
+    data['High-PrevClose'] = abs(data['High'] - data['Close'].shift(1))
+    data['Low-PrevClose'] = abs(data['Low'] - data['Close'].shift(1))
+    data['TR'] = data[['High-Low', 'High-PrevClose', 'Low-PrevClose']].max(axis=1)
+    data['ATR'] = data['TR'].rolling(window=window).mean()
+    return data['ATR']
+
+@traced('compute')
+def calculate_14_day_ATR(ticker, timeframe='1d'):
+    """
+    The 14-bar ATR of a ticker, on daily bars by default.
+
+    :param timeframe: Any bar_aggregation timeframe, e.g. '1wk' or '1h'; the bars are rolled
+                      up from the stored daily (or shared 5m) bars, not downloaded again.
+    """
+    cache_key = ticker if timeframe == '1d' else f"{ticker}_{timeframe}"
+    cached_atr = cache.get('atr', cache_key)
+    if cached_atr is not None:
         print(f"Using cached ATR for {ticker}.")
-        return cache[cache_key]
+        return cached_atr
     
     print(f"Calculating ATR for {ticker}.")
-    data = yf.download(ticker, period="3mo")
-    if data.empty:
+    data, error = get_bars(ticker, timeframe, period=ATR_PERIODS.get(timeframe, "3mo"))
+    if data is None:
         print(f"Failed to fetch data for {ticker}.")
         return None
 
-    data['High-Low'] = data['High'] - data['Low']
-    data['High-PrevClose'] = abs(data['High'] - data['Close'].shift(1))
-    data['Low-PrevClose'] = abs(data['Low'] - data['Close'].shift(1))
-    data['TR'] = data[['High-Low', 'High-PrevClose', 'Low-PrevClose']].max(axis=1)
-    data['ATR'] = data['TR'].rolling(window=14).mean()
-
-    atr_value = data['ATR'].iloc[-1]
-    expiration_time = get_next_friday_market_close()
-    cache.set(cache_key, atr_value, expire=(expiration_time - datetime.datetime.now().timestamp()))
+    atr_value = calculate_ATR_series(data.copy()).iloc[-1]
+    # Intraday bars keep printing during the session
+    expire = INTRADAY_TTL if isinstance(TIMEFRAMES.get(timeframe), int) else 'week' if timeframe == '1d' else 'session'
+    cache.set('atr', cache_key, atr_value, expire=expire)
 
     return atr_value
@@ -0,0 +1,197 @@
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_histories
+from indicator_engine import bollinger_bands, build_matrix, relative_strength_index
+from stock_data_utils import load_universe
+
+TRADING_DAYS = 252
+
+BacktestResult = namedtuple('BacktestResult', ['returns', 'positions', 'trades', 'tickers', 'portfolio'])
+
+def mean_reversion_positions(close):
+    """
+    Long-only positions for the mean_reversion.py rule.
+
+    Enter when Close < BB_low and the Wilder RSI < 30 (population-std bands, like ta), and
+    exit when Close recovers to the moving average.
+
+    :param close: A (dates x tickers) close matrix.
+    :return: A matrix of target positions (1 long, 0 flat) decided at each close.
+    """
+    bands = bollinger_bands(close, window=20, no_of_stds=2, ddof=0)
+    rsi = relative_strength_index(close, window=14, method='wilder')
+    return _positions(close, long_entries=(close < bands['lower_band']) & (rsi < 30),
+                      long_exits=close >= bands['ma'])
+
+def extreme_level_positions(close):
+    """
+    Long/short positions for the filter_extreme_stocks rule.
+
+    Buy when Close <= lower band and RSI <= 30, short when Close >= upper band and RSI >= 70,
+    and close either position when Close crosses back over the moving average.
+
+    :param close: A (dates x tickers) close matrix.
+    :return: A matrix of target positions (1 long, -1 short, 0 flat) decided at each close.
+    """
+    bands = bollinger_bands(close)
+    rsi = relative_strength_index(close)
+    return _positions(close,
+                      long_entries=(close <= bands['lower_band']) & (rsi <= 30),
+                      long_exits=close >= bands['ma'],
+                      short_entries=(close >= bands['upper_band']) & (rsi >= 70),
+                      short_exits=close <= bands['ma'])
+
+STRATEGIES = {'mean_reversion': mean_reversion_positions, 'extreme_levels': extreme_level_positions}
+
+def _side_state(entries, exits, side, close):
+    # Mark only the days the state changes and carry it forward: a state machine without a loop
+    events = np.full(close.shape, np.nan)
+    events[np.asarray(exits, dtype=bool)] = 0.0
+    events[np.asarray(entries, dtype=bool)] = side
+    return pd.DataFrame(events, index=close.index, columns=close.columns).ffill().fillna(0.0)
+
+def _positions(close, long_entries, long_exits, short_entries=None, short_exits=None):
+    positions = _side_state(long_entries, long_exits, 1.0, close)
+    if short_entries is not None:
+        # Long and short exits sit on opposite sides of the moving average, so the two
+        # sides are never open on the same day and can simply be added
+        positions += _side_state(short_entries, short_exits, -1.0, close)
+    return positions
+
+def run_backtest(close, positions, cost=0.0005):
+    """
+    Simulate target positions against a close matrix, across every ticker at once.
+
+    A position decided at day t's close is held from t to t+1, so signals never use the bar
+    they trade on. Each unit of position change pays `cost` as a fraction of the price.
+
+    :param close: A (dates x tickers) close matrix.
+    :param positions: Target positions aligned with `close`.
+    :param cost: One-way transaction cost per unit traded.
+    :return: A BacktestResult of daily strategy returns, held positions, the trade list,
+             per-ticker statistics and portfolio statistics.
+    """
+    values = close.to_numpy(dtype=float)
+    asset_returns = np.zeros_like(values)
+    asset_returns[1:] = values[1:] / values[:-1] - 1
+    asset_returns = np.nan_to_num(asset_returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    held = np.zeros_like(values)
+    held[1:] = positions.to_numpy(dtype=float)[:-1]
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    strategy = held * asset_returns - turnover * cost
+
+    returns = pd.DataFrame(strategy, index=close.index, columns=close.columns)
+    trades = _trades(held, held * asset_returns, cost, close.index, close.columns)
+    tickers = _ticker_stats(strategy, held, trades, close.columns)
+    # Equal capital in every ticker's sleeve, among tickers with data that day
+    listed = ~np.isnan(values)
+    portfolio_returns = np.where(listed, strategy, 0.0).sum(axis=1) / np.maximum(listed.sum(axis=1), 1)
+    portfolio = dict(_return_stats(portfolio_returns[:, None]).iloc[0],
+                     trades=len(trades), win_rate=float((trades['return'] > 0).mean()) if len(trades) else np.nan)
+    return BacktestResult(returns, pd.DataFrame(held, index=close.index, columns=close.columns),
+                          trades, tickers, portfolio)
+
+def _trades(held, gross, cost, dates, tickers):
+    # Run-length encode every column of held positions at once (column-major), then sum the
+    # log returns of each non-flat run with reduceat
+    periods, count = held.shape
+    flat_held = held.T.ravel()
+    flat_log = np.log1p(gross.T.ravel())
+    change = np.ones_like(flat_held, dtype=bool)
+    change[1:] = flat_held[1:] != flat_held[:-1]
+    change[::periods] = True  # Every ticker starts a new run
+    starts = np.flatnonzero(change)
+    lengths = np.diff(np.append(starts, flat_held.size))
+    side = flat_held[starts]
+    log_returns = np.add.reduceat(flat_log, starts)
+
+    in_market = side != 0
+    starts, lengths, side, log_returns = starts[in_market], lengths[in_market], side[in_market], log_returns[in_market]
+    rows = starts % periods
+    # A run still open on the last bar has not exited yet
+    exits = rows + lengths
+    open_trade = exits >= periods
+    exit_dates = pd.DatetimeIndex(np.asarray(dates)[exits - 1]).where(~open_trade)
+    return pd.DataFrame({
+        'ticker': np.asarray(tickers)[starts // periods],
+        'side': np.where(side > 0, 'long', 'short'),
+        'entry_date': np.asarray(dates)[np.maximum(rows - 1, 0)],
+        'exit_date': exit_dates,
+        'holding_days': lengths,
+        # Every trade pays the entry cost, and the exit cost once it has closed
+        'return': np.exp(log_returns) * (1 - cost) ** np.where(open_trade, 1, 2) - 1,
+        'open': open_trade,
+    })
+
+def _return_stats(daily):
+    years = max(len(daily) / TRADING_DAYS, 1 / TRADING_DAYS)
+    equity = np.cumprod(1 + daily, axis=0)
+    total = equity[-1] - 1
+    volatility = daily.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    mean = daily.mean(axis=0) * TRADING_DAYS
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'total_return': total,
+            'cagr': np.power(np.maximum(1 + total, 0.0), 1 / years) - 1,
+            'volatility': volatility,
+            'sharpe': np.where(volatility > 0, mean / volatility, np.nan),
+            'max_drawdown': drawdown.min(axis=0),
+        })
+
+def _ticker_stats(strategy, held, trades, tickers):
+    stats = _return_stats(strategy)
+    stats.index = tickers
+    stats['exposure'] = (held != 0).mean(axis=0)
+    grouped = trades.groupby('ticker')
+    stats['trades'] = grouped.size().reindex(tickers, fill_value=0)
+    stats['win_rate'] = grouped['return'].apply(lambda r: (r > 0).mean()).reindex(tickers)
+    stats['avg_trade_return'] = grouped['return'].mean().reindex(tickers)
+    stats['avg_holding_days'] = grouped['holding_days'].mean().reindex(tickers)
+    return stats
+
+def backtest_universe(strategy='mean_reversion', tickers=None, period='5y', cost=0.0005, provider=None, max_workers=8):
+    """
+    Backtest a strategy over every ticker of the screener universe in one vectorized pass.
+
+    :param strategy: A key of STRATEGIES.
+    :param tickers: Symbols to test; defaults to the screener CSV.
+    :param period: History window, e.g. '5y'.
+    :param cost: One-way transaction cost per unit traded.
+    :return: A BacktestResult.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    histories = {ticker: hist for ticker, (hist, error) in
+                 get_histories(tickers, period=period, provider=provider, max_workers=max_workers).items() if hist is not None}
+    close = build_matrix(histories, 'Close')
+    return run_backtest(close, STRATEGIES[strategy](close), cost=cost)
+
+def print_backtest(result, top=10):
+    portfolio = result.portfolio
+    print("\nPortfolio (equal weight):")
+    print(f" - Total return: {portfolio['total_return']:.2%}, CAGR: {portfolio['cagr']:.2%}")
+    print(f" - Volatility: {portfolio['volatility']:.2%}, Sharpe: {portfolio['sharpe']:.2f}, Max drawdown: {portfolio['max_drawdown']:.2%}")
+    print(f" - Trades: {portfolio['trades']}, Win rate: {portfolio['win_rate']:.2%}")
+    print(f"\nTop {top} tickers by total return:\n")
+    print(result.tickers.sort_values('total_return', ascending=False).head(top)[
+        ['total_return', 'sharpe', 'max_drawdown', 'trades', 'win_rate', 'avg_holding_days']])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the screener's rules over the universe.")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="mean_reversion")
+    parser.add_argument("--period", default="5y", help="History window, e.g. 5y.")
+    parser.add_argument("--cost", type=float, default=0.0005, help="One-way transaction cost per unit traded.")
+    parser.add_argument("tickers", nargs="*", help="Symbols to test; defaults to the screener universe.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = backtest_universe(args.strategy, tickers=args.tickers or None, period=args.period, cost=args.cost)
+    print_backtest(result)
+    print(f"\nBacktested {result.returns.shape[1]} tickers over {len(result.returns)} days in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,356 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_COLUMNS, get_history
+from cache_utils import cache
+from data_providers import get_provider, period_start
+from instrumentation import traced
+from market_time_utils import eastern, market_open_time, session_close_time
+
+# Bar length in minutes for intraday timeframes, calendar unit otherwise
+TIMEFRAMES = {'5m': 5, '15m': 15, '30m': 30, '1h': 60, '1d': 'day', '1wk': 'week', '1mo': 'month'}
+# Every intraday timeframe is rolled up from one series of these bars, kept for yfinance's 60-day limit
+INTRADAY_BASE = '5m'
+INTRADAY_PERIOD = '60d'
+INTRADAY_TTL = 300
+
+red_color_start = "\033[91m"
+blue_color_start = "\033[94m"
+color_reset = "\033[0m"
+
+def _minutes(time_of_day):
+    return time_of_day.hour * 60 + time_of_day.minute
+
+def bucket_labels(index, timeframe, regular_hours=True):
+    """
+    The label of the higher-timeframe bar each base bar belongs to.
+
+    Boundaries follow the exchange session in US/Eastern wall time, whatever the index's
+    timezone. Intraday bars are anchored at the 9:30 open, so 1h bars run 9:30-10:30 and so on,
+    with a shorter last bar before the close (1:00 pm on early-close days). Weeks are labelled
+    by their Monday and months by their first day, like yfinance's 1wk and 1mo intervals.
+    Holidays just leave a bar shorter.
+
+    :param index: DatetimeIndex of the base bars; naive timestamps are taken as Eastern time.
+    :param timeframe: One of TIMEFRAMES.
+    :param regular_hours: Mark intraday base bars outside the session (9:30 to the day's close) as out of session.
+    :return: A (labels, in_session) pair: a DatetimeIndex in the index's timezone and a boolean array.
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unsupported timeframe: {timeframe} (expected one of {', '.join(TIMEFRAMES)})")
+    index = pd.DatetimeIndex(index)
+    local = index.tz_convert(eastern).tz_localize(None) if index.tz is not None else index
+    day = local.normalize()
+    minute = np.asarray((local - day) // pd.Timedelta(minutes=1))
+    in_session = np.ones(len(index), dtype=bool)
+    if regular_hours and (minute != 0).any():
+        position, days = pd.factorize(day)
+        closes = np.array([_minutes(session_close_time(date.date())) for date in days])
+        in_session = (minute >= _minutes(market_open_time)) & (minute < closes[position])
+
+    unit = TIMEFRAMES[timeframe]
+    if unit == 'day':
+        labels = day
+    elif unit == 'week':
+        labels = day - pd.to_timedelta(day.weekday, unit='D')
+    elif unit == 'month':
+        labels = day - pd.to_timedelta(day.day - 1, unit='D')
+    else:
+        # Floor division keeps pre- and post-market bars in bins of their own
+        offset = (minute - _minutes(market_open_time)) // unit * unit + _minutes(market_open_time)
+        labels = day + pd.to_timedelta(offset, unit='m')
+    if index.tz is not None:
+        labels = labels.tz_localize(eastern).tz_convert(index.tz)
+    return labels, in_session
+
+def bucket_label(timestamp, timeframe, regular_hours=True):
+    """bucket_labels for a single bar, without the per-call overhead of an index; None when out of session."""
+    timestamp = pd.Timestamp(timestamp)
+    local = timestamp.tz_convert(eastern).tz_localize(None) if timestamp.tz is not None else timestamp
+    day = local.normalize()
+    minute = local.hour * 60 + local.minute
+    if regular_hours and minute and not _minutes(market_open_time) <= minute < _minutes(session_close_time(day.date())):
+        return None
+
+    unit = TIMEFRAMES[timeframe]
+    if unit == 'day':
+        label = day
+    elif unit == 'week':
+        label = day - pd.Timedelta(days=day.weekday())
+    elif unit == 'month':
+        label = day.replace(day=1)
+    else:
+        label = day + pd.Timedelta(minutes=(minute - _minutes(market_open_time)) // unit * unit + _minutes(market_open_time))
+    if timestamp.tz is not None:
+        label = pd.Timestamp(eastern.localize(label.to_pydatetime())).tz_convert(timestamp.tz)
+    return label
+
+def _aggregate(values, labels):
+    """OHLCV rows of each run of equal labels in sorted (bars x BAR_COLUMNS) values."""
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(values)] - 1
+    return labels[starts], np.column_stack([
+        values[starts, 0],
+        np.maximum.reduceat(values[:, 1], starts),
+        np.minimum.reduceat(values[:, 2], starts),
+        values[ends, 3],
+        np.add.reduceat(values[:, 4], starts),
+    ])
+
+@traced('compute')
+def resample_bars(bars, timeframe, regular_hours=True):
+    """
+    Roll base OHLCV bars up into a higher timeframe in one vectorized pass.
+
+    :param bars: OHLCV DataFrame indexed by bar start, e.g. daily bars from the bar store or 5m bars.
+    :param timeframe: One of TIMEFRAMES; must not be finer than the bars.
+    :return: An OHLCV DataFrame indexed by the start of each higher-timeframe bar.
+    """
+    if not bars.index.is_monotonic_increasing:
+        bars = bars.sort_index()
+    labels, in_session = bucket_labels(bars.index, timeframe, regular_hours)
+    values = bars[BAR_COLUMNS].to_numpy(dtype=float)[in_session]
+    labels = labels[in_session]
+    if not len(values):
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name=bars.index.name), dtype=float)
+    index, rows = _aggregate(values, labels)
+    return pd.DataFrame(rows, index=index.rename(bars.index.name), columns=BAR_COLUMNS)
+
+class BarAggregator:
+    """
+    Roll base bars up into one higher timeframe as they arrive.
+
+    Completed bars never change; only the open bar is touched by a new base bar. Repeating
+    the latest base bar's timestamp revises it (a bar that is still printing), and the open
+    bar is then rebuilt from the base bars of its own bucket only.
+
+    :param timeframe: One of TIMEFRAMES.
+    :param regular_hours: See bucket_labels.
+    """
+
+    def __init__(self, timeframe, regular_hours=True):
+        bucket_labels(pd.DatetimeIndex([]), timeframe)  # Validates the timeframe
+        self.timeframe = timeframe
+        self.regular_hours = regular_hours
+        self.labels = []
+        self.rows = []
+        self.open_label = None
+        self.open_bar = None  # (open, high, low, close, volume)
+        self.base = []  # (timestamp, open, high, low, close, volume) of the open bucket
+
+    def update(self, timestamp, open_, high, low, close, volume=0.0):
+        """
+        Add a base bar, or revise the latest one.
+
+        :return: (label, bar) of the open higher-timeframe bar, or None if the bar is out of session.
+        """
+        label = bucket_label(timestamp, self.timeframe, self.regular_hours)
+        if label is None:
+            return None
+        if self.open_label is not None and label < self.open_label:
+            raise ValueError(f"Bar at {timestamp} is older than the open {self.timeframe} bar {self.open_label}")
+        if label != self.open_label:
+            self._close()
+            self.open_label = label
+
+        row = (pd.Timestamp(timestamp), float(open_), float(high), float(low), float(close), float(volume))
+        if self.base and row[0] == self.base[-1][0]:
+            self.base[-1] = row
+            values = np.array([bar[1:] for bar in self.base])
+            self.open_bar = (values[0, 0], values[:, 1].max(), values[:, 2].min(), values[-1, 3], values[:, 4].sum())
+        elif self.base and row[0] < self.base[-1][0]:
+            raise ValueError(f"Bar at {timestamp} is older than the latest base bar {self.base[-1][0]}")
+        else:
+            self.base.append(row)
+            if self.open_bar is None:
+                self.open_bar = row[1:]
+            else:
+                first, highest, lowest, _, traded = self.open_bar
+                self.open_bar = (first, max(highest, row[2]), min(lowest, row[3]), row[4], traded + row[5])
+        return self.open_label, self.open_bar
+
+    def _close(self):
+        if self.open_label is not None:
+            self.labels.append(self.open_label)
+            self.rows.append(self.open_bar)
+        self.open_label, self.open_bar, self.base = None, None, []
+
+    def extend(self, bars):
+        """Add an OHLCV DataFrame of base bars; a fresh aggregator is seeded in one vectorized pass."""
+        if self.open_label is not None or len(bars) < 2:
+            for timestamp, row in zip(bars.index, bars[BAR_COLUMNS].itertuples(index=False)):
+                self.update(timestamp, *row)
+            return self
+
+        labels, in_session = bucket_labels(bars.index, self.timeframe, self.regular_hours)
+        bars, labels = bars[in_session], labels[in_session]
+        if not len(bars):
+            return self
+        values = bars[BAR_COLUMNS].to_numpy(dtype=float)
+        is_open = np.asarray(labels == labels[-1])
+        if (~is_open).any():
+            index, rows = _aggregate(values[~is_open], labels[~is_open])
+            self.labels.extend(index)
+            self.rows.extend(map(tuple, rows))
+        self.open_label = labels[-1]
+        self.base = [(timestamp, *row) for timestamp, row in zip(bars.index[is_open], values[is_open].tolist())]
+        open_bars = values[is_open]
+        self.open_bar = (open_bars[0, 0], open_bars[:, 1].max(), open_bars[:, 2].min(), open_bars[-1, 3], open_bars[:, 4].sum())
+        return self
+
+    @property
+    def last_base(self):
+        """Timestamp of the latest base bar applied, or None before the first one."""
+        return self.base[-1][0] if self.base else None
+
+    def discard_before(self, timestamp):
+        """Drop completed bars labelled before `timestamp`, e.g. once their base bars have aged out."""
+        keep = next((i for i, label in enumerate(self.labels) if label >= timestamp), len(self.labels))
+        del self.labels[:keep], self.rows[:keep]
+
+    def bars(self):
+        """Every bar so far, the open one last, as an OHLCV DataFrame."""
+        labels = self.labels + ([self.open_label] if self.open_label is not None else [])
+        rows = self.rows + ([self.open_bar] if self.open_bar is not None else [])
+        return pd.DataFrame(rows, index=pd.DatetimeIndex(labels, name='Date'), columns=BAR_COLUMNS, dtype=float)
+
+    def to_dict(self):
+        return {'timeframe': self.timeframe, 'regular_hours': self.regular_hours,
+                'labels': list(self.labels), 'rows': [tuple(map(float, row)) for row in self.rows],
+                'open_label': self.open_label,
+                'open_bar': tuple(map(float, self.open_bar)) if self.open_bar is not None else None,
+                'base': [(row[0], *map(float, row[1:])) for row in self.base]}
+
+    @classmethod
+    def from_dict(cls, state):
+        aggregator = cls(state['timeframe'], state['regular_hours'])
+        aggregator.labels, aggregator.rows = list(state['labels']), list(state['rows'])
+        aggregator.open_label, aggregator.open_bar = state['open_label'], state['open_bar']
+        aggregator.base = list(state['base'])
+        return aggregator
+
+def _since(bars, start):
+    """The bars from a naive Eastern `start` on, whatever the index's timezone."""
+    if bars.index.tz is not None:
+        start = start.tz_localize(eastern).tz_convert(bars.index.tz)
+    return bars[bars.index >= start]
+
+def get_intraday_bars(ticker, provider=None):
+    """
+    The ticker's INTRADAY_BASE bars, shared by every intraday timeframe.
+
+    The bars stay in the cache and are refreshed at most every INTRADAY_TTL seconds. A refresh
+    asks only for the bars since the day of the last stored one, replaces the stored bars it
+    overlaps (the last one may have still been printing) and drops bars older than INTRADAY_PERIOD.
+
+    :return: (bars, error) like get_history.
+    """
+    stored = cache.get('intraday_bars', ticker)
+    if stored is not None and cache.get('intraday_synced', ticker):
+        return stored, None
+    provider = provider or get_provider()
+    start = stored.index[-1].strftime('%Y-%m-%d') if stored is not None else None
+    try:
+        fetched = provider.history(ticker, period=INTRADAY_PERIOD, interval=INTRADAY_BASE, start=start)
+    except Exception as e:
+        fetched, error = None, str(e)
+    else:
+        error = None if fetched is not None and not fetched.empty else "No data"
+    if error is None:
+        fetched = fetched[BAR_COLUMNS]
+        if stored is not None:
+            fetched = pd.concat([stored[stored.index < fetched.index[0]], fetched])
+        stored = _since(fetched, period_start(INTRADAY_PERIOD))
+        with cache.disk.transact():
+            cache.set('intraday_bars', ticker, stored)
+            cache.set('intraday_synced', ticker, True, expire=INTRADAY_TTL)
+    # Like the bar store, a failed refresh still serves the bars already stored
+    return (stored, None) if stored is not None and not stored.empty else (None, error or "No data")
+
+def _advance_aggregator(ticker, timeframe, base, covered_from, trim=False):
+    """
+    The ticker's persisted BarAggregator for a timeframe, fed the base bars it has not seen.
+
+    The latest bar it saw is fed again, so a revision of a bar that was still printing replaces
+    it. The aggregator is rebuilt when it was seeded from a shorter window than `covered_from`.
+
+    :param trim: Drop the bars that begin before `base` does, for a base series that ages out.
+    """
+    key = f"{ticker}_{timeframe}"
+    saved = cache.get('bar_aggregator', key)
+    if saved is not None and saved['covered_from'] <= covered_from:
+        aggregator = BarAggregator.from_dict(saved['aggregator'])
+        new = base[base.index >= aggregator.last_base] if aggregator.last_base is not None else base
+    else:
+        aggregator, saved, new = BarAggregator(timeframe), None, base
+
+    def snapshot():
+        return aggregator.labels[:1], len(aggregator.labels), aggregator.open_label, aggregator.open_bar
+
+    before = snapshot()
+    aggregator.extend(new)
+    if trim and len(base):
+        aggregator.discard_before(bucket_label(base.index[0], timeframe, regular_hours=False))
+    if saved is None or snapshot() != before:
+        cache.set('bar_aggregator', key, {'covered_from': covered_from, 'aggregator': aggregator.to_dict()})
+    return aggregator
+
+def get_bars(ticker, timeframe='1d', period='1y', provider=None):
+    """
+    OHLCV bars of any timeframe, rolled up locally instead of downloaded per interval.
+
+    Daily and coarser bars come from the daily bar store, intraday bars from the shared
+    INTRADAY_BASE series, so switching timeframe costs no network I/O. Each ticker and
+    timeframe keeps a persisted BarAggregator, so a call only rolls up the base bars that
+    arrived since the previous one.
+
+    :param period: yfinance period the bars cover; intraday bars cover at most INTRADAY_PERIOD.
+    :return: (bars, error) like get_history.
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unsupported timeframe: {timeframe} (expected one of {', '.join(TIMEFRAMES)})")
+    intraday = isinstance(TIMEFRAMES[timeframe], int)
+    start = period_start(period)
+    if intraday:
+        base, error = get_intraday_bars(ticker, provider)
+        covered_from = period_start(INTRADAY_PERIOD)
+    else:
+        base, error = get_history(ticker, period=period, provider=provider)
+        covered_from = start
+    if base is None:
+        return None, error
+    if timeframe == '1d' and not intraday:
+        return base, None  # The store already holds daily bars
+    aggregator = _advance_aggregator(ticker, timeframe, base, covered_from, trim=intraday)
+    bars = aggregator.bars().rename_axis(base.index.name)
+    # Start at the bar holding `start`, which may begin before it (e.g. the Monday of its week)
+    first = bucket_label(start.tz_localize(eastern) if bars.index.tz is not None else start, timeframe, regular_hours=False)
+    bars = bars[bars.index >= first]
+    return (bars, None) if not bars.empty else (None, "No data")
+
+if __name__ == "__main__":
+    from atr_calculator import calculate_ATR_series
+    from stock_data_utils import calculate_rsi
+
+    parser = argparse.ArgumentParser(description="Show a ticker's bars, range, ATR and RSI at any timeframe.")
+    parser.add_argument("ticker")
+    parser.add_argument("--timeframe", default="1wk", choices=list(TIMEFRAMES))
+    parser.add_argument("--period", default="1y", help="History window, e.g. 6mo or 5d.")
+    parser.add_argument("--tail", type=int, default=10, help="Bars to print.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bars, error = get_bars(args.ticker, args.timeframe, args.period)
+    if bars is None:
+        print(f"\n{red_color_start}Failed to fetch bars for {args.ticker}: {error}{color_reset}\n")
+    else:
+        bars = bars.copy()
+        bars['Range'] = bars['High'] - bars['Low']
+        bars['ATR'] = calculate_ATR_series(bars.copy())
+        bars['RSI'] = calculate_rsi(bars['Close'])
+        print(f"\n{blue_color_start}{args.ticker} {args.timeframe} bars:{color_reset}\n")
+        print(bars.tail(args.tail).to_string(float_format=lambda v: f"{v:,.2f}"))
+    print(f"\nDone in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,206 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from data_providers import get_provider, period_start
+from instrumentation import count, traced
+from market_time_utils import get_last_market_close
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class BarStore:
+    """
+    Persistent per-ticker daily OHLCV store.
+
+    Every ticker is one memory-mappable ``bars.npy`` array shaped (bars, 6) holding the
+    date (days since epoch) followed by BAR_COLUMNS, plus a ``meta.json`` that records the
+    last stored bar, the earliest date ever requested and when the ticker was last synced.
+    Refreshes only ask the provider for the bars after the last stored one, and reads
+    return windows backed by the memory map without copying.
+
+    :param directory: Root directory of the store.
+    """
+
+    def __init__(self, directory='./bar_store'):
+        self.directory = directory
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.directory, ticker)
+
+    def _load_meta(self, ticker):
+        try:
+            with open(os.path.join(self._ticker_dir(ticker), 'meta.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _load_bars(self, ticker):
+        try:
+            return np.load(os.path.join(self._ticker_dir(ticker), 'bars.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+
+    def last_bar(self, ticker):
+        meta = self._load_meta(ticker)
+        return pd.Timestamp(meta['last_bar']) if meta and meta.get('last_bar') else None
+
+    def needs_update(self, ticker, start):
+        meta = self._load_meta(ticker)
+        if meta is None:
+            return True
+        if pd.Timestamp(start) < pd.Timestamp(meta['covered_from']):
+            return True
+        return meta['synced_at'] < get_last_market_close()
+
+    def update(self, ticker, period="1y", provider=None):
+        """
+        Bring a ticker's bars up to date, fetching only what the store is missing.
+
+        :return: None on success, otherwise an error message.
+        """
+        bars, meta, error = self.fetch_update(ticker, period, provider)
+        if bars is not None:
+            self.commit(ticker, bars, meta)
+        return error
+
+    @traced('fetch', 'bar_store.fetch_update')
+    def fetch_update(self, ticker, period="1y", provider=None):
+        """
+        Fetch the bars a ticker is missing and merge them with the stored ones, without writing.
+
+        :return: (bars, meta, error); bars is None when the ticker is already fresh or the fetch failed.
+        """
+        start = period_start(period)
+        if not self.needs_update(ticker, start):
+            return None, None, None
+
+        provider = provider or get_provider()
+        meta = self._load_meta(ticker)
+        existing = self._load_bars(ticker)
+        if meta is None or existing is None or start < pd.Timestamp(meta['covered_from']):
+            fetch_from = start  # First fetch, or the store must be backfilled
+        else:
+            # Re-fetch the last stored bar in case it was still forming when stored
+            fetch_from = pd.Timestamp(meta['last_bar'])
+
+        try:
+            hist = provider.history(ticker, start=fetch_from.strftime('%Y-%m-%d'))
+        except Exception as e:
+            return None, None, str(e)
+        if (hist is None or hist.empty) and existing is None:
+            return None, None, "No data"
+
+        new_bars = _frame_to_array(hist) if hist is not None and not hist.empty else np.empty((0, 6))
+        if existing is not None and len(existing):
+            # New bars replace any stored bars with the same date
+            keep = ~np.isin(existing[:, 0], new_bars[:, 0])
+            merged = np.concatenate([np.asarray(existing)[keep], new_bars])
+            merged = merged[np.argsort(merged[:, 0], kind='stable')]
+        else:
+            merged = new_bars
+
+        covered_from = min(start, pd.Timestamp(meta['covered_from'])) if meta else start
+        return merged, {
+            'covered_from': covered_from.strftime('%Y-%m-%d'),
+            'last_bar': _days_to_timestamp(merged[-1, 0]).strftime('%Y-%m-%d') if len(merged) else None,
+            'synced_at': pd.Timestamp.now(tz='UTC').timestamp(),
+        }, None
+
+    @traced('cache', 'bar_store.commit')
+    def commit(self, ticker, bars, meta):
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        # Write to temporary files and swap them in so readers never see a partial array. Bars go
+        # first: a reader between the two swaps sees new bars with old metadata and refetches,
+        # rather than old bars with metadata that says they are fresh
+        bars_path = os.path.join(ticker_dir, 'bars.npy')
+        with open(bars_path + '.tmp', 'wb') as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=np.float64))
+        os.replace(bars_path + '.tmp', bars_path)
+        meta_path = os.path.join(ticker_dir, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @traced('cache', 'bar_store.read')
+    def read(self, ticker, period="1y"):
+        """
+        Return the stored daily bars covering a yfinance period, or None if the ticker is unknown.
+
+        The frame is a zero-copy view over the memory-mapped store and must be treated as read-only.
+        """
+        bars = self._load_bars(ticker)
+        if bars is None or not len(bars):
+            return None
+        count('bar_store_bytes_mapped', bars.nbytes)
+        return bars_to_frame(bars, period)
+
+    def get(self, ticker, period="1y", provider=None):
+        """Update a ticker and read its window, returning (hist, error)."""
+        error = self.update(ticker, period, provider)
+        hist = self.read(ticker, period)
+        if hist is None or hist.empty:
+            return None, error or "No data"
+        return hist, None
+
+    @traced('fetch', 'bar_store.get_many')
+    def get_many(self, tickers, period="1y", provider=None, max_workers=8):
+        """
+        Update many tickers with a bounded worker pool, then read their windows.
+
+        :return: A dict mapping each ticker to a (hist, error) tuple.
+        """
+        start = period_start(period)
+        stale = [ticker for ticker in tickers if self.needs_update(ticker, start)]
+        errors = {}
+        if stale:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self.update, ticker, period, provider): ticker for ticker in stale}
+                with tqdm(total=len(stale), desc="Fetching stocks", colour='blue') as progress:
+                    for future in as_completed(futures):
+                        errors[futures[future]] = future.result()
+                        progress.update(1)
+
+        results = {}
+        for ticker in tickers:
+            hist = self.read(ticker, period)
+            if hist is None or hist.empty:
+                results[ticker] = (None, errors.get(ticker) or "No data")
+            else:
+                results[ticker] = (hist, None)
+        return results
+
+def bars_to_frame(bars, period="1y"):
+    """View the rows of a (bars, 6) store array that cover a yfinance period as an OHLCV DataFrame."""
+    first = np.searchsorted(bars[:, 0], _timestamp_to_days(period_start(period)))
+    window = bars[first:]
+    index = pd.DatetimeIndex(np.asarray(window[:, 0]).astype(np.int64).astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
+    return pd.DataFrame(window[:, 1:], index=index, columns=BAR_COLUMNS, copy=False)
+
+def _frame_to_array(hist):
+    index = hist.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = index.normalize().to_numpy().astype('datetime64[D]').astype(np.int64)
+    return np.column_stack([days.astype(np.float64), hist[BAR_COLUMNS].to_numpy(dtype=np.float64)])
+
+def _timestamp_to_days(timestamp):
+    return np.datetime64(pd.Timestamp(timestamp).date(), 'D').astype(np.int64)
+
+def _days_to_timestamp(days):
+    return pd.Timestamp(np.datetime64(int(days), 'D'))
+
+store = BarStore()
+
+def set_store_directory(directory):
+    global store
+    store = BarStore(directory)
+
+def get_history(ticker, period="1y", provider=None):
+    return store.get(ticker, period, provider)
+
+def get_histories(tickers, period="1y", provider=None, max_workers=8):
+    return store.get_many(tickers, period, provider, max_workers)
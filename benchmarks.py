@@ -0,0 +1,212 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stderr, redirect_stdout
+
+import pandas as pd
+
+import bar_store
+import fundamentals_table
+import options_data_utils
+import stock_analysis
+import stock_data_utils
+import volatility
+from cache_utils import cache, set_cache_directory
+from data_providers import SyntheticProvider, get_provider, set_provider
+
+SIZES = (100, 1000, 5000)
+REGRESSION_THRESHOLD = 0.25
+
+def write_universe(path, size, provider):
+    """Write a screener CSV of `size` synthetic symbols, priced from each symbol's latest bars."""
+    rows = []
+    for i in range(size):
+        symbol = f"SYN{i:04d}"
+        week = provider.history(symbol, period="5d")
+        rows.append({'Symbol': symbol, 'Name': f"Synthetic {i}", 'Last': round(week['Close'].iloc[-1], 2),
+                     'High': round(week['High'].max(), 2), 'Low': round(week['Low'].min(), 2)})
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return [row['Symbol'] for row in rows]
+
+def _measure(function, provider):
+    """Run `function` quietly; return its wall time, peak traced memory, cache hit ratio and upstream calls."""
+    cache.stats.clear()
+    calls = provider.calls
+    tracemalloc.start()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    hits = sum(counters['hits'] for counters in cache.stats.values())
+    lookups = hits + sum(counters['misses'] for counters in cache.stats.values())
+    return {'seconds': seconds, 'peak_memory_mb': peak / 2**20,
+            'cache_hit_ratio': hits / lookups if lookups else None,
+            'upstream_calls': provider.calls - calls}
+
+def _benchmarks(tickers, sample, max_workers):
+    """The benchmarked entry points; per-ticker functions run over `sample` tickers of the universe."""
+    sampled = tickers[:sample]
+    return {
+        'filter_extreme_stocks': lambda: stock_data_utils.filter_extreme_stocks(max_workers=max_workers),
+        'get_top_volatile_stocks': lambda: stock_analysis.get_top_volatile_stocks(min_move=0, max_price=float('inf')),
+        'get_stock_analysis': lambda: [stock_analysis.get_stock_analysis(t) for t in sampled],
+        'fetch_options_data_for_debit_spread': lambda: [
+            options_data_utils.fetch_options_data_for_debit_spread(t, 'weeks', 4, 0.25, max_workers=max_workers) for t in sampled],
+        'calculate_hv': lambda: [options_data_utils.calculate_hv(t) for t in sampled],
+        'universe_volatility': lambda: volatility.universe_volatility(tickers, max_workers=max_workers),
+        'screen_fundamentals': lambda: fundamentals_table.screen("forwardPE < 25 and revenueGrowth > 0.10", tickers=tickers),
+    }
+
+def run_suite(sizes=SIZES, latency=0.0, max_workers=8, sample=10):
+    """
+    Time every benchmark against the synthetic provider at each universe size.
+
+    Each size gets a temporary universe CSV, and every benchmark gets its own empty cache and
+    bar store. It runs once cold and once warm against them, so the warm pass measures what
+    the caches save.
+
+    :return: {size: {benchmark: {'cold': metrics, 'warm': metrics}}}, keyed by strings so it
+             round-trips through JSON.
+    """
+    original_provider = get_provider()
+    original_store = bar_store.store.directory
+    original_cache = cache.directory
+    original_universe = stock_data_utils.csv_file_path
+    results = {}
+    try:
+        for size in sizes:
+            provider = SyntheticProvider(latency=latency)
+            with tempfile.TemporaryDirectory() as workdir:
+                universe_path = os.path.join(workdir, 'universe.csv')
+                tickers = write_universe(universe_path, size, SyntheticProvider())
+                stock_data_utils.set_universe_file(universe_path)
+                set_provider(provider)
+                results[str(size)] = {}
+                for name, function in _benchmarks(tickers, sample, max_workers).items():
+                    # A benchmark's cold pass must not find what earlier benchmarks cached
+                    set_cache_directory(os.path.join(workdir, name, 'cache'))
+                    bar_store.set_store_directory(os.path.join(workdir, name, 'bar_store'))
+                    results[str(size)][name] = {'cold': _measure(function, provider), 'warm': _measure(function, provider)}
+                cache.close()
+    finally:
+        set_provider(original_provider)
+        bar_store.set_store_directory(original_store)
+        set_cache_directory(original_cache)
+        stock_data_utils.set_universe_file(original_universe)
+    return results
+
+def print_results(results):
+    for size, benchmarks in results.items():
+        print(f"\n{size} tickers:")
+        for name, passes in benchmarks.items():
+            for label, metrics in passes.items():
+                ratio = metrics['cache_hit_ratio']
+                print(f" - {name} ({label}): {metrics['seconds']:.3f}s, peak {metrics['peak_memory_mb']:.1f} MB, "
+                      f"hit ratio {'n/a' if ratio is None else f'{ratio:.0%}'}, {metrics['upstream_calls']} upstream calls")
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """List every wall time or peak memory more than `threshold` above the baseline."""
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, passes in benchmarks.items():
+            for label, metrics in passes.items():
+                previous = baseline.get(size, {}).get(name, {}).get(label)
+                if previous is None:
+                    continue
+                for metric in ('seconds', 'peak_memory_mb'):
+                    if metrics[metric] > previous[metric] * (1 + threshold):
+                        regressions.append(f"{size} tickers, {name} ({label}): {metric} "
+                                           f"{previous[metric]:.3f} -> {metrics[metric]:.3f}")
+    return regressions
+
+HEAVY_MODULES = ('yfinance', 'pandas', 'numpy', 'ta', 'tqdm', 'pytz', 'diskcache')
+STARTUP_BUDGET = 0.5
+MENU_PROMPT = b"Enter your choice"
+
+def bench_startup(runs=5):
+    """
+    Time main.py's start-up in fresh interpreters: `import main`, and launch to first menu prompt.
+
+    :return: Median seconds for both, plus any heavy modules that `import main` loaded.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=package_dir)
+    probe = ("import sys, time; start = time.perf_counter(); import main; "
+             "print(time.perf_counter() - start); "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    import_times, prompt_times = [], []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", probe], cwd=package_dir, env=env,
+                                capture_output=True, text=True, check=True).stdout.splitlines()
+        import_times.append(float(output[0]))
+        loaded.update(filter(None, output[1].split(',')))
+
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(package_dir, "main.py")], cwd=package_dir, env=env,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        shown = b""
+        while MENU_PROMPT not in shown:
+            chunk = os.read(process.stdout.fileno(), 4096)
+            if not chunk:
+                raise RuntimeError("main.py exited before showing the menu")
+            shown += chunk
+        prompt_times.append(time.perf_counter() - start)
+        process.communicate(b"exit\n")
+    return {'import_seconds': statistics.median(import_times),
+            'first_prompt_seconds': statistics.median(prompt_times),
+            'heavy_modules_loaded': sorted(loaded)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the stock analysis tool.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Universe sizes to benchmark.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per upstream request.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch workers.")
+    parser.add_argument("--sample", type=int, default=10, help="Tickers run through the per-ticker functions.")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to a JSON baseline.")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the results with a saved JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown before a regression is reported.")
+    parser.add_argument("--check", action="store_true", help="Run the reference tests in tests/ instead of the benchmark suite.")
+    parser.add_argument("--startup", action="store_true", help="Only check that main.py reaches its menu within the start-up budget.")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET, help="Seconds allowed from launch to the first menu prompt.")
+    args = parser.parse_args()
+
+    if args.startup:
+        startup = bench_startup()
+        print(f"import main: {startup['import_seconds'] * 1000:.0f} ms, first menu prompt: "
+              f"{startup['first_prompt_seconds'] * 1000:.0f} ms (budget {args.startup_budget * 1000:.0f} ms)")
+        if startup['heavy_modules_loaded']:
+            print(f"Heavy modules loaded at start-up: {', '.join(startup['heavy_modules_loaded'])}")
+        sys.exit(0 if startup['first_prompt_seconds'] <= args.startup_budget and not startup['heavy_modules_loaded'] else 1)
+
+    if args.check:
+        # The reference checks live in tests/; run them without the benchmark suite
+        import pytest
+        sys.exit(pytest.main(["-q", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")]))
+
+    results = run_suite(sizes=args.sizes, latency=args.latency, max_workers=args.workers, sample=args.sample)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), threshold=args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f" - {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import pickle
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# numpy, pandas and diskcache are imported on first use so that importing the cache (for
+# example from the menu's cache-clear option) does not pay for them up front
+from instrumentation import count, traced
+from market_time_utils import seconds_until_expiration
+
+CACHE_DIRECTORY = './cache'
+MEMORY_LIMIT_BYTES = 64 * 1024 * 1024
+
+FRAME_MAGIC = b'FRAME1\n'
+_MISSING = object()
+
+def encode_frame(frame):
+    """
+    Encode a DataFrame as a columnar byte string instead of a pickle.
+
+    Layout: magic, a 4-byte header length, a JSON header, then each numeric column's raw
+    buffer aligned to 8 bytes. Non-numeric columns are stored inline in the header.
+    Returns None for frames this format does not cover (e.g. MultiIndex columns).
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(frame.columns, pd.MultiIndex) or isinstance(frame.index, pd.MultiIndex):
+        return None
+
+    buffers = []
+    offset = 0
+
+    def add_array(values):
+        nonlocal offset
+        values = np.ascontiguousarray(values)
+        entry = {'dtype': values.dtype.str, 'offset': offset, 'length': len(values)}
+        buffers.append(values.tobytes())
+        padding = -values.nbytes % 8
+        buffers.append(b'\0' * padding)
+        offset += values.nbytes + padding
+        return entry
+
+    def describe(values, name):
+        if values.dtype.kind in 'biufcmM' and not isinstance(values.dtype, pd.DatetimeTZDtype):
+            entry = add_array(values.to_numpy())
+        else:
+            entry = {'pandas_dtype': str(values.dtype), 'values': values.astype(object).where(values.notna(), None).tolist()}
+        entry['name'] = name
+        return entry
+
+    index = frame.index
+    if isinstance(index, pd.RangeIndex):
+        index_entry = {'range': [index.start, index.stop, index.step], 'name': index.name}
+    elif isinstance(index, pd.DatetimeIndex):
+        index_entry = describe(pd.Series(index.tz_convert(None) if index.tz else index), index.name)
+        index_entry['tz'] = str(index.tz) if index.tz else None
+    else:
+        index_entry = describe(pd.Series(index), index.name)
+
+    try:
+        header = json.dumps({
+            'index': index_entry,
+            'columns': [describe(frame.iloc[:, i], name) for i, name in enumerate(frame.columns)],
+        }).encode()
+    except TypeError:
+        return None
+    return FRAME_MAGIC + struct.pack('<I', len(header)) + header + b''.join(buffers)
+
+@traced('cache', 'cache.decode_frame')
+def decode_frame(payload):
+    """Decode encode_frame output; numeric columns are read-only views over the payload."""
+    import numpy as np
+    import pandas as pd
+
+    header_length = struct.unpack_from('<I', payload, len(FRAME_MAGIC))[0]
+    start = len(FRAME_MAGIC) + 4
+    header = json.loads(payload[start:start + header_length])
+    data_start = start + header_length
+
+    def restore(entry):
+        if 'values' in entry:
+            return pd.Series(entry['values'], dtype=entry['pandas_dtype'] if entry['pandas_dtype'] != 'object' else object)
+        dtype = np.dtype(entry['dtype'])
+        return np.frombuffer(payload, dtype=dtype, count=entry['length'], offset=data_start + entry['offset'])
+
+    index_entry = header['index']
+    if 'range' in index_entry:
+        index = pd.RangeIndex(*index_entry['range'], name=index_entry['name'])
+    else:
+        index = pd.Index(restore(index_entry), name=index_entry['name'])
+        if index_entry.get('tz'):
+            index = index.tz_localize('UTC').tz_convert(index_entry['tz'])
+
+    columns = {}
+    for entry in header['columns']:
+        values = restore(entry)
+        columns[entry['name']] = values.to_numpy() if isinstance(values, pd.Series) else values
+    return pd.DataFrame(columns, index=index, copy=False)
+
+def _encode(value):
+    # A DataFrame can only exist once pandas is loaded, so never import it just to check
+    pandas = sys.modules.get('pandas')
+    if pandas is not None and isinstance(value, pandas.DataFrame):
+        payload = encode_frame(value)
+        if payload is not None:
+            return payload
+    return value
+
+def _decode(value):
+    if isinstance(value, bytes) and value.startswith(FRAME_MAGIC):
+        return decode_frame(value)
+    return value
+
+def _size_of(payload):
+    if isinstance(payload, bytes):
+        return len(payload)
+    try:
+        return len(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+class TieredCache:
+    """
+    Shared two-tier cache: an in-process LRU in front of the diskcache database.
+
+    Keys live in namespaces ('atr', 'fundamentals', ...). Entries are tagged with their
+    namespace so a whole namespace can be evicted at once. The disk tier keeps an SQL index on
+    those tags, so a namespace is listed, counted or evicted by age without scanning every key.
+    DataFrames are stored with encode_frame, so they are neither pickled twice nor copied when
+    loaded. Expirations accept the policies of market_time_utils.seconds_until_expiration.
+
+    :param directory: diskcache directory, opened on first use.
+    :param memory_limit: Size budget of the in-process tier, in encoded bytes.
+    """
+
+    def __init__(self, directory=CACHE_DIRECTORY, memory_limit=MEMORY_LIMIT_BYTES):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self._disk = None
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self.stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0})
+
+    @property
+    def disk(self):
+        if self._disk is None:
+            with self._lock:
+                if self._disk is None:
+                    from diskcache import Cache
+                    self._disk = Cache(self.directory, tag_index=True)
+        return self._disk
+
+    @staticmethod
+    def _key(namespace, key):
+        return f"{namespace}:{key}"
+
+    def _tagged(self, columns, namespace, condition='', parameters=()):
+        """Rows of a namespace's live entries, looked up through diskcache's tag index."""
+        # diskcache has no public query by tag; its rows record the store time of every entry
+        query = (f"SELECT {columns} FROM Cache WHERE tag = ? AND (expire_time IS NULL OR expire_time > ?)"
+                 f"{condition}")
+        return self.disk._sql(query, (namespace, time.time(), *parameters)).fetchall()
+
+    def _remember(self, full_key, payload, size, expire_at):
+        with self._lock:
+            if full_key in self._memory:
+                self._memory_bytes -= self._memory.pop(full_key)[1]
+            if size > self.memory_limit:
+                return
+            self._memory[full_key] = (payload, size, expire_at)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_limit:
+                _, (_, evicted_size, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+    def _forget(self, full_key):
+        with self._lock:
+            entry = self._memory.pop(full_key, None)
+            if entry is not None:
+                self._memory_bytes -= entry[1]
+
+    @traced('cache', 'cache.get')
+    def get(self, namespace, key, default=None):
+        full_key = self._key(namespace, key)
+        stats = self.stats[namespace]
+        with self._lock:
+            entry = self._memory.get(full_key)
+            if entry is not None:
+                payload, size, expire_at = entry
+                if expire_at is None or expire_at > time.time():
+                    self._memory.move_to_end(full_key)
+                    stats['hits'] += 1
+                    count('cache_hits', namespace=namespace, tier='memory')
+                    return _decode(payload)
+                self._forget(full_key)
+
+        # One disk read instead of `key in cache` followed by `cache[key]`
+        payload, expire_at = self.disk.get(full_key, default=_MISSING, expire_time=True)
+        if payload is _MISSING:
+            stats['misses'] += 1
+            count('cache_misses', namespace=namespace)
+            return default
+        size = _size_of(payload)
+        stats['hits'] += 1
+        stats['bytes_read'] += size
+        count('cache_hits', namespace=namespace, tier='disk')
+        count('cache_bytes_read', size, namespace=namespace)
+        self._remember(full_key, payload, size, expire_at)
+        return _decode(payload)
+
+    def set(self, namespace, key, value, expire=None):
+        self.set_many(namespace, {key: value}, expire=expire)
+
+    @traced('cache', 'cache.set')
+    def set_many(self, namespace, items, expire=None):
+        """Store several entries of one namespace in a single transaction."""
+        seconds = seconds_until_expiration(expire)
+        expire_at = time.time() + seconds if seconds is not None else None
+        with self.disk.transact():
+            for key, value in items.items():
+                full_key = self._key(namespace, key)
+                payload = _encode(value)
+                size = _size_of(payload)
+                self.disk.set(full_key, payload, expire=seconds, tag=namespace)
+                self._remember(full_key, payload, size, expire_at)
+                self.stats[namespace]['bytes_written'] += size
+                count('cache_bytes_written', size, namespace=namespace)
+            namespaces = self.disk.get('__namespaces__', default=set())
+            if namespace not in namespaces:
+                self.disk.set('__namespaces__', namespaces | {namespace})
+
+    def delete(self, namespace, key):
+        full_key = self._key(namespace, key)
+        self._forget(full_key)
+        self.disk.delete(full_key)
+
+    def namespaces(self):
+        """Map each namespace to the number of live entries it holds."""
+        return {namespace: self._tagged('COUNT(*)', namespace)[0][0]
+                for namespace in sorted(self.disk.get('__namespaces__', default=set()))}
+
+    def evict_namespace(self, namespace):
+        """Remove every entry of a namespace; returns the number of entries removed."""
+        prefix = self._key(namespace, '')
+        with self._lock:
+            for full_key in [k for k in self._memory if k.startswith(prefix)]:
+                self._forget(full_key)
+        removed = self.disk.evict(namespace)
+        with self.disk.transact():
+            self.disk.delete(self._key('__index__', namespace))  # Key index of older cache versions
+            self.disk.set('__namespaces__', self.disk.get('__namespaces__', default=set()) - {namespace})
+        return removed
+
+    def evict_older_than(self, seconds, namespace=None):
+        """Remove entries stored more than `seconds` ago, in one namespace or all of them."""
+        cutoff = time.time() - seconds
+        removed = 0
+        for name in ([namespace] if namespace else sorted(self.disk.get('__namespaces__', default=set()))):
+            stale = [full_key for (full_key,) in self._tagged('key', name, ' AND store_time < ?', (cutoff,))]
+            with self.disk.transact():
+                for full_key in stale:
+                    self._forget(full_key)
+                    self.disk.delete(full_key)
+            removed += len(stale)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        return self.disk.clear()
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def stats_report(self):
+        report = {}
+        for namespace, counters in self.stats.items():
+            lookups = counters['hits'] + counters['misses']
+            report[namespace] = dict(counters, hit_ratio=counters['hits'] / lookups if lookups else None)
+        return report
+
+cache = TieredCache()
+
+def universe_key(tickers):
+    """Short fixed-length cache key for a set of tickers, however large the universe."""
+    return hashlib.sha1(','.join(sorted(tickers)).encode()).hexdigest()
+
+def set_cache_directory(directory):
+    """Point the shared cache at another directory, e.g. a temporary one for benchmarks."""
+    cache.close()
+    cache.directory = directory
+    with cache._lock:
+        cache._memory.clear()
+        cache._memory_bytes = 0
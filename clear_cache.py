@@ -1,35 +1,37 @@
-from diskcache import Cache
+from cache_utils import cache
 
-cache = Cache('./cache')
-
-def list_cache_keys():
-    return list(cache.iterkeys())
+def list_cache_namespaces():
+    return cache.namespaces()
 
 def clear_data_cache():
-    keys = list_cache_keys()
-    if not keys:
+    namespaces = list_cache_namespaces()
+    if not namespaces:
         print("Cache is currently empty.")
         return
-    
-    print("Available cache keys:")
-    for i, key in enumerate(keys, start=1):
-        print(f"{i}. {key}")
-    
-    selection = input("Enter the number of the cache key you want to clear (0 to clear all): ")
+
+    print("Cached namespaces:")
+    for i, (namespace, count) in enumerate(namespaces.items(), start=1):
+        print(f"{i}. {namespace} ({count} entries)")
+
+    selection = input("Enter the number of the namespace to clear, 0 to clear all, or 'age' to clear entries older than a number of hours: ").strip().lower()
     try:
+        if selection == 'age':
+            hours = float(input("Clear entries older than how many hours? "))
+            removed = cache.evict_older_than(hours * 3600)
+            print(f"Cleared {removed} cache entries older than {hours} hours.")
+            return
         selection = int(selection)
         if selection == 0:
-            for key in keys:
-                cache.pop(key, None)
+            cache.clear()
             print("Cleared all cache entries.")
-        elif 0 < selection <= len(keys):
-            selected_key = keys[selection - 1]
-            cache.pop(selected_key, None)
-            print(f"Cleared cache for key: {selected_key}")
+        elif 0 < selection <= len(namespaces):
+            selected_namespace = list(namespaces)[selection - 1]
+            removed = cache.evict_namespace(selected_namespace)
+            print(f"Cleared {removed} cache entries in namespace: {selected_namespace}")
         else:
             print("Invalid selection.")
     except ValueError:
         print("Please enter a valid number.")
-        
+
 if __name__ == "__main__":
-    clear_data_cache();
\ No newline at end of file
+    clear_data_cache();
@@ -0,0 +1,261 @@
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_histories
+from indicator_engine import build_matrix
+from instrumentation import traced
+from stock_data_utils import load_universe
+
+BENCHMARK = 'QQQ'
+VOLATILITY_INDEX = '^VIX'
+WINDOW = 252
+MIN_PERIODS = 60
+# Names whose benchmark R-squared reaches this mostly move with the market
+SYSTEMATIC_R_SQUARED = 0.5
+
+green_color_start = "\033[92m"
+orange_color_start = "\033[38;5;208m"
+color_reset = "\033[0m"
+
+def log_returns(close):
+    """Daily log returns of a (dates x tickers) close matrix; NaN wherever either bar is missing."""
+    return np.log(close / close.shift(1))
+
+class RollingCorrelation:
+    """
+    Rolling covariance, correlation and beta of many return series, one day at a time.
+
+    Missing bars are NaN. Every pair uses the days on which both series have a return
+    (pairwise-complete, like DataFrame.corr). The engine keeps windowed sums of counts, x,
+    x^2 and x*y as (N x N) matrices. push() adds the new day and removes the oldest with
+    rank-one updates: O(N^2) per day instead of O(window * N^2). The sums are recomputed
+    from the buffered rows every `window` pushes to bound floating-point drift.
+
+    :param columns: Names of the series, in the order of the pushed arrays.
+    :param window: Days in the window.
+    :param min_periods: Pairs with fewer common days are NaN.
+    """
+
+    def __init__(self, columns, window=WINDOW, min_periods=MIN_PERIODS):
+        self.columns = list(columns)
+        self.window = window
+        self.min_periods = min_periods
+        self.rows = deque(maxlen=window)
+        self.dates = deque(maxlen=window)
+        self._resync()
+
+    def _resync(self):
+        block = np.array(self.rows, dtype=float).reshape(-1, len(self.columns))
+        present = ~np.isnan(block)
+        x = np.where(present, block, 0.0)
+        m = present.astype(float)
+        self.counts = m.T @ m
+        self.sums = x.T @ m  # sums[i, j]: sum of x_i over the days both i and j have a return
+        self.sum_squares = (x * x).T @ m
+        self.cross = x.T @ x
+        self.updates = 0
+
+    def _apply(self, returns, sign):
+        present = ~np.isnan(returns)
+        x = np.where(present, returns, 0.0)
+        m = present.astype(float)
+        self.counts += sign * np.outer(m, m)
+        self.sums += sign * np.outer(x, m)
+        self.sum_squares += sign * np.outer(x * x, m)
+        self.cross += sign * np.outer(x, x)
+
+    def push(self, date, returns):
+        """Add one day's returns (NaN for missing bars), dropping the oldest day once the window is full."""
+        returns = np.asarray(returns, dtype=float)
+        if len(self.rows) == self.window:
+            self._apply(self.rows[0], -1.0)
+        self.rows.append(returns)
+        self.dates.append(date)
+        self._apply(returns, 1.0)
+        self.updates += 1
+        if self.updates >= self.window:
+            self._resync()
+
+    def extend(self, returns):
+        """Add many days from a (dates x columns) DataFrame; long blocks are summed in one pass."""
+        returns = returns.reindex(columns=self.columns)
+        if len(returns) >= self.window // 8:
+            self.rows.extend(returns.to_numpy(dtype=float))
+            self.dates.extend(returns.index)
+            self._resync()
+        else:
+            for date, row in zip(returns.index, returns.to_numpy(dtype=float)):
+                self.push(date, row)
+        return self
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if self.dates else None
+
+    def _moments(self):
+        n = self.counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = (self.cross - self.sums * self.sums.T / n) / (n - 1)
+            # variance[i, j]: variance of i over the days both i and j have a return
+            variance = np.maximum(self.sum_squares - self.sums * self.sums / n, 0.0) / (n - 1)
+        enough = n >= self.min_periods
+        return np.where(enough, covariance, np.nan), np.where(enough, variance, np.nan)
+
+    def covariance(self):
+        return pd.DataFrame(self._moments()[0], index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        covariance, variance = self._moments()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.clip(covariance / np.sqrt(variance * variance.T), -1.0, 1.0)
+        return pd.DataFrame(correlation, index=self.columns, columns=self.columns)
+
+    def beta(self, benchmark=BENCHMARK):
+        """Every series' beta against `benchmark`, over the days both have a return."""
+        j = self.columns.index(benchmark)
+        covariance, variance = self._moments()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.Series(covariance[:, j] / variance[j, :], index=self.columns)
+
+def rolling_correlations(returns, window=WINDOW, min_periods=MIN_PERIODS):
+    """
+    Slide a RollingCorrelation over a (dates x tickers) return matrix.
+
+    Yields (date, engine) once the first window is full, then after every further day.
+    Each step costs O(N^2).
+    """
+    engine = RollingCorrelation(returns.columns, window=window, min_periods=min_periods)
+    engine.extend(returns.iloc[:window])
+    if len(returns) >= window:
+        yield returns.index[window - 1], engine
+    for date, row in zip(returns.index[window:], returns.to_numpy(dtype=float)[window:]):
+        engine.push(date, row)
+        yield date, engine
+
+def cluster_by_correlation(correlation, threshold=0.5):
+    """
+    Average-linkage clustering on correlation.
+
+    Repeatedly merge the two clusters whose members have the highest average pairwise
+    correlation, until no pair of clusters averages `threshold` or more.
+
+    :return: A Series of cluster numbers indexed by ticker, 1 being the largest cluster.
+    """
+    similarity = np.nan_to_num(correlation.to_numpy(dtype=float, copy=True), nan=0.0)
+    count = len(similarity)
+    np.fill_diagonal(similarity, -np.inf)
+    sizes = np.ones(count)
+    members = [[i] for i in range(count)]
+    while count > 1:
+        i, j = np.unravel_index(np.argmax(similarity), similarity.shape)
+        if similarity[i, j] < threshold:
+            break
+        # The merged cluster's average correlation with every other cluster
+        merged = (sizes[i] * similarity[i] + sizes[j] * similarity[j]) / (sizes[i] + sizes[j])
+        similarity[i, :] = merged
+        similarity[:, i] = merged
+        similarity[j, :] = -np.inf
+        similarity[:, j] = -np.inf
+        similarity[i, i] = -np.inf
+        sizes[i] += sizes[j]
+        members[i] += members[j]
+        members[j] = []
+        count -= 1
+
+    labels = np.zeros(len(members), dtype=int)
+    for number, group in enumerate(sorted((group for group in members if group), key=len, reverse=True), start=1):
+        labels[group] = number
+    return pd.Series(labels, index=correlation.index, name='cluster')
+
+def top_pairs(correlation, count=10):
+    """The `count` most correlated pairs of different tickers, as a DataFrame."""
+    values = correlation.to_numpy(dtype=float)
+    rows, columns = np.triu_indices(len(values), k=1)
+    pair_values = values[rows, columns]
+    order = np.argsort(np.where(np.isnan(pair_values), -np.inf, pair_values))[::-1][:count]
+    return pd.DataFrame({'first': correlation.index[rows[order]], 'second': correlation.columns[columns[order]],
+                         'correlation': pair_values[order]})
+
+@traced('compute')
+def market_exposure(tickers=None, window=WINDOW, threshold=0.5, provider=None, max_workers=8):
+    """
+    How much of each ticker's movement the benchmark explains.
+
+    :param tickers: Symbols to analyse; defaults to the screener universe.
+    :param threshold: Average correlation at which clusters merge.
+    :return: A (table, correlation) pair. The table is indexed by ticker with beta, corr_qqq,
+             r_squared (share of variance explained by QQQ), corr_vix, avg_corr (mean
+             correlation with the other tickers) and cluster columns.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    symbols = list(dict.fromkeys(list(tickers) + [BENCHMARK, VOLATILITY_INDEX]))
+    # Thirteen months of bars cover a 252-day window of returns
+    histories = {ticker: hist for ticker, (hist, error) in
+                 get_histories(symbols, period="13mo", provider=provider, max_workers=max_workers).items() if hist is not None}
+    returns = log_returns(build_matrix(histories, 'Close')).iloc[1:]
+
+    engine = RollingCorrelation(returns.columns, window=window).extend(returns.iloc[-window:])
+    correlation = engine.correlation()
+    names = [ticker for ticker in tickers if ticker in histories and ticker not in (BENCHMARK, VOLATILITY_INDEX)]
+    universe = correlation.loc[names, names]
+    others = universe.to_numpy(copy=True)
+    np.fill_diagonal(others, np.nan)
+
+    table = pd.DataFrame(index=pd.Index(names, name='Symbol'))
+    if BENCHMARK in correlation:
+        table['beta'] = engine.beta(BENCHMARK).reindex(names)
+        table['corr_qqq'] = correlation.loc[names, BENCHMARK]
+        table['r_squared'] = table['corr_qqq'] ** 2
+    if VOLATILITY_INDEX in correlation:
+        table['corr_vix'] = correlation.loc[names, VOLATILITY_INDEX]
+    with np.errstate(invalid='ignore'):
+        table['avg_corr'] = np.nanmean(others, axis=1) if len(names) > 1 else np.nan
+    table['cluster'] = cluster_by_correlation(universe, threshold)
+    return table, universe
+
+def explain_extremes(extreme_stocks, provider=None):
+    """
+    Tag filter_extreme_stocks results as moving with the market or idiosyncratic.
+
+    :param extreme_stocks: filter_extreme_stocks' (ticker, price, rsi, upper, lower) tuples.
+    :return: market_exposure's table for those tickers with a 'driver' column.
+    """
+    table, _ = market_exposure(provider=provider)
+    table = table.reindex([stock[0] for stock in extreme_stocks])
+    table['driver'] = np.where(table['r_squared'] >= SYSTEMATIC_R_SQUARED, 'market', 'idiosyncratic')
+    return table
+
+def print_exposure(table):
+    for ticker, row in table.iterrows():
+        color = orange_color_start if row.get('driver') == 'market' else green_color_start
+        driver = f", {row['driver']}" if 'driver' in row else ""
+        print(f"{color}{ticker}: beta {row['beta']:.2f}, R² vs {BENCHMARK} {row['r_squared']:.2f}, "
+              f"corr vs VIX {row['corr_vix']:.2f}, cluster {row['cluster']}{driver}{color_reset}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correlation, beta and clusters of the universe.")
+    parser.add_argument("--extremes", action="store_true", help="Only explain the filter_extreme_stocks names.")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Average correlation at which clusters merge.")
+    parser.add_argument("--pairs", type=int, default=10, help="Most correlated pairs to print.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.extremes:
+        from stock_data_utils import filter_extreme_stocks
+        print_exposure(explain_extremes(filter_extreme_stocks()))
+    else:
+        table, correlation = market_exposure(threshold=args.threshold)
+        print(f"\nMost correlated pairs over the last {WINDOW} days:\n")
+        print(top_pairs(correlation, args.pairs).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        clusters = {number: members for number, members in table.groupby('cluster').groups.items() if len(members) > 1}
+        print(f"\n{len(clusters)} clusters of two or more tickers at an average correlation of {args.threshold}:\n")
+        for number, members in clusters.items():
+            print(f" {number}: {', '.join(members)}")
+        print(f"\nHighest R² vs {BENCHMARK}:\n")
+        print(table.sort_values('r_squared', ascending=False).head(10).to_string(float_format=lambda v: f"{v:.2f}"))
+    print(f"\nDone in {time.perf_counter() - start:.2f}s")
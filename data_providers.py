@@ -0,0 +1,378 @@
+import os
+import time
+import zlib
+from collections import namedtuple
+from functools import lru_cache, wraps
+import yfinance as yf
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, traced, tracer
+from market_time_utils import market_open_time, session_close_time
+
+OptionChain = namedtuple('OptionChain', ['calls', 'puts', 'underlying'])
+UPSTREAM_METHODS = ('history', 'latest_bars', 'info', 'options', 'option_chain')
+
+def _minutes(time_of_day):
+    return time_of_day.hour * 60 + time_of_day.minute
+
+def _payload_bytes(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True).sum())
+    if isinstance(result, OptionChain):
+        return _payload_bytes(result.calls) + _payload_bytes(result.puts)
+    return len(repr(result))
+
+def _instrument_upstream(method, func):
+    """Wrap a provider method in a fetch span counting upstream calls and payload bytes."""
+    traced_func = traced('fetch', f"provider.{method}")(func)
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not tracer.enabled:
+            return func(self, *args, **kwargs)
+        result = traced_func(self, *args, **kwargs)
+        count('upstream_calls', method=method, provider=type(self).__name__)
+        count('upstream_bytes', _payload_bytes(result), method=method, provider=type(self).__name__)
+        return result
+    return wrapper
+
+class MarketDataProvider:
+    """
+    Interface every market data backend implements.
+
+    history() returns an OHLCV DataFrame indexed by date for a yfinance period or from a start
+    date; latest_bars() returns the most recent (possibly still printing) daily bar of many
+    tickers at once; info() returns a yfinance-style .info dict; options() lists expiration
+    dates as 'YYYY-MM-DD' strings; option_chain() returns an OptionChain of calls/puts DataFrames.
+    Every backend's methods are traced as upstream fetches.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in UPSTREAM_METHODS:
+            if method in cls.__dict__:
+                setattr(cls, method, _instrument_upstream(method, cls.__dict__[method]))
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        raise NotImplementedError
+
+    def latest_bars(self, tickers):
+        """
+        Each ticker's latest daily bar, as a DataFrame indexed by ticker with a Date column
+        and the OHLCV columns. Tickers without data are left out.
+
+        Backends with a batch endpoint override this; the default reads a few days of history per ticker.
+        """
+        rows = {}
+        for ticker in tickers:
+            hist = self.history(ticker, period="5d")
+            if hist is not None and not hist.empty:
+                rows[ticker] = dict(hist.iloc[-1], Date=hist.index[-1])
+        return latest_bars_frame(rows)
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+    def options(self, ticker):
+        raise NotImplementedError
+
+    def option_chain(self, ticker, expiration):
+        raise NotImplementedError
+
+class YFinanceProvider(MarketDataProvider):
+    """Market data provider backed by the yfinance network API."""
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start, interval=interval)
+        return yf.Ticker(ticker).history(period=period, interval=interval)
+
+    def latest_bars(self, tickers):
+        # One batch download instead of a request per ticker
+        data = yf.download(list(tickers), period="5d", interval="1d", group_by='ticker', progress=False, threads=True)
+        rows = {}
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            hist = data[ticker].dropna(subset=['Close'])
+            if not hist.empty:
+                rows[ticker] = dict(hist.iloc[-1], Date=hist.index[-1])
+        return latest_bars_frame(rows)
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def options(self, ticker):
+        return list(yf.Ticker(ticker).options)
+
+    def option_chain(self, ticker, expiration):
+        return yf.Ticker(ticker).option_chain(expiration)
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic offline provider generating OHLCV bars, option chains and .info dicts.
+
+    Every ticker has one fixed daily price path, so overlapping requests agree on
+    the bars they share, just like the real upstream.
+
+    :param latency: Seconds each request sleeps to simulate an upstream round trip.
+    :param seed: Base seed mixed with the ticker so every symbol gets its own price path.
+    """
+
+    origin = pd.Timestamp("2014-01-01")
+    # Generated series each instance keeps; the oldest are regenerated from the seed on demand
+    cached_series = 128
+
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency
+        self.seed = seed
+        self.calls = 0
+        # Bounded per-instance caches, so a large universe or a discarded provider is not held in memory
+        self._daily_bars = lru_cache(maxsize=self.cached_series)(self._generate_daily_bars)
+        self._intraday_bars = lru_cache(maxsize=self.cached_series // 4)(self._generate_intraday_bars)
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        start = pd.Timestamp(start) if start is not None else period_start(period)
+        if interval != "1d":
+            bars = self._intraday_bars(ticker, pd.Timestamp.now().normalize(), interval)
+            return bars[bars.index >= start.tz_localize(bars.index.tz)]
+        bars = self._daily_bars(ticker, pd.Timestamp.now().normalize())
+        return bars[bars.index >= start]
+
+    def info(self, ticker):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) + self.seed)
+        return {
+            'forwardPE': float(rng.uniform(8, 60)),
+            'trailingEps': float(rng.uniform(-2, 15)),
+            'profitMargins': float(rng.uniform(-0.1, 0.4)),
+            'returnOnAssets': float(rng.uniform(-0.05, 0.25)),
+            'freeCashflow': int(rng.integers(-1_000_000_000, 50_000_000_000)),
+            'operatingCashflow': int(rng.integers(0, 80_000_000_000)),
+            'debtToEquity': float(rng.uniform(0, 250)),
+            'revenueGrowth': float(rng.uniform(-0.2, 0.5)),
+            'grossMargins': float(rng.uniform(0.2, 0.8)),
+            'targetMeanPrice': float(rng.uniform(20, 500)),
+            'recommendationKey': str(rng.choice(['strong_buy', 'buy', 'hold', 'sell'])),
+        }
+
+    def options(self, ticker):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Twelve weekly expirations followed by six monthly ones
+        today = pd.Timestamp.now().normalize()
+        first_friday = today + pd.Timedelta(days=(4 - today.weekday()) % 7 or 7)
+        weeklies = [first_friday + pd.Timedelta(weeks=i) for i in range(12)]
+        monthlies = [weeklies[-1] + pd.Timedelta(weeks=4 * i) for i in range(1, 7)]
+        return [date.strftime('%Y-%m-%d') for date in weeklies + monthlies]
+
+    def option_chain(self, ticker, expiration):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        spot = float(self._daily_bars(ticker, pd.Timestamp.now().normalize())['Close'].iloc[-1])
+        years = max((pd.Timestamp(expiration) - pd.Timestamp.now()).days, 1) / 365.0
+        rng = np.random.default_rng(zlib.crc32(f"{ticker}{expiration}".encode()) + self.seed)
+        step = 1.0 if spot < 50 else 2.5 if spot < 200 else 5.0
+        strikes = np.arange(np.floor(spot * 0.6 / step) * step, spot * 1.4 + step, step)
+        # A volatility smile around the spot price
+        iv = 0.3 + 0.4 * ((strikes / spot) - 1) ** 2
+        time_value = spot * iv * np.sqrt(years) * 0.4 * np.exp(-0.5 * ((strikes - spot) / (spot * iv * np.sqrt(years))) ** 2)
+
+        def chain(kind, intrinsic):
+            mid = np.maximum(intrinsic + time_value, 0.05)
+            half_spread = np.maximum(mid * rng.uniform(0.01, 0.15, len(strikes)) / 2, 0.025)
+            return pd.DataFrame({
+                'contractSymbol': [f"{ticker}{expiration.replace('-', '')[2:]}{kind}{int(k * 1000):08d}" for k in strikes],
+                'strike': strikes,
+                'lastPrice': np.round(mid + rng.normal(0, 0.01, len(strikes)) * mid, 2),
+                'bid': np.round(np.maximum(mid - half_spread, 0.0), 2),
+                'ask': np.round(mid + half_spread, 2),
+                'volume': rng.integers(0, 5_000, len(strikes)),
+                'openInterest': rng.integers(0, 20_000, len(strikes)),
+                'impliedVolatility': iv,
+            })
+
+        return OptionChain(calls=chain('C', np.maximum(spot - strikes, 0.0)),
+                           puts=chain('P', np.maximum(strikes - spot, 0.0)),
+                           underlying={'regularMarketPrice': spot})
+
+    def _generate_daily_bars(self, ticker, end):
+        days = np.arange(np.datetime64(self.origin.date()), np.datetime64(end.date()) + 1)
+        dates = days[np.is_busday(days)]
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) + self.seed)
+        returns = rng.normal(0.0005, 0.02, len(dates))
+        close = 100.0 * np.exp(np.cumsum(returns))
+        open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, len(dates))))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, len(dates))))
+        volume = rng.integers(1_000_000, 50_000_000, len(dates)).astype(float)
+
+        return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                            index=pd.DatetimeIndex(dates, name='Date'))
+
+    def _generate_intraday_bars(self, ticker, end, interval, days=60):
+        """
+        Regular-session bars of the last `days` sessions, like yfinance's intraday intervals.
+
+        Each session walks from the daily bar's open to its close (a Brownian bridge), so
+        intraday and daily bars tell the same story. Early-close sessions end at 1:00 pm.
+        """
+        minutes = int(interval[:-1]) * (60 if interval.endswith('h') else 1)
+        daily = self._daily_bars(ticker, end).iloc[-days:]
+        session_minutes = np.array([_minutes(session_close_time(date.date())) - _minutes(market_open_time)
+                                    for date in daily.index])
+        steps = -(-session_minutes // minutes)  # The last bar of the session may be shorter
+        width = steps.max()
+        valid = np.arange(width) < steps[:, None]
+        rng = np.random.default_rng(zlib.crc32(f"{ticker}{interval}".encode()) + self.seed)
+        open_, close = daily['Open'].to_numpy()[:, None], daily['Close'].to_numpy()[:, None]
+        walk = np.cumsum(rng.normal(0, 1, (len(daily), width)), axis=1)
+        fraction = np.minimum(np.arange(1, width + 1) / steps[:, None], 1.0)
+        last = walk[np.arange(len(daily)), steps - 1][:, None]
+        path = open_ + (close - open_) * fraction + (walk - last * fraction) * open_ * 0.02 / np.sqrt(steps[:, None])
+        previous = np.concatenate([open_, path[:, :-1]], axis=1)
+        wick = np.abs(rng.normal(0, 0.001, (2, len(daily), width))) * open_
+        weights = rng.random((len(daily), width)) * valid
+        volume = daily['Volume'].to_numpy()[:, None] * weights / weights.sum(axis=1, keepdims=True)
+
+        first = (daily.index + pd.Timedelta(hours=9, minutes=30)).tz_localize('America/New_York').tz_convert('UTC')
+        index = (first.tz_localize(None).to_numpy()[:, None] + np.arange(width) * np.timedelta64(minutes, 'm'))[valid]
+        return pd.DataFrame({'Open': previous[valid], 'High': (np.maximum(previous, path) + wick[0])[valid],
+                             'Low': (np.minimum(previous, path) - wick[1])[valid], 'Close': path[valid],
+                             'Volume': np.round(volume)[valid]},
+                            index=pd.DatetimeIndex(index, name='Datetime').tz_localize('UTC').tz_convert('America/New_York'))
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Offline provider that replays recorded bars, revealing them one step at a time.
+
+    Each ticker has its own cursor, so a replay can print new data for only some tickers.
+    With `steps_per_bar` above one, a bar prints gradually like a live session: its close
+    moves from the open towards the recorded close while the high and low widen.
+
+    :param recorded: Dict mapping ticker to its full OHLCV DataFrame.
+    :param start: Bars dated before this are visible from the beginning; defaults to all but the last bar.
+    :param steps_per_bar: Steps each bar takes to print completely.
+    """
+
+    def __init__(self, recorded, start=None, steps_per_bar=1):
+        self.recorded = recorded
+        self.steps_per_bar = steps_per_bar
+        self.calls = 0
+        self.steps = {}
+        self._arrays = {}
+        for ticker, bars in recorded.items():
+            visible = len(bars) - 1 if start is None else int(np.searchsorted(bars.index, pd.Timestamp(start)))
+            self.steps[ticker] = visible * steps_per_bar
+            self._arrays[ticker] = (bars.index, bars[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=float))
+
+    @classmethod
+    def record(cls, provider, tickers, period="1y", **kwargs):
+        """Record `period` of bars for `tickers` from another provider."""
+        return cls({ticker: provider.history(ticker, period=period) for ticker in tickers}, **kwargs)
+
+    def advance(self, tickers=None, steps=1):
+        """Move the cursors of `tickers` (default: every ticker) forward; returns the tickers that moved."""
+        moved = []
+        for ticker in self.steps if tickers is None else tickers:
+            end = len(self.recorded[ticker]) * self.steps_per_bar
+            if self.steps[ticker] < end:
+                self.steps[ticker] = min(self.steps[ticker] + steps, end)
+                moved.append(ticker)
+        return moved
+
+    def _printing(self, ticker, row):
+        """OHLCV of bar `row` as it stands at the ticker's cursor."""
+        values = self._arrays[ticker][1][row].copy()
+        complete, step = divmod(self.steps[ticker], self.steps_per_bar)
+        if row == complete and step:
+            fraction = step / self.steps_per_bar
+            values[1:4] = values[0] + (values[1:4] - values[0]) * fraction
+            values[4] *= fraction
+        return values
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        self.calls += 1
+        if ticker not in self.recorded:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        complete, step = divmod(self.steps[ticker], self.steps_per_bar)
+        bars = self.recorded[ticker].iloc[:complete + (step > 0)].copy()
+        if step:
+            bars.loc[bars.index[-1], ['Open', 'High', 'Low', 'Close', 'Volume']] = self._printing(ticker, complete)
+        if bars.empty:
+            return bars
+        start = pd.Timestamp(start) if start is not None else period_start(period, now=bars.index[-1])
+        if bars.index.tz is not None and start.tz is None:
+            start = start.tz_localize(bars.index.tz)  # Recorded intraday bars
+        return bars[bars.index >= start]
+
+    def latest_bars(self, tickers):
+        self.calls += 1
+        rows = {}
+        for ticker in tickers:
+            if ticker not in self.recorded:
+                continue
+            complete, step = divmod(self.steps[ticker], self.steps_per_bar)
+            row = complete - (step == 0)
+            if row >= 0:
+                rows[ticker] = dict(zip(('Open', 'High', 'Low', 'Close', 'Volume'), self._printing(ticker, row)),
+                                    Date=self._arrays[ticker][0][row])
+        return latest_bars_frame(rows)
+
+def latest_bars_frame(rows):
+    """The latest_bars() DataFrame from a {ticker: {'Date': ..., 'Open': ..., ...}} dict."""
+    frame = pd.DataFrame.from_dict(rows, orient='index', columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+    frame.index.name = 'Symbol'
+    return frame
+
+def period_start(period, now=None):
+    """First calendar date covered by a yfinance period string ending today."""
+    today = (now or pd.Timestamp.now()).normalize()
+    if period.endswith('mo'):
+        return today - pd.DateOffset(months=int(period[:-2]))
+    if period.endswith('wk'):
+        return today - pd.DateOffset(weeks=int(period[:-2]))
+    if period.endswith('y'):
+        return today - pd.DateOffset(years=int(period[:-1]))
+    if period.endswith('d'):
+        return today - pd.DateOffset(days=int(period[:-1]))
+    raise ValueError(f"Unsupported period: {period}")
+
+def _async_provider(**kwargs):
+    from async_provider import AsyncProvider
+    # MARKET_DATA_BASE_URL points the async client at a stand-in such as upstream_server.py
+    base_url = os.environ.get('MARKET_DATA_BASE_URL')
+    if base_url:
+        kwargs = dict(kwargs, base_url=base_url, cookie_url=None)
+    return AsyncProvider(**kwargs)
+
+PROVIDERS = {'yfinance': YFinanceProvider, 'synthetic': SyntheticProvider, 'async': _async_provider}
+
+def create_provider(name, **kwargs):
+    provider_class = PROVIDERS.get(name)
+    if provider_class is None:
+        raise ValueError(f"Unknown market data provider: {name}")
+    # Outside any try: a KeyError from a provider's own setup is not an unknown name
+    return provider_class(**kwargs)
+
+# MARKET_DATA_PROVIDER=synthetic runs the whole tool offline
+_provider = create_provider(os.environ.get('MARKET_DATA_PROVIDER', 'yfinance'))
+
+def get_provider():
+    return _provider
+
+def set_provider(provider):
+    global _provider
+    _provider = provider
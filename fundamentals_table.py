@@ -0,0 +1,190 @@
+import argparse
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from tqdm import tqdm
+
+from cache_utils import cache
+from data_providers import get_provider
+from instrumentation import traced
+from market_time_utils import eastern, get_next_friday_market_close
+from stock_data_utils import load_universe, technical_snapshot
+
+# Columns of the snapshot: yfinance .info key -> (display label, dtype)
+FUNDAMENTAL_FIELDS = {
+    'forwardPE': ("PE Ratio", 'float64'),
+    'trailingEps': ("EPS", 'float64'),
+    'profitMargins': ("Profit Margins", 'float64'),
+    'returnOnAssets': ("Return on Assets", 'float64'),
+    'freeCashflow': ("Free Cash Flow", 'float64'),
+    'operatingCashflow': ("Operating Cash Flow", 'float64'),
+    'debtToEquity': ("Debt to Equity", 'float64'),
+    'revenueGrowth': ("Revenue Growth", 'float64'),
+    'grossMargins': ("Gross Margins", 'float64'),
+    'targetMeanPrice': ("Analyst Target Mean Price", 'float64'),
+    'recommendationKey': ("Analyst Recommendation", 'object'),
+}
+SNAPSHOT_KEY = 'snapshot'
+
+green_color_start = "\033[92m"
+blue_color_start = "\033[94m"
+color_reset = "\033[0m"
+
+# Serializes read-modify-write of the snapshot between threads
+_lock = threading.Lock()
+
+def _empty_table():
+    table = pd.DataFrame({column: pd.Series(dtype=dtype) for column, (_, dtype) in FUNDAMENTAL_FIELDS.items()})
+    table['fetched_at'] = pd.Series(dtype='float64')
+    table.index = pd.Index([], name='Symbol', dtype=object)
+    return table
+
+def _to_rows(infos, fetched_at):
+    """Build typed rows from raw .info dicts; 'N/A', None and other non-numbers become nulls."""
+    rows = pd.DataFrame.from_dict({ticker: {column: info.get(column) for column in FUNDAMENTAL_FIELDS}
+                                   for ticker, info in infos.items()}, orient='index')
+    for column, (_, dtype) in FUNDAMENTAL_FIELDS.items():
+        if dtype == 'float64':
+            rows[column] = pd.to_numeric(rows[column], errors='coerce').astype('float64')
+        else:
+            rows[column] = rows[column].where(rows[column].apply(lambda value: isinstance(value, str) and value != 'N/A'), None)
+    rows['fetched_at'] = fetched_at
+    rows.index.name = 'Symbol'
+    return rows
+
+def load_snapshot():
+    """The stored fundamentals table, one typed row per ticker (empty if never fetched)."""
+    table = cache.get('fundamentals_table', SNAPSHOT_KEY)
+    return table if table is not None else _empty_table()
+
+def stale_tickers(table, tickers, max_age=None, now=None):
+    """
+    Tickers of `tickers` whose row is missing or stale.
+
+    :param max_age: Seconds a row stays fresh; by default rows go stale when the trading week
+                    they were fetched in closes, like the per-ticker 'week' cache policy.
+    """
+    now = now or time.time()
+    if max_age is None:
+        # The close of the most recent trading week at or before now
+        a_week_ago = datetime.datetime.fromtimestamp(now, eastern) - datetime.timedelta(days=7)
+        cutoff = get_next_friday_market_close(a_week_ago)
+    else:
+        cutoff = now - max_age
+    fetched_at = table['fetched_at'].reindex(tickers)
+    return fetched_at.index[~(fetched_at >= cutoff)].tolist()
+
+@traced('fetch')
+def refresh_snapshot(tickers=None, max_age=None, provider=None, max_workers=8, show_progress=True):
+    """
+    Fetch .info concurrently for every stale ticker and merge the rows into the snapshot.
+
+    Rows that fail to fetch keep their previous values; fresh rows are not fetched again.
+
+    :param tickers: Symbols to cover; defaults to the screener universe.
+    :param max_age: See stale_tickers.
+    :return: A (snapshot, {ticker: error}) pair, the snapshot restricted to `tickers`.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    provider = provider or get_provider()
+    stale = stale_tickers(load_snapshot(), tickers, max_age)
+
+    infos, errors = {}, {}
+    if stale:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(provider.info, ticker): ticker for ticker in stale}
+            completed = as_completed(futures)
+            if show_progress:
+                completed = tqdm(completed, total=len(futures), desc="Fetching fundamentals", colour="blue")
+            for future in completed:
+                ticker = futures[future]
+                try:
+                    infos[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = e
+
+    with _lock:
+        table = load_snapshot()
+        if infos:
+            rows = _to_rows(infos, time.time())
+            table = pd.concat([table.drop(index=rows.index, errors='ignore'), rows])
+            table = table.astype({column: dtype for column, (_, dtype) in FUNDAMENTAL_FIELDS.items()})
+            cache.set('fundamentals_table', SNAPSHOT_KEY, table)
+    return table.reindex([ticker for ticker in tickers if ticker in table.index]), errors
+
+def screen(query=None, sort_by=None, ascending=True, top=None, tickers=None, technicals=False, max_age=None, provider=None):
+    """
+    Filter and sort the fundamentals snapshot with vectorized queries.
+
+    :param query: A DataFrame.query expression over the snapshot's columns, e.g.
+                  "forwardPE < 25 and revenueGrowth > 0.10". Rows with a null in a compared
+                  column never match.
+    :param sort_by: Column (or list of columns) to sort by.
+    :param technicals: Join the latest price, RSI and Bollinger Bands (technical_snapshot)
+                       before filtering, so queries can mix both, e.g. "forwardPE < 25 and rsi < 30".
+    :return: The matching rows, indexed by Symbol.
+    """
+    table, errors = refresh_snapshot(tickers, max_age=max_age, provider=provider)
+    for ticker, error in errors.items():
+        print(f"Error fetching fundamentals for {ticker}: {error}")
+    if technicals:
+        table = table.join(technical_snapshot(table.index.tolist(), provider=provider), how='inner')
+    if query:
+        table = table.query(query)
+    if sort_by is not None:
+        table = table.sort_values(sort_by, ascending=ascending, na_position='last')
+    return table.head(top) if top is not None else table
+
+def fundamentals_for(ticker, max_age=None, provider=None):
+    """
+    One ticker's snapshot row as the display dict fetch_fundamental_data returns.
+
+    Nulls are shown as 'N/A'.
+    """
+    if not stale_tickers(load_snapshot(), [ticker], max_age):
+        print(f"\n{blue_color_start}Loading fundamental data from cache for {ticker}.{color_reset}\n")
+    else:
+        print(f"\n{green_color_start}Fetching fundamental data for {ticker}.\n{color_reset}")
+    table, errors = refresh_snapshot([ticker], max_age=max_age, provider=provider, show_progress=False)
+    if ticker in errors and ticker not in table.index:
+        raise errors[ticker]
+    row = table.loc[ticker]
+    return {label: _display_value(row[column]) for column, (label, _) in FUNDAMENTAL_FIELDS.items()}
+
+def _display_value(value):
+    if pd.isna(value):
+        return 'N/A'
+    if isinstance(value, str):
+        return value
+    value = float(value)
+    # Cash flows are whole dollars; show them like .info does
+    return int(value) if value.is_integer() else value
+
+def print_screen(table, columns=None):
+    columns = columns or [column for column in table.columns if column != 'fetched_at']
+    if table.empty:
+        print("\nNo stocks match the screen.\n")
+        return
+    print(f"\n{len(table)} stocks match the screen:\n")
+    print(table[columns].to_string(float_format=lambda value: f"{value:,.2f}"))
+    print("\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen the universe on fundamentals (and technicals).")
+    parser.add_argument("query", nargs="?", help="Filter expression, e.g. \"forwardPE < 25 and revenueGrowth > 0.10\".")
+    parser.add_argument("--sort-by", help="Column to sort by, e.g. forwardPE.")
+    parser.add_argument("--descending", action="store_true")
+    parser.add_argument("--top", type=int, help="Rows to print.")
+    parser.add_argument("--technicals", action="store_true", help="Join price, RSI and Bollinger Bands before filtering.")
+    parser.add_argument("--max-age", type=float, help="Seconds a row stays fresh (default: until the trading week closes).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = screen(args.query, sort_by=args.sort_by, ascending=not args.descending, top=args.top,
+                    technicals=args.technicals, max_age=args.max_age)
+    print_screen(result)
+    print(f"Screened in {time.perf_counter() - start:.2f}s")
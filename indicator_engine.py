@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+def build_matrix(histories, column):
+    """
+    Align one column of many per-ticker histories into a wide (dates x tickers) DataFrame.
+
+    :param histories: Dict mapping ticker to its OHLCV DataFrame.
+    :param column: The column to extract, e.g. 'Close'.
+    :return: A DataFrame indexed by date with one column per ticker.
+    """
+    return pd.DataFrame({ticker: hist[column] for ticker, hist in histories.items()})
+
+def _unwrap(matrix):
+    if isinstance(matrix, pd.DataFrame):
+        return matrix.to_numpy(dtype=float), matrix.index, matrix.columns
+    values = np.asarray(matrix, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    return values, None, None
+
+def _wrap(values, index, columns, latest_only):
+    if columns is None:
+        return values
+    if latest_only:
+        return pd.Series(values, index=columns)
+    return pd.DataFrame(values, index=index, columns=columns)
+
+def _right_align(values, mask):
+    # Move each column's valid rows to the bottom (order preserved) so the last
+    # rows hold every ticker's most recent bars, even when calendars differ.
+    order = np.argsort(mask, axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0)
+
+def _rolling_sum(values, window):
+    """Rolling sums and valid-observation counts along axis 0, NaN-aware, via prefix sums."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((1, values.shape[1]))
+    csum = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    sums = np.full(values.shape, np.nan)
+    counts = np.zeros(values.shape)
+    if len(values) >= window:
+        sums[window - 1:] = csum[window:] - csum[:-window]
+        counts[window - 1:] = ccount[window:] - ccount[:-window]
+    # Windows shorter than `window` at the start of the history
+    head = min(window - 1, len(values))
+    sums[:head] = csum[1:head + 1]
+    counts[:head] = ccount[1:head + 1]
+    return sums, counts
+
+def latest_values(matrix):
+    """Last valid value of every column."""
+    values, index, columns = _unwrap(matrix)
+    aligned = _right_align(values, ~np.isnan(values))
+    return _wrap(aligned[-1], index, columns, latest_only=True)
+
+def bollinger_bands(close, window=20, no_of_stds=2, ddof=1, latest_only=False):
+    """
+    Calculate Bollinger Bands for every ticker of a wide close-price matrix.
+
+    :param close: DataFrame or array of closes shaped (dates, tickers).
+    :param window: The period for calculating the moving average.
+    :param no_of_stds: The number of standard deviations to consider for the band width.
+    :param ddof: Delta degrees of freedom of the rolling std (1 matches pandas, 0 matches ta).
+    :param latest_only: Only compute each ticker's most recent band instead of the full history.
+    :return: A dict with 'ma', 'upper_band' and 'lower_band', each shaped like the input
+             (or one value per ticker when latest_only is set).
+    """
+    values, index, columns = _unwrap(close)
+    valid = ~np.isnan(values)
+
+    if latest_only:
+        values = _right_align(values, valid)[-window:]
+        valid = ~np.isnan(values)
+
+    # Shift every column by a reference price so the sum-of-squares stays well conditioned
+    reference = values[np.argmax(valid, axis=0), np.arange(values.shape[1])]
+    reference = np.where(np.isnan(reference), 0.0, reference)
+    shifted = values - reference
+
+    if latest_only:
+        counts = valid.sum(axis=0).astype(float)
+        sums = np.nansum(shifted, axis=0)
+        sq_sums = np.nansum(shifted ** 2, axis=0)
+    else:
+        sums, counts = _rolling_sum(shifted, window)
+        sq_sums, _ = _rolling_sum(shifted ** 2, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sums / counts
+        var = (sq_sums - sums * mean) / (counts - ddof)
+    std = np.sqrt(np.clip(var, 0.0, None))
+    mean = np.where(counts >= window, mean + reference, np.nan)
+    std = np.where(counts >= window, std, np.nan)
+
+    return {
+        'ma': _wrap(mean, index, columns, latest_only),
+        'upper_band': _wrap(mean + std * no_of_stds, index, columns, latest_only),
+        'lower_band': _wrap(mean - std * no_of_stds, index, columns, latest_only),
+    }
+
+def _gains_and_losses(values):
+    valid = ~np.isnan(values)
+    # Difference against the previous valid close so gaps in the shared calendar are skipped
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    delta = np.empty_like(values)
+    delta[0] = np.nan
+    delta[1:] = filled[1:] - filled[:-1]
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[~valid] = np.nan
+    loss[~valid] = np.nan
+    return gain, loss
+
+def relative_strength_index(close, window=14, method='sma', latest_only=False):
+    """
+    Calculate the RSI for every ticker of a wide close-price matrix.
+
+    :param close: DataFrame or array of closes shaped (dates, tickers).
+    :param window: The period (number of days) over which to calculate the RSI.
+    :param method: 'sma' matches calculate_rsi, 'wilder' matches ta.momentum.RSIIndicator.
+    :param latest_only: Only return each ticker's most recent RSI.
+    :return: RSI values shaped like the input (or one value per ticker when latest_only is set).
+    """
+    values, index, columns = _unwrap(close)
+    if latest_only:
+        values = _right_align(values, ~np.isnan(values))
+        if method == 'sma':
+            values = values[-(window + 1):]
+    gain, loss = _gains_and_losses(values)
+
+    if method == 'sma':
+        if latest_only:
+            gain, loss = gain[-window:], loss[-window:]
+            counts = (~np.isnan(gain)).sum(axis=0)
+            with np.errstate(invalid='ignore'):
+                avg_gain = np.nansum(gain, axis=0) / counts
+                avg_loss = np.nansum(loss, axis=0) / counts
+        else:
+            gain_sums, counts = _rolling_sum(gain, window)
+            loss_sums, _ = _rolling_sum(loss, window)
+            with np.errstate(invalid='ignore'):
+                avg_gain = gain_sums / counts
+                avg_loss = loss_sums / counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    elif method == 'wilder':
+        alpha = 1.0 / window
+        avg_gain = np.full(values.shape, np.nan)
+        avg_loss = np.full(values.shape, np.nan)
+        seen = np.zeros(values.shape[1])
+        prev_gain = np.full(values.shape[1], np.nan)
+        prev_loss = np.full(values.shape[1], np.nan)
+        for t in range(len(values)):
+            row_valid = ~np.isnan(gain[t])
+            seen += row_valid
+            prev_gain = np.where(row_valid, np.where(np.isnan(prev_gain), gain[t], (1 - alpha) * prev_gain + alpha * gain[t]), prev_gain)
+            prev_loss = np.where(row_valid, np.where(np.isnan(prev_loss), loss[t], (1 - alpha) * prev_loss + alpha * loss[t]), prev_loss)
+            ready = row_valid & (seen >= window)
+            avg_gain[t] = np.where(ready, prev_gain, np.nan)
+            avg_loss[t] = np.where(ready, prev_loss, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100.0 - (100.0 / (1.0 + avg_gain / avg_loss)))
+        if latest_only:
+            rsi = rsi[-1]
+    else:
+        raise ValueError(f"Unknown RSI method: {method}")
+
+    return _wrap(rsi, index, columns, latest_only)
+
+def average_true_range(high, low, close, window=14, latest_only=False):
+    """
+    Calculate the true-range ATR for every ticker from aligned high/low/close matrices.
+
+    :param high: DataFrame or array of highs shaped (dates, tickers).
+    :param low: DataFrame or array of lows, aligned with high.
+    :param close: DataFrame or array of closes, aligned with high.
+    :param window: Number of bars in the rolling mean of the true range.
+    :param latest_only: Only return each ticker's most recent ATR.
+    :return: ATR values shaped like the input (or one value per ticker when latest_only is set).
+    """
+    high_values, index, columns = _unwrap(high)
+    low_values, _, _ = _unwrap(low)
+    close_values, _, _ = _unwrap(close)
+
+    if latest_only:
+        mask = ~np.isnan(close_values)
+        high_values = _right_align(high_values, mask)[-(window + 1):]
+        low_values = _right_align(low_values, mask)[-(window + 1):]
+        close_values = _right_align(close_values, mask)[-(window + 1):]
+
+    prev_close = np.empty_like(close_values)
+    prev_close[0] = np.nan
+    prev_close[1:] = close_values[:-1]
+
+    # fmax ignores NaN, matching the skipna max of the per-series calculation
+    true_range = np.fmax(np.fmax(high_values - low_values, np.abs(high_values - prev_close)),
+                         np.abs(low_values - prev_close))
+
+    if latest_only:
+        true_range = true_range[-window:]
+        counts = (~np.isnan(true_range)).sum(axis=0)
+        atr = np.where(counts >= window, np.nansum(true_range, axis=0) / window, np.nan)
+    else:
+        sums, counts = _rolling_sum(true_range, window)
+        atr = np.where(counts >= window, sums / window, np.nan)
+    return _wrap(atr, index, columns, latest_only)
@@ -0,0 +1,201 @@
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+
+# STOCK_ANALYSIS_TRACE=1 (or json/prometheus) turns tracing on for the whole run
+TRACE_ENV = 'STOCK_ANALYSIS_TRACE'
+TRACE_FILE_ENV = 'STOCK_ANALYSIS_TRACE_FILE'
+KINDS = ('fetch', 'cache', 'compute', 'render')
+
+_NOOP = nullcontext()
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'kind', 'ticker', 'parent', 'path', 'children', 'start')
+
+    def __init__(self, tracer, name, kind, ticker=None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.ticker = ticker
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1] if stack else None
+        self.path = f"{self.parent.path} > {self.name}" if self.parent else self.name
+        if self.ticker is None and self.parent is not None:
+            self.ticker = self.parent.ticker
+        self.children = 0.0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.tracer._stack().pop()
+        if self.parent is not None:
+            self.parent.children += elapsed
+        self.tracer._record(self, elapsed)
+        return False
+
+class Tracer:
+    """
+    Collects nested spans and counters for one run.
+
+    Spans are aggregated by their path from the outermost span of their thread, so the
+    report shows where each step's time went. Each span also records its self time (its
+    duration minus its child spans), and the report sums self time per kind and per ticker.
+    That answers "fetch, cache, compute or render?" without double counting. Spans opened
+    inside worker threads start a new path.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}
+            self.tickers = defaultdict(lambda: defaultdict(float))
+            self.counters = defaultdict(float)
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span, elapsed):
+        self_seconds = max(elapsed - span.children, 0.0)
+        with self._lock:
+            entry = self.spans.get(span.path)
+            if entry is None:
+                entry = self.spans[span.path] = {'name': span.name, 'kind': span.kind, 'count': 0,
+                                                 'seconds': 0.0, 'self_seconds': 0.0, 'max_seconds': 0.0}
+            entry['count'] += 1
+            entry['seconds'] += elapsed
+            entry['self_seconds'] += self_seconds
+            entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+            if span.ticker is not None:
+                self.tickers[span.ticker][span.kind] += self_seconds
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def snapshot(self):
+        with self._lock:
+            by_kind = defaultdict(float)
+            for entry in self.spans.values():
+                by_kind[entry['kind']] += entry['self_seconds']
+            return {
+                'started_at': self.started_at,
+                'wall_seconds': time.perf_counter() - self._started,
+                'by_kind': dict(by_kind),
+                'spans': [dict(entry, path=path) for path, entry in sorted(self.spans.items())],
+                'tickers': {ticker: dict(kinds) for ticker, kinds in sorted(self.tickers.items())},
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+            }
+
+tracer = Tracer(enabled=os.environ.get(TRACE_ENV, '').lower() not in ('', '0', 'false', 'off'))
+
+def enable():
+    tracer.enabled = True
+    tracer.reset()
+
+def disable():
+    tracer.enabled = False
+
+def span(name, kind, ticker=None):
+    """Context manager timing one step; a shared no-op when tracing is off."""
+    if not tracer.enabled:
+        return _NOOP
+    return _Span(tracer, name, kind, ticker)
+
+def count(name, value=1, **labels):
+    """Add `value` to a counter such as upstream_calls or cache_hits, labelled by keyword."""
+    if tracer.enabled:
+        tracer.count(name, value, **labels)
+
+def traced(kind, name=None):
+    """
+    Decorator wrapping every call of a function in a span.
+
+    The span is tagged with the function's `ticker` argument when it has one. With tracing
+    off the wrapper costs one attribute check.
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+        parameters = list(inspect.signature(func).parameters)
+        ticker_index = parameters.index('ticker') if 'ticker' in parameters else None
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            ticker = None
+            if ticker_index is not None:
+                ticker = args[ticker_index] if len(args) > ticker_index else kwargs.get('ticker')
+            with _Span(tracer, span_name, kind, ticker):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + '}'
+
+def format_prometheus(snapshot):
+    """Render a tracer snapshot in the Prometheus text exposition format."""
+    lines = ['# HELP stock_analysis_kind_self_seconds Self time spent per span kind.',
+             '# TYPE stock_analysis_kind_self_seconds gauge']
+    for kind, seconds in snapshot['by_kind'].items():
+        lines.append(f"stock_analysis_kind_self_seconds{_labels(kind=kind)} {seconds:.6f}")
+    for metric, field, help_text in (('span_seconds_total', 'seconds', 'Total time spent in a span.'),
+                                     ('span_self_seconds_total', 'self_seconds', 'Time spent in a span outside its child spans.'),
+                                     ('span_calls_total', 'count', 'Number of times a span was entered.')):
+        lines += [f"# HELP stock_analysis_{metric} {help_text}", f"# TYPE stock_analysis_{metric} counter"]
+        for entry in snapshot['spans']:
+            lines.append(f"stock_analysis_{metric}{_labels(path=entry['path'], kind=entry['kind'])} {entry[field]}")
+    seen = set()
+    for counter in snapshot['counters']:
+        metric = f"stock_analysis_{counter['name']}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_labels(**counter['labels'])} {counter['value']:g}")
+    return '\n'.join(lines) + '\n'
+
+def report(format='json'):
+    """Return the run's spans and counters as a JSON document or Prometheus text."""
+    snapshot = tracer.snapshot()
+    if format == 'prometheus':
+        return format_prometheus(snapshot)
+    return json.dumps(snapshot, indent=2)
+
+def write_report(path=None, format=None):
+    """
+    Write the report to `path`, or print it.
+
+    The defaults come from STOCK_ANALYSIS_TRACE_FILE and STOCK_ANALYSIS_TRACE=prometheus.
+    """
+    format = format or ('prometheus' if os.environ.get(TRACE_ENV, '').lower() == 'prometheus' else 'json')
+    path = path or os.environ.get(TRACE_FILE_ENV)
+    text = report(format)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+        print(f"Trace report written to {path}")
+    else:
+        print(text)
@@ -1,22 +1,35 @@
-from clear_cache import clear_data_cache
-from stock_analysis import get_stock_analysis, get_top_volatile_stocks
-from options_data_utils import calculate_hv, display_debit_spread_data, fetch_vix
-from stock_data_utils import filter_extreme_stocks
+import argparse
+
+import instrumentation
+
+# The menu imports each action's module (and with it pandas, yfinance, ta, ...) the first
+# time that action is chosen, so the prompt appears without loading any of them
 
 green_color_start = "\033[92m"
 orange_color_start = "\033[38;5;208m"
 color_reset = "\033[0m"
 
+def watch_screen(screen, **options):
+    """Offer to keep a one-shot screen's list current until Ctrl+C."""
+    if input("\nWatch for changes? (y/N): ").strip().lower() != 'y':
+        return
+    from watch_mode import Watcher
+    interval = float(input("Poll interval in seconds (default 60): ").strip() or 60)
+    watcher = Watcher(screen, **options)
+    watcher.start()
+    watcher.run(interval=interval)
+
 def main():
     while True:
         print("\nSelect an option:")
         print("1. Display data analysis for a specific stock")
         print("2. Identify top 10 most volatile NASDAQ-100 stocks with specified criteria")
         print("3. Fetch Options Chain Data and Highlight ATM/OTM Options")
-        print("4. Calculate Historical Volatility for a specific stock")
+        print("4. Calculate Historical Volatility for a specific stock or the whole universe")
         print("5. Display Historical VIX Value")
         print("6. Filter extreme level stocks")
         print("7. Clear the cache (Set to clear every Friday after market hours)")
+        print("8. Screen NASDAQ-100 stocks on fundamentals and technicals")
 
         choice = input("\nEnter your choice or type 'exit' to quit: ").strip().lower()  # .strip() removes any leading/trailing whitespace
             
@@ -24,37 +37,74 @@ def main():
             print("Exiting program. Goodbye!")
             break  # Exit the loop and end the program
         elif choice == '1':
+            from stock_analysis import get_stock_analysis
             ticker = input("Enter the ticker symbol: ").upper()
             get_stock_analysis(ticker)
         elif choice == '2':
+            from stock_analysis import get_top_volatile_stocks
             min_move = float(input("Enter the minimum dollar movement for the week: "))
             max_price = float(input("Enter the maximum price of the stock: "))
             get_top_volatile_stocks(min_move, max_price)
+            watch_screen('volatile', min_move=min_move, max_price=max_price)
         elif choice == '3':
+            from options_data_utils import display_debit_spread_data
             ticker = input("Enter the ticker symbol: ").upper()
             display_debit_spread_data(ticker)
         elif choice == '4':
-            ticker = input("Enter the ticker symbol: ").upper()
-            hv = calculate_hv(ticker)
-            print(f"\nHistorical Volatility (Annualized) for {ticker}: {hv:.2%}\n")
+            ticker = input("Enter the ticker symbol (or 'all' to rank the whole universe): ").upper()
+            if ticker == 'ALL':
+                from volatility import print_volatility_table, universe_volatility
+                print_volatility_table(universe_volatility())
+            else:
+                from options_data_utils import calculate_hv
+                hv = calculate_hv(ticker)
+                print(f"\nHistorical Volatility (Annualized) for {ticker}: {hv:.2%}\n")
         elif choice == '5':
+            from options_data_utils import fetch_vix
             vix = fetch_vix()
             print(f"\nHistorical VIX (Market Volatility Expectation - Annualized): {vix:.2f}\n")
         elif choice == '6':
+            from stock_data_utils import filter_extreme_stocks
             extreme_stocks = filter_extreme_stocks()
             print("\nTop Extreme Level Stocks:")
             for stock in extreme_stocks:
                 print(f"{orange_color_start}Ticker: {stock[0]}, Latest Price: {stock[1]}, RSI: {stock[2]}, Upper Band: {stock[3]}, Lower Band: {stock[4]}{color_reset}")
+            # The breakdown needs 13 months of the whole universe's bars, so it is opt-in
+            if extreme_stocks and input("\nShow which moves follow the market? (y/N): ").strip().lower() == 'y':
+                from correlation_engine import explain_extremes, print_exposure
+                print("\nMoving with the market or on their own:")
+                print_exposure(explain_extremes(extreme_stocks))
+            watch_screen('extreme')
         elif choice == '7':
+            from clear_cache import clear_data_cache
             print("Clearing the cache...")
             clear_data_cache()
             # Clear the cache here
             print("Cache cleared successfully.")
+        elif choice == '8':
+            from fundamentals_table import print_screen, screen
+            query = input("Enter a filter (e.g. forwardPE < 25 and revenueGrowth > 0.10 and rsi < 70), or press Enter for all: ").strip()
+            sort_by = input("Sort by column (default forwardPE): ").strip() or 'forwardPE'
+            try:
+                print_screen(screen(query or None, sort_by=sort_by, technicals=True))
+            except Exception as e:
+                print(f"\nInvalid screen: {e}\n")
         else:
             print("\nInvalid choice. Please enter a valid option.\n")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock analysis tool.")
+    parser.add_argument("--trace", nargs="?", const="json", choices=["json", "prometheus"],
+                        help="Record fetch/cache/compute/render timings and print a report on exit.")
+    parser.add_argument("--trace-file", help="Write the trace report to this file instead of printing it.")
+    args = parser.parse_args()
+    if args.trace:
+        instrumentation.enable()
+
     try:
         main()
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Exiting...")
+    finally:
+        if instrumentation.tracer.enabled:
+            instrumentation.write_report(path=args.trace_file, format=args.trace)
@@ -1,11 +1,122 @@
 import datetime
+from functools import lru_cache
 import pytz
 
-def get_next_friday_market_close():
-    now = datetime.datetime.now(pytz.timezone('US/Eastern'))
-    days_until_friday = (4 - now.weekday()) % 7
-    if days_until_friday == 0 and now.time() >= datetime.time(16, 0):
-        days_until_friday = 7
-    next_friday = now + datetime.timedelta(days=days_until_friday)
-    market_close_expiration = next_friday.replace(hour=16, minute=0, second=0, microsecond=0)
-    return market_close_expiration.timestamp()
+eastern = pytz.timezone('US/Eastern')
+market_open_time = datetime.time(9, 30)
+market_close_time = datetime.time(16, 0)
+early_close_time = datetime.time(13, 0)
+
+def _observed(date):
+    # Saturday holidays are observed on Friday, Sunday holidays on Monday
+    if date.weekday() == 5:
+        return date - datetime.timedelta(days=1)
+    if date.weekday() == 6:
+        return date + datetime.timedelta(days=1)
+    return date
+
+def _nth_weekday(year, month, weekday, n):
+    first = datetime.date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + datetime.timedelta(days=offset + 7 * (n - 1))
+
+def _last_weekday(year, month, weekday):
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return datetime.date(year, month, day)
+
+def get_market_holidays(year):
+    """Full-day NYSE/NASDAQ holidays for a year."""
+    holidays = {
+        _observed(datetime.date(year, 1, 1)),
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Presidents' Day
+        _easter(year) - datetime.timedelta(days=2),  # Good Friday
+        _last_weekday(year, 5, 0),  # Memorial Day
+        _observed(datetime.date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(datetime.date(year, 12, 25)),
+    }
+    if year >= 2022:
+        holidays.add(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+def is_trading_day(date):
+    return date.weekday() < 5 and date not in get_market_holidays(date.year)
+
+@lru_cache(maxsize=None)
+def get_early_closes(year):
+    """NYSE/NASDAQ sessions that close at 1:00 pm for a year."""
+    candidates = {
+        datetime.date(year, 7, 3),  # Independence Day eve
+        _nth_weekday(year, 11, 3, 4) + datetime.timedelta(days=1),  # Day after Thanksgiving
+        datetime.date(year, 12, 24),  # Christmas Eve
+    }
+    # An eve that falls on a weekend or is itself the observed holiday is not a session
+    return frozenset(date for date in candidates if is_trading_day(date))
+
+def session_close_time(date):
+    """Eastern wall-clock close of the session on a trading day."""
+    return early_close_time if date in get_early_closes(date.year) else market_close_time
+
+def _session_close(date):
+    return eastern.localize(datetime.datetime.combine(date, session_close_time(date)))
+
+def get_next_market_close(now=None):
+    """Timestamp of the next session close after now."""
+    now = now or datetime.datetime.now(eastern)
+    date = now.date()
+    while not is_trading_day(date) or _session_close(date) <= now:
+        date += datetime.timedelta(days=1)
+    return _session_close(date).timestamp()
+
+def get_next_friday_market_close(now=None):
+    """Timestamp of the close of the last session of the current trading week."""
+    now = now or datetime.datetime.now(eastern)
+    week_start = now.date() - datetime.timedelta(days=now.weekday())
+    while True:
+        # Last trading day of the week, e.g. Thursday when Friday is a holiday
+        days = [week_start + datetime.timedelta(days=i) for i in range(5)]
+        trading_days = [day for day in days if is_trading_day(day)]
+        if trading_days and _session_close(trading_days[-1]) > now:
+            return _session_close(trading_days[-1]).timestamp()
+        week_start += datetime.timedelta(days=7)
+
+def get_last_market_close(now=None):
+    """Timestamp of the most recent session close at or before now."""
+    now = now or datetime.datetime.now(eastern)
+    date = now.date()
+    while not is_trading_day(date) or _session_close(date) > now:
+        date -= datetime.timedelta(days=1)
+    return _session_close(date).timestamp()
+
+def seconds_until_expiration(policy, now=None):
+    """
+    Resolve a cache expiration policy to a number of seconds from now.
+
+    :param policy: 'session' (next market close), 'week' (close of the trading week),
+                   a number of seconds, or None for no expiration.
+    """
+    if policy is None or isinstance(policy, (int, float)):
+        return policy
+    now = now or datetime.datetime.now(eastern)
+    if policy == 'session':
+        return get_next_market_close(now) - now.timestamp()
+    if policy == 'week':
+        return get_next_friday_market_close(now) - now.timestamp()
+    raise ValueError(f"Unknown expiration policy: {policy}")
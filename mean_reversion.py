@@ -1,17 +1,38 @@
-import yfinance as yf
-import ta
+import sys
+import pandas as pd
+from bar_store import get_histories
+from indicator_engine import bollinger_bands, build_matrix, relative_strength_index
 
-# Fetch historical data
-ticker = "MDB"
-data = yf.download(ticker, start="2023-01-01", end="2024-12-31")
+def scan_mean_reversion(tickers, period="2y"):
+    """
+    Find the days where Close < BB_low and RSI < 30 for every ticker at once.
 
-# Calculate Bollinger Bands
-data['BB_high'], data['BB_mid'], data['BB_low'] = ta.volatility.bollinger_hband(data['Close']), ta.volatility.bollinger_mavg(data['Close']), ta.volatility.bollinger_lband(data['Close'])
+    Bands use ta's population std (ddof=0) and the RSI uses Wilder smoothing, matching
+    ta.volatility.bollinger_lband and ta.momentum.RSIIndicator.
 
-# Calculate RSI
-data['RSI'] = ta.momentum.RSIIndicator(data['Close']).rsi()
+    :param tickers: List of ticker symbols.
+    :return: A DataFrame of (Date, Ticker, Close, BB_low, RSI) rows for every opportunity.
+    """
+    # Fetch historical data for every ticker from the bar store
+    histories = {ticker: hist for ticker, (hist, error) in get_histories(tickers, period=period).items() if hist is not None}
+    close = build_matrix(histories, 'Close')
 
-# Example of identifying an oversold condition that might indicate a mean reversion opportunity
-mean_reversion_opportunities = data[(data['Close'] < data['BB_low']) & (data['RSI'] < 30)]
+    # Calculate Bollinger Bands and RSI over the whole (dates x tickers) matrix
+    bb_low = bollinger_bands(close, window=20, no_of_stds=2, ddof=0)['lower_band']
+    rsi = relative_strength_index(close, window=14, method='wilder')
 
-print(mean_reversion_opportunities[['Close', 'BB_low', 'RSI']])
+    # Example of identifying an oversold condition that might indicate a mean reversion opportunity
+    signals = (close < bb_low) & (rsi < 30)
+    opportunities = pd.DataFrame({
+        'Close': close.stack(),
+        'BB_low': bb_low.stack(),
+        'RSI': rsi.stack(),
+    })
+    opportunities.index.names = ['Date', 'Ticker']
+    return opportunities[signals.stack().reindex(opportunities.index, fill_value=False)]
+
+if __name__ == "__main__":
+    # Tickers from the command line; backtest_engine.py measures what these signals returned
+    tickers = sys.argv[1:] or ["MDB"]
+    mean_reversion_opportunities = scan_mean_reversion(tickers)
+    print(mean_reversion_opportunities[['Close', 'BB_low', 'RSI']])
@@ -0,0 +1,226 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_aggregation import bucket_labels
+from bar_store import get_histories
+from cache_utils import cache, universe_key
+from indicator_engine import average_true_range, bollinger_bands, build_matrix, latest_values, relative_strength_index
+from instrumentation import traced
+from options_data_utils import calculate_universe_hv
+from stock_data_utils import load_universe
+
+# Queryable columns; bar_date and bar_close record the bars each row was computed from
+METRICS = ['price', 'weekly_range', 'atr', 'rsi', 'upper_band', 'lower_band', 'band_position', 'hv']
+
+green_color_start = "\033[92m"
+color_reset = "\033[0m"
+
+def _empty_frame():
+    frame = pd.DataFrame({column: pd.Series(dtype='float64') for column in METRICS})
+    frame['bar_date'] = pd.Series(dtype='datetime64[ns]')
+    frame['bar_close'] = pd.Series(dtype='float64')
+    frame.index = pd.Index([], name='Symbol', dtype=object)
+    return frame
+
+def _weekly_range(high, low):
+    """High-low range of each ticker's latest week, the week of its last bar (as in watch mode)."""
+    high_values, low_values = high.to_numpy(dtype=float), low.to_numpy(dtype=float)
+    weeks = np.asarray(bucket_labels(high.index, '1wk')[0])
+    valid = ~np.isnan(high_values)
+    last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+    in_week = (weeks[:, None] == weeks[last][None, :]) & valid
+    return np.nanmax(np.where(in_week, high_values, np.nan), axis=0) - np.nanmin(np.where(in_week, low_values, np.nan), axis=0)
+
+@traced('compute')
+def compute_metrics(histories):
+    """
+    One row of metrics per ticker, computed over aligned (dates x tickers) matrices.
+
+    :param histories: Dict mapping ticker to its daily OHLCV DataFrame (a year of bars).
+    :return: A DataFrame indexed by Symbol with the METRICS columns plus bar_date and bar_close.
+             band_position is %B: 0 at the lower band, 1 at the upper band.
+    """
+    if not histories:
+        return _empty_frame()
+    close, high, low = (build_matrix(histories, column) for column in ('Close', 'High', 'Low'))
+    bands = bollinger_bands(close, latest_only=True)
+    price = latest_values(close)
+    frame = pd.DataFrame({
+        'price': price,
+        'weekly_range': _weekly_range(high, low),
+        'atr': average_true_range(high, low, close, latest_only=True),
+        'rsi': relative_strength_index(close, latest_only=True),
+        'upper_band': bands['upper_band'],
+        'lower_band': bands['lower_band'],
+        'band_position': (price - bands['lower_band']) / (bands['upper_band'] - bands['lower_band']),
+        'hv': calculate_universe_hv(close),
+    })
+    frame['bar_date'] = pd.Series({ticker: hist.index[-1] for ticker, hist in histories.items()}, dtype='datetime64[ns]')
+    frame['bar_close'] = price
+    frame.index.name = 'Symbol'
+    return frame
+
+class MetricsTable:
+    """
+    Materialized per-ticker metrics with every column kept in sorted order.
+
+    Threshold queries binary-search the sorted columns, and top-N queries slice them, so
+    re-querying with new parameters never touches the bars. NaN values never match.
+
+    :param frame: compute_metrics' DataFrame.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._values = {}
+        self._order = {}
+        self._sorted = {}
+        for column in METRICS:
+            values = frame[column].to_numpy(dtype=float)
+            order = np.argsort(values, kind='stable')  # NaN sorts last
+            order = order[:np.count_nonzero(~np.isnan(values))]
+            self._values[column] = values
+            self._order[column] = order
+            self._sorted[column] = values[order]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _span(self, column, low=None, high=None):
+        """Slice of the column's sorted order with low <= value <= high."""
+        values = self._sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return slice(start, max(start, stop))
+
+    def positions(self, **bounds):
+        """
+        Row positions matching every bound, e.g. positions(weekly_range=(5, None), price=(None, 500)).
+
+        The narrowest bound is found by binary search; the others are checked on its rows only.
+        """
+        if not bounds:
+            return np.arange(len(self.frame))
+        spans = {column: self._span(column, *bound) for column, bound in bounds.items()}
+        narrowest = min(spans, key=lambda column: spans[column].stop - spans[column].start)
+        rows = self._order[narrowest][spans[narrowest]]
+        for column, (low, high) in bounds.items():
+            if column == narrowest:
+                continue
+            values = self._values[column][rows]
+            keep = ~np.isnan(values)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            rows = rows[keep]
+        return np.sort(rows)
+
+    def select(self, **bounds):
+        """Rows matching every (low, high) bound; None leaves a side open."""
+        return self.frame.iloc[self.positions(**bounds)]
+
+    def top(self, column, count=10, ascending=False, **bounds):
+        """The `count` rows with the highest (or lowest) `column` among those matching `bounds`."""
+        order = self._order[column]
+        if not bounds:
+            rows = order[:count] if ascending else order[::-1][:count]
+        else:
+            rows = self.positions(**bounds)
+            values = self._values[column][rows]
+            rows, values = rows[~np.isnan(values)], values[~np.isnan(values)]
+            keys = values if ascending else -values
+            if len(rows) > count:
+                best = np.argpartition(keys, count - 1)[:count]
+                rows, keys = rows[best], keys[best]
+            rows = rows[np.argsort(keys, kind='stable')]
+        return self.frame.iloc[rows]
+
+def extreme_stocks(table, count=10):
+    """filter_extreme_stocks' rule: price at or beyond a band with RSI >= 70 / <= 30, highest RSI first."""
+    candidates = pd.concat([table.select(rsi=(70, None)), table.select(rsi=(None, 30))])
+    extreme = candidates[((candidates['price'] >= candidates['upper_band']) & (candidates['rsi'] >= 70)) |
+                         ((candidates['price'] <= candidates['lower_band']) & (candidates['rsi'] <= 30))]
+    return extreme.sort_values('rsi', ascending=False, kind='stable').head(count)
+
+def volatile_stocks(table, min_move, max_price, count=10):
+    """get_top_volatile_stocks' rule: weekly range >= min_move and price <= max_price, widest range first."""
+    return table.top('weekly_range', count, weekly_range=(min_move, None), price=(None, max_price))
+
+def table_cache_key(tickers):
+    """Key of the cached metrics table of a universe in the 'metrics_table' namespace."""
+    return universe_key(tickers)
+
+def update_metrics(frame, histories):
+    """
+    Bring a metrics frame up to date with the bars, recomputing only rows whose bars changed.
+
+    :param frame: A previous compute_metrics frame, or None.
+    :param histories: Dict mapping ticker to its daily OHLCV DataFrame; rows of other tickers are dropped.
+    :return: (frame, list of recomputed tickers).
+    """
+    frame = frame if frame is not None else _empty_frame()
+    stored = frame.reindex(list(histories))
+    changed = [ticker for ticker, hist in histories.items()
+               if stored.at[ticker, 'bar_date'] != hist.index[-1] or stored.at[ticker, 'bar_close'] != hist['Close'].iloc[-1]]
+    if not changed and len(frame) == len(histories):
+        return frame, changed
+    rows = compute_metrics({ticker: histories[ticker] for ticker in changed})
+    return pd.concat([stored.drop(index=changed), rows]).reindex(list(histories)), changed
+
+@traced('compute')
+def metrics_table(tickers=None, provider=None, max_workers=8):
+    """
+    The universe's MetricsTable, recomputed only for tickers whose bars changed.
+
+    The table is trusted until the next market close, when the bar store refreshes too. After
+    that the bars are re-read, and only rows whose last bar date or close differ are recomputed.
+
+    :param tickers: Symbols to cover; defaults to the screener universe.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    cache_key = table_cache_key(tickers)
+    cached = cache.get('metrics_table', cache_key)
+    if cached is not None and cache.get('metrics_table', f"{cache_key}_checked"):
+        return MetricsTable(cached)
+
+    histories = {}
+    for ticker, (hist, error) in get_histories(tickers, period="1y", provider=provider, max_workers=max_workers).items():
+        if error or hist is None:
+            print(f"Error fetching data for {ticker}: {error}")
+            continue
+        histories[ticker] = hist
+    frame, _ = update_metrics(cached, histories)
+    if frame is not cached:
+        cache.set('metrics_table', cache_key, frame)
+    cache.set('metrics_table', f"{cache_key}_checked", True, expire='session')
+    return MetricsTable(frame)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the per-ticker metrics table.")
+    parser.add_argument("--sort-by", default="weekly_range", choices=METRICS)
+    parser.add_argument("--ascending", action="store_true")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--min", nargs=2, action="append", default=[], metavar=("COLUMN", "VALUE"),
+                        help="Lower bound, e.g. --min weekly_range 5; repeatable.")
+    parser.add_argument("--max", nargs=2, action="append", default=[], metavar=("COLUMN", "VALUE"),
+                        help="Upper bound, e.g. --max price 500; repeatable.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = metrics_table()
+    loaded = time.perf_counter()
+    bounds = {}
+    for column, value in args.min:
+        bounds[column] = (float(value), bounds.get(column, (None, None))[1])
+    for column, value in args.max:
+        bounds[column] = (bounds.get(column, (None, None))[0], float(value))
+    result = table.top(args.sort_by, args.top, ascending=args.ascending, **bounds)
+    queried = time.perf_counter()
+    print(f"\n{green_color_start}{len(result)} of {len(table)} tickers, by {args.sort_by}:{color_reset}\n")
+    print(result[METRICS].to_string(float_format=lambda v: f"{v:,.2f}"))
+    print(f"\nLoaded in {(loaded - start) * 1000:.1f} ms, queried in {(queried - loaded) * 1000:.2f} ms")
@@ -1,18 +1,29 @@
-import yfinance as yf
-from diskcache import Cache
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from bar_store import get_history
+from cache_utils import cache
+from data_providers import get_provider
+from instrumentation import span, traced
+from options_pricing import iv_term_structure, price_chains
+from spread_scanner import scan_debit_spreads
 
 red_color_start = "\033[91m"
 green_color_start = "\033[92m"
 blue_color_start = "\033[94m"
 gray_color_start = "\033[90m"
+orange_color_start = "\033[38;5;208m"
 color_reset = "\033[0m"
 
-cache = Cache('./cache')
+moneyness_labels = {
+    'ITM': f"{green_color_start}ITM{color_reset}",
+    'ATM': f"{orange_color_start}ATM{color_reset}",
+    'OTM': f"{red_color_start}OTM{color_reset}",
+}
 
-def fetch_options_data_for_debit_spread(ticker, expiration_preference, expiration_length, bid_ask_spread_pct_threshold):
+def _expirations_through(provider, ticker, expiration_preference, expiration_length):
+    """Every listed expiration up to the one nearest to the preferred horizon, and that nearest date."""
     # Convert expiration preference to actual date
     if expiration_preference == "days":
         target_date = datetime.now() + timedelta(days=expiration_length)
@@ -20,65 +31,90 @@ def fetch_options_data_for_debit_spread(ticker, expiration_preference, expiratio
         target_date = datetime.now() + timedelta(weeks=expiration_length)
     elif expiration_preference == "months":
         target_date = datetime.now() + timedelta(days=30 * expiration_length)  # Approximation
-    
-    # Find the nearest expiration date to the target_date
-    stock = yf.Ticker(ticker)
-    options_dates = [datetime.strptime(date, '%Y-%m-%d') for date in stock.options]
+
+    options_dates = sorted(datetime.strptime(date, '%Y-%m-%d') for date in provider.options(ticker))
     nearest_expiration_date = min(options_dates, key=lambda date: abs(date - target_date))
-    cache_key = f"{ticker}_debit_spread_{nearest_expiration_date.strftime('%Y-%m-%d')}"
+    expirations = [date.strftime('%Y-%m-%d') for date in options_dates if date <= nearest_expiration_date]
+    return expirations, nearest_expiration_date.strftime('%Y-%m-%d')
 
-    if cache_key in cache:
-        print(f"\n{blue_color_start}Loading debit spread data from cache for {ticker} for expiration {nearest_expiration_date.strftime('%Y-%m-%d')}.{color_reset}\n")
-        debit_spreads = cache[cache_key]
-    else:
-        print(f"\n{green_color_start}Fetching debit spread data for {ticker}.{color_reset}\n")
+def _fetch_chains(provider, ticker, expirations, max_workers=8):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(expirations, executor.map(lambda date: provider.option_chain(ticker, date), expirations)))
+
+def _latest_price(ticker):
+    """The ticker's latest close, or None when its history cannot be fetched."""
+    hist, error = get_history(ticker, period="5d")
+    if hist is None or hist.empty:
+        print(f"\n{red_color_start}Failed to fetch the latest price for {ticker}: {error}{color_reset}\n")
+        return None
+    return hist['Close'].iloc[-1]
+
+@traced('compute')
+def fetch_options_data_for_debit_spread(ticker, expiration_preference, expiration_length, bid_ask_spread_pct_threshold, max_workers=8):
+    # Scan every expiration up to the one nearest to the target_date
+    provider = get_provider()
+    expirations, nearest_expiration = _expirations_through(provider, ticker, expiration_preference, expiration_length)
+    cache_key = f"{ticker}_{nearest_expiration}_{bid_ask_spread_pct_threshold}"
+
+    debit_spreads = cache.get('debit_spreads', cache_key)
+    if debit_spreads is not None:
+        print(f"\n{blue_color_start}Loading debit spread data from cache for {ticker} through expiration {nearest_expiration}.{color_reset}\n")
+        return debit_spreads
+
+    print(f"\n{green_color_start}Fetching debit spread data for {ticker} across {len(expirations)} expirations.{color_reset}\n")
+    try:
+        chains = _fetch_chains(provider, ticker, expirations, max_workers)
+
+        with span('scan_debit_spreads', 'compute'):
+            debit_spreads = scan_debit_spreads({date: chain.calls for date, chain in chains.items()},
+                                               bid_ask_spread_pct_threshold=bid_ask_spread_pct_threshold)
+    except Exception as e:
+        print(f"\n{red_color_start}An error occurred: {e}{color_reset}\n")
+        return pd.DataFrame()
+
+    # The spreads stand on their own; pricing only adds the moneyness column
+    contracts = None
+    stock_price = _latest_price(ticker)
+    if stock_price is not None:
         try:
-            opts = stock.option_chain(nearest_expiration_date.strftime('%Y-%m-%d'))
-            calls = opts.calls
-            
-            # Assume ATM is the strike closest to the current stock price
-            stock_price = stock.history(period="1d")['Close'].iloc[-1]
-            calls['type'] = np.where(calls['strike'] == stock_price, f"{blue_color_start}ATM{color_reset}",
-                             np.where(calls['strike'] < stock_price, f"{green_color_start}ITM{color_reset}", f"{red_color_start}OTM{color_reset}"))
-            
-            # Filter and sort logic
-            calls['bidAskSpreadPct'] = ((calls['ask'] - calls['bid']) / calls['ask']) * 100  # Calculate bid-ask spread percentage
-            filtered_calls = calls[calls['bidAskSpreadPct'] <= bid_ask_spread_pct_threshold]  # Filter by bid-ask spread percentage threshold
-            
-            potential_spreads = []
-            for i, call in filtered_calls.iterrows():
-                # Assuming a basic structure for a debit spread: buying this call option
-                # Risk-reward ratio: Simplified calculation (actual calculation may vary based on strategy)
-                risk_reward_ratio = (call['strike'] + call['lastPrice']) / call['lastPrice']
-                
-                # Break-even analysis (for call options): strike price + premium paid
-                break_even_price = call['strike'] + call['lastPrice']
-                
-                # Selecting based on highest open interest and implied volatility within filtered criteria
-                spread = {
-                    f"strike": call['strike'],
-                    f"lastPrice": call['lastPrice'],
-                    f"bid": call['bid'],
-                    f"ask": call['ask'],
-                    f"openInterest": call['openInterest'],
-                    f"impliedVolatility": call['impliedVolatility'],
-                    f"bidAskSpreadPct": call['bidAskSpreadPct'],
-                    f"riskRewardRatio": risk_reward_ratio,
-                    f"breakEvenPrice": break_even_price,
-                    f"expirationDate": nearest_expiration_date.strftime('%Y-%m-%d'),
-                    "": call['type']
-                }
-                potential_spreads.append(spread)
-            
-            # Sorting the potential spreads by open interest to select the top 10
-            debit_spreads = pd.DataFrame(potential_spreads).sort_values(by='openInterest', ascending=False).head(10)
-            cache.set(cache_key, debit_spreads, expire=86400)  # Cache for 24 hours
+            # Price the same chains now, so fetch_option_greeks is a cache hit
+            with span('price_chains', 'compute'):
+                contracts = price_chains(chains, stock_price)
+            cache.set('option_greeks', f"{ticker}_{nearest_expiration}", contracts, expire='session')
         except Exception as e:
-            print(f"\n{red_color_start}An error occurred: {e}{color_reset}\n")
-            debit_spreads = pd.DataFrame()
-    
+            print(f"\n{red_color_start}Failed to price the option chains for {ticker}: {e}{color_reset}\n")
+
+    if contracts is not None and not contracts.empty and not debit_spreads.empty:
+        # Mark the long leg relative to the strike nearest the current stock price
+        calls = contracts[contracts['type'] == 'call']
+        moneyness = debit_spreads.merge(calls[['expirationDate', 'strike', 'moneyness']], how='left',
+                                        left_on=['expirationDate', 'longStrike'], right_on=['expirationDate', 'strike'])['moneyness']
+        debit_spreads[""] = moneyness.map(moneyness_labels).to_numpy()
+    cache.set('debit_spreads', cache_key, debit_spreads, expire='session')  # Cache until the next market close
     return debit_spreads
 
+@traced('compute')
+def fetch_option_greeks(ticker, expiration_preference, expiration_length, max_workers=8):
+    """
+    Solved IV and greeks for every call and put expiring up to the preferred horizon.
+
+    :return: A DataFrame of contracts, see options_pricing.price_chains; empty when the
+             underlying's price is unavailable.
+    """
+    provider = get_provider()
+    expirations, nearest_expiration = _expirations_through(provider, ticker, expiration_preference, expiration_length)
+    cache_key = f"{ticker}_{nearest_expiration}"
+    contracts = cache.get('option_greeks', cache_key)
+    if contracts is None:
+        stock_price = _latest_price(ticker)
+        if stock_price is None:
+            return pd.DataFrame()
+        chains = _fetch_chains(provider, ticker, expirations, max_workers)
+        contracts = price_chains(chains, stock_price)
+        cache.set('option_greeks', cache_key, contracts, expire='session')
+    return contracts
+
+@traced('render')
 def display_debit_spread_data(ticker):
     expiration_preference = input("Choose expiration preference (days, weeks, months): ")
     expiration_length = int(input("Enter the number for the expiration length: "))
@@ -91,21 +127,48 @@ def display_debit_spread_data(ticker):
         print(debit_spread_data)
     else:
         print("No suitable debit call spreads found or no data to display.")
+
+    try:
+        contracts = fetch_option_greeks(ticker, expiration_preference, expiration_length)
+    except Exception as e:
+        print(f"\n{red_color_start}Failed to price the option chains for {ticker}: {e}{color_reset}\n")
+        return debit_spread_data
+    if not contracts.empty:
+        atm = contracts[contracts['moneyness'] == 'ATM']
+        print(f"\n{'='*40} ATM Options for {ticker}: {'='*40}\n")
+        print(atm[['expirationDate', 'type', 'strike', 'mid', 'impliedVolatility', 'solvedIV', 'delta', 'gamma', 'theta', 'vega']].to_string(index=False))
+        print(f"\n{'='*40} Implied vs Historical Volatility: {'='*40}\n")
+        print(iv_term_structure(contracts, calculate_hv(ticker)))
         
     return debit_spread_data
 
 # Calculate Historical Volatility
+@traced('compute')
 def calculate_hv(ticker, period='1y'):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period=period)
+    cache_key = f"{ticker}_{period}"
+    cached_hv = cache.get('hv', cache_key)
+    if cached_hv is not None:
+        return cached_hv
+
+    hist, error = get_history(ticker, period=period)
+    if hist is None:
+        print(f"\n{red_color_start}Failed to fetch data for {ticker}: {error}{color_reset}\n")
+        return float('nan')
     # Calculate daily logarithmic returns
     log_returns = np.log(hist['Close'] / hist['Close'].shift(1))
     # Calculate standard deviation of log returns
     hv = log_returns.std() * np.sqrt(252)  # Annualize
+    cache.set('hv', cache_key, hv, expire='session')
     return hv
 
+def calculate_universe_hv(close_matrix):
+    """Annualized close-to-close HV of every column of a (dates x tickers) close matrix, like calculate_hv."""
+    log_returns = np.log(close_matrix / close_matrix.shift(1))
+    return log_returns.std() * np.sqrt(252)
+
 # Fetch VIX for market volatility expectations
+@traced('compute')
 def fetch_vix(period="1y"):
-    vix = yf.Ticker("^VIX")
-    current_vix = vix.history(period=period)['Close'].iloc[-1]
+    vix, error = get_history("^VIX", period=period)
+    current_vix = vix['Close'].iloc[-1]
     return current_vix
\ No newline at end of file
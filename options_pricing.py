@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+RISK_FREE_RATE = 0.045
+SQRT_2PI = np.sqrt(2 * np.pi)
+MIN_VOLATILITY = 1e-4
+MAX_VOLATILITY = 5.0
+
+def norm_cdf(x):
+    """
+    Standard normal CDF, vectorized, accurate to double precision.
+
+    Hart's (1968) rational approximation as given by West, "Better approximations to
+    cumulative normal functions" (2005); numpy has no erf and scipy is not a dependency.
+    """
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x)
+    e = np.exp(-z * z / 2)
+    numerator = ((((((3.52624965998911e-02 * z + 0.700383064443688) * z + 6.37396220353165) * z
+                   + 33.912866078383) * z + 112.079291497871) * z + 221.213596169931) * z + 220.206867912376)
+    denominator = (((((((8.83883476483184e-02 * z + 1.75566716318264) * z + 16.064177579207) * z
+                      + 86.7807322029461) * z + 296.564248779674) * z + 637.333633378831) * z
+                    + 793.826512519948) * z + 440.413735824752)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tail = np.where(z < 7.07106781186547, e * numerator / denominator,
+                        e / (z + 1 / (z + 2 / (z + 3 / (z + 4 / (z + 0.65))))) / SQRT_2PI)
+    tail = np.where(z > 37, 0.0, tail)
+    return np.where(x > 0, 1 - tail, tail)
+
+def norm_pdf(x):
+    x = np.asarray(x, dtype=float)
+    return np.exp(-x * x / 2) / SQRT_2PI
+
+def _d1_d2(spot, strike, years, volatility, rate, dividend):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma_root_t = volatility * np.sqrt(years)
+        d1 = (np.log(spot / strike) + (rate - dividend + volatility * volatility / 2) * years) / sigma_root_t
+    return d1, d1 - sigma_root_t
+
+def black_scholes_price(spot, strike, years, volatility, is_call=True, rate=RISK_FREE_RATE, dividend=0.0):
+    """
+    European option prices for whole arrays of contracts at once.
+
+    :param spot: Underlying price(s).
+    :param strike: Strike price(s).
+    :param years: Time to expiration in years.
+    :param volatility: Annualized volatility (0.25 for 25%).
+    :param is_call: True for calls, False for puts; may be an array.
+    :param rate: Continuously compounded risk-free rate.
+    :param dividend: Continuous dividend yield.
+    :return: An array of prices broadcast over the inputs.
+    """
+    spot, strike, years, volatility = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (spot, strike, years, volatility)))
+    d1, d2 = _d1_d2(spot, strike, years, volatility, rate, dividend)
+    spot_term = spot * np.exp(-dividend * years)
+    strike_term = strike * np.exp(-rate * years)
+    call = spot_term * norm_cdf(d1) - strike_term * norm_cdf(d2)
+    put = strike_term * norm_cdf(-d2) - spot_term * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+def greeks(spot, strike, years, volatility, is_call=True, rate=RISK_FREE_RATE, dividend=0.0):
+    """
+    Black-Scholes delta, gamma, theta and vega for arrays of contracts.
+
+    :return: A dict of arrays. Theta is per calendar day and vega per 1 point (1%) of volatility,
+             the units option chains are usually quoted in.
+    """
+    spot, strike, years, volatility = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (spot, strike, years, volatility)))
+    d1, d2 = _d1_d2(spot, strike, years, volatility, rate, dividend)
+    carry = np.exp(-dividend * years)
+    discount = np.exp(-rate * years)
+    density = norm_pdf(d1)
+    root_t = np.sqrt(years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = carry * density / (spot * volatility * root_t)
+        decay = -spot * carry * density * volatility / (2 * root_t)
+    call_theta = decay - rate * strike * discount * norm_cdf(d2) + dividend * spot * carry * norm_cdf(d1)
+    put_theta = decay + rate * strike * discount * norm_cdf(-d2) - dividend * spot * carry * norm_cdf(-d1)
+    return {
+        'delta': np.where(is_call, carry * norm_cdf(d1), carry * (norm_cdf(d1) - 1)),
+        'gamma': gamma,
+        'theta': np.where(is_call, call_theta, put_theta) / 365,
+        'vega': spot * carry * density * root_t / 100,
+    }
+
+def implied_volatility(price, spot, strike, years, is_call=True, rate=RISK_FREE_RATE, dividend=0.0,
+                       tolerance=1e-8, max_iterations=100):
+    """
+    Solve Black-Scholes implied volatility for every contract at once.
+
+    Each contract keeps a bracket [low, high] that always contains the root (the price is
+    increasing in volatility). It takes Newton steps and falls back to bisection whenever a
+    step leaves the bracket or vega vanishes, so every contract converges without a
+    per-contract loop. Prices outside the no-arbitrage bounds give NaN.
+
+    :param price: Option prices, e.g. bid/ask mids.
+    :return: An array of annualized implied volatilities.
+    """
+    price, spot, strike, years = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (price, spot, strike, years)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    carry = spot * np.exp(-dividend * years)
+    discount = strike * np.exp(-rate * years)
+    lower_bound = np.where(is_call, np.maximum(carry - discount, 0.0), np.maximum(discount - carry, 0.0))
+    upper_bound = np.where(is_call, carry, discount)
+    solvable = (price > lower_bound) & (price < upper_bound) & (years > 0) & (spot > 0) & (strike > 0)
+
+    low = np.full(price.shape, MIN_VOLATILITY)
+    high = np.full(price.shape, MAX_VOLATILITY)
+    # Brenner-Subrahmanyam start, which is close for near-the-money contracts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = np.clip(np.sqrt(2 * np.pi / years) * price / spot, 0.05, 1.0)
+    volatility = np.where(solvable, volatility, np.nan)
+    active = solvable.copy()
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        diff = black_scholes_price(spot[active], strike[active], years[active], volatility[active],
+                                   is_call[active], rate, dividend) - price[active]
+        vega = greeks(spot[active], strike[active], years[active], volatility[active],
+                      is_call[active], rate, dividend)['vega'] * 100
+        current = volatility[active]
+        low[active] = np.where(diff < 0, current, low[active])
+        high[active] = np.where(diff > 0, current, high[active])
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = current - diff / vega
+        inside = (step > low[active]) & (step < high[active]) & (vega > 1e-12)
+        updated = np.where(inside, step, (low[active] + high[active]) / 2)
+        volatility[active] = updated
+        done = (np.abs(diff) < tolerance) | (np.abs(updated - current) < tolerance * np.maximum(current, 1.0))
+        indices = np.flatnonzero(active)
+        active[indices[done]] = False
+    return volatility
+
+def years_to_expiration(expiration, now=None):
+    """Year fraction until 4pm US/Eastern on the expiration date, at least one hour."""
+    now = pd.Timestamp.now(tz='US/Eastern') if now is None else pd.Timestamp(now)
+    if now.tz is None:
+        now = now.tz_localize('US/Eastern')
+    close = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(expiration))).tz_localize('US/Eastern') + pd.Timedelta(hours=16)
+    seconds = np.maximum((close - now).total_seconds().to_numpy(), 3600.0)
+    return seconds / (365.0 * 24 * 3600)
+
+def classify_moneyness(strikes, spot, is_call, expirations=None):
+    """
+    Label contracts ITM, ATM or OTM.
+
+    ATM is the strike nearest to the spot price within each expiration. Exact equality
+    with a float spot price almost never matches.
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), strikes.shape)
+    distance = np.abs(strikes - spot)
+    groups = pd.Series(distance).groupby(np.asarray(expirations) if expirations is not None else np.zeros(len(strikes)))
+    atm = distance == groups.transform('min').to_numpy()
+    in_the_money = np.where(is_call, strikes < spot, strikes > spot)
+    return np.where(atm, 'ATM', np.where(in_the_money, 'ITM', 'OTM'))
+
+def price_chains(chains, spot, now=None, rate=RISK_FREE_RATE, dividend=0.0):
+    """
+    Solve IV from mid prices and compute greeks for every contract of many expirations.
+
+    :param chains: Dict mapping expiration ('YYYY-MM-DD') to an OptionChain (or a (calls, puts) pair).
+    :param spot: Current underlying price.
+    :return: One DataFrame of all contracts with expirationDate, type, moneyness, mid,
+             solvedIV, delta, gamma, theta and vega columns added.
+    """
+    frames = []
+    for expiration, chain in chains.items():
+        calls, puts = chain[0], chain[1]
+        frames.append(calls.assign(expirationDate=expiration, type='call'))
+        frames.append(puts.assign(expirationDate=expiration, type='put'))
+    if not frames:
+        return pd.DataFrame()
+    contracts = pd.concat(frames, ignore_index=True)
+
+    bid = contracts['bid'].to_numpy(dtype=float)
+    ask = contracts['ask'].to_numpy(dtype=float)
+    # Quotes without a two-sided market fall back to the last trade
+    mid = np.where((bid > 0) & (ask > bid), (bid + ask) / 2, contracts['lastPrice'].to_numpy(dtype=float))
+    strike = contracts['strike'].to_numpy(dtype=float)
+    is_call = (contracts['type'] == 'call').to_numpy()
+    years = years_to_expiration(contracts['expirationDate'].to_numpy(), now)
+
+    contracts['moneyness'] = classify_moneyness(strike, spot, is_call, contracts['expirationDate'].to_numpy())
+    contracts['mid'] = mid
+    contracts['solvedIV'] = implied_volatility(mid, spot, strike, years, is_call, rate, dividend)
+    for name, values in greeks(spot, strike, years, contracts['solvedIV'].to_numpy(), is_call, rate, dividend).items():
+        contracts[name] = values
+    return contracts
+
+def iv_term_structure(contracts, hv):
+    """
+    ATM implied volatility per expiration compared with historical volatility.
+
+    :param contracts: Output of price_chains.
+    :param hv: Annualized historical volatility, e.g. from calculate_hv.
+    :return: A DataFrame indexed by expiration with atmIV, historicalVolatility and ivHvRatio.
+    """
+    atm = contracts[contracts['moneyness'] == 'ATM']
+    summary = atm.groupby('expirationDate')['solvedIV'].mean().to_frame('atmIV')
+    summary['historicalVolatility'] = hv
+    summary['ivHvRatio'] = summary['atmIV'] / hv
+    return summary
@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_histories
+from indicator_engine import build_matrix
+from stock_data_utils import load_universe
+
+DEFAULT_GRID = {
+    'bb_window': (10, 15, 20, 30, 50),
+    'no_of_stds': (1.5, 2.0, 2.5, 3.0),
+    'rsi_window': (7, 14, 21),
+    'rsi_thresholds': ((70, 30), (75, 25), (80, 20)),
+}
+# The settings filter_extreme_stocks uses today
+CURRENT_SETTINGS = {'bb_window': 20, 'no_of_stds': 2.0, 'rsi_window': 14, 'rsi_thresholds': (70, 30)}
+
+# Arrays of the worker processes, attached to the parent's shared memory block
+_shared = {}
+
+def _prefix(values):
+    """Cumulative sums along axis 0 with a leading row of zeros, NaNs counted as zero."""
+    out = np.zeros((values.shape[0] + 1, values.shape[1]))
+    np.cumsum(np.nan_to_num(values, nan=0.0), axis=0, out=out[1:])
+    return out
+
+def _window(prefix, window):
+    """Sum over the trailing `window` rows of every bar, in O(1) per bar from a prefix array."""
+    out = np.full((prefix.shape[0] - 1, prefix.shape[1]), np.nan)
+    if window < prefix.shape[0]:
+        out[window - 1:] = prefix[window:] - prefix[:-window]
+    return out
+
+def prepare_arrays(close, horizon=5):
+    """
+    Everything the sweep needs, computed once: prefix sums of prices, squared prices, valid
+    bars, RSI gains and losses, plus each bar's forward return over `horizon` bars.
+
+    Prices are shifted by each ticker's first close before squaring so the prefix sums of
+    squares do not lose precision over long histories.
+    """
+    values = close.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    first = values[valid.argmax(axis=0), np.arange(values.shape[1])]
+    centered = values - first
+    delta = np.diff(values, axis=0, prepend=np.nan)
+    forward = np.full(values.shape, np.nan)
+    forward[:-horizon] = values[horizon:] / values[:-horizon] - 1
+    return {
+        'close': values,
+        'offset': first[None, :],
+        'sum': _prefix(centered),
+        'sum_sq': _prefix(centered * centered),
+        'count': _prefix(valid.astype(float)),
+        'gain_count': _prefix((~np.isnan(delta)).astype(float)),
+        'gain': _prefix(np.where(delta > 0, delta, 0.0)),
+        'loss': _prefix(np.where(delta < 0, -delta, 0.0)),
+        'forward': forward,
+    }
+
+def _share(arrays):
+    """Copy arrays into one shared memory block; returns the block and a {name: (offset, shape)} layout."""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.shape)
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, array in arrays.items():
+        start, shape = layout[name]
+        np.ndarray(shape, dtype=np.float64, buffer=block.buf, offset=start)[...] = array
+    return block, layout
+
+def _attach(name, layout):
+    block = shared_memory.SharedMemory(name=name)
+    _shared['block'] = block  # Keep the mapping alive for the views below
+    for key, (offset, shape) in layout.items():
+        _shared[key] = np.ndarray(shape, dtype=np.float64, buffer=block.buf, offset=offset)
+
+def _evaluate(cell):
+    """Score every band width and RSI cutoff of one (bb_window, rsi_window) cell."""
+    bb_window, rsi_window, stds, thresholds = cell
+    arrays = _shared
+    close = arrays['close']
+
+    # Bollinger mean and sample std from prefix sums: O(1) per bar whatever the window
+    full = _window(arrays['count'], bb_window) == bb_window
+    sums = _window(arrays['sum'], bb_window)
+    sums_sq = _window(arrays['sum_sq'], bb_window)
+    mean = sums / bb_window
+    with np.errstate(invalid='ignore'):
+        std = np.sqrt(np.maximum((sums_sq - sums * sums / bb_window) / (bb_window - 1), 0.0))
+    ma = np.where(full, mean + arrays['offset'], np.nan)
+
+    # Simple-average RSI, like calculate_rsi once its window is full
+    rsi_full = _window(arrays['gain_count'], rsi_window) == rsi_window
+    avg_gain = _window(arrays['gain'], rsi_window)
+    avg_loss = _window(arrays['loss'], rsi_window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(rsi_full, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss), np.nan)
+
+    forward = arrays['forward']
+    has_forward = ~np.isnan(forward)
+    rows = []
+    for no_of_stds, (upper, lower) in itertools.product(stds, thresholds):
+        with np.errstate(invalid='ignore'):
+            overbought = (close >= ma + std * no_of_stds) & (rsi >= upper) & has_forward
+            oversold = (close <= ma - std * no_of_stds) & (rsi <= lower) & has_forward
+        # Oversold signals bet on a rise and overbought ones on a fall
+        signed = np.concatenate([forward[oversold], -forward[overbought]])
+        rows.append({
+            'bb_window': bb_window, 'no_of_stds': no_of_stds, 'rsi_window': rsi_window,
+            'rsi_upper': upper, 'rsi_lower': lower,
+            'signals': len(signed), 'oversold': int(oversold.sum()), 'overbought': int(overbought.sum()),
+            'hit_rate': float((signed > 0).mean()) if len(signed) else np.nan,
+            'mean_forward_return': float(signed.mean()) if len(signed) else np.nan,
+        })
+    return rows
+
+def sweep(close, grid=None, horizon=5, max_workers=None, min_signals=30):
+    """
+    Evaluate every combination of a parameter grid over a (dates x tickers) close matrix.
+
+    The prefix sums are built once and shared with a process pool through shared memory;
+    each task scores one (bb_window, rsi_window) pair for every band width and RSI cutoff.
+
+    :param grid: Dict of bb_window, no_of_stds, rsi_window and rsi_thresholds ((upper, lower)
+                 pairs); defaults to DEFAULT_GRID.
+    :param horizon: Bars ahead the forward return of each signal is measured over.
+    :param min_signals: Parameter sets with fewer signals are ranked last.
+    :return: A DataFrame of parameter sets ranked by hit rate, then mean forward return.
+    """
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    cells = [(bb_window, rsi_window, tuple(grid['no_of_stds']), tuple(grid['rsi_thresholds']))
+             for bb_window, rsi_window in itertools.product(grid['bb_window'], grid['rsi_window'])]
+
+    block, layout = _share(prepare_arrays(close, horizon))
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_attach, initargs=(block.name, layout)) as executor:
+            rows = [row for cell_rows in executor.map(_evaluate, cells) for row in cell_rows]
+    finally:
+        block.close()
+        block.unlink()
+
+    results = pd.DataFrame(rows)
+    results['current'] = ((results['bb_window'] == CURRENT_SETTINGS['bb_window']) &
+                          (results['no_of_stds'] == CURRENT_SETTINGS['no_of_stds']) &
+                          (results['rsi_window'] == CURRENT_SETTINGS['rsi_window']) &
+                          (results['rsi_upper'] == CURRENT_SETTINGS['rsi_thresholds'][0]) &
+                          (results['rsi_lower'] == CURRENT_SETTINGS['rsi_thresholds'][1]))
+    results['enough_signals'] = results['signals'] >= min_signals
+    results = results.sort_values(['enough_signals', 'hit_rate', 'mean_forward_return'], ascending=False)
+    return results.reset_index(drop=True)
+
+def sweep_universe(tickers=None, period='5y', grid=None, horizon=5, max_workers=None, min_signals=30, provider=None):
+    """Run sweep() over the screener universe's stored histories."""
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    histories = {ticker: hist for ticker, (hist, error) in
+                 get_histories(tickers, period=period, provider=provider).items() if hist is not None}
+    return sweep(build_matrix(histories, 'Close'), grid=grid, horizon=horizon,
+                 max_workers=max_workers, min_signals=min_signals)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep Bollinger/RSI settings over the universe.")
+    parser.add_argument("--period", default="5y", help="History window, e.g. 5y.")
+    parser.add_argument("--horizon", type=int, default=5, help="Bars ahead each signal's return is measured over.")
+    parser.add_argument("--workers", type=int, help="Worker processes (defaults to the CPU count).")
+    parser.add_argument("--min-signals", type=int, default=30, help="Rank sets with fewer signals last.")
+    parser.add_argument("--top", type=int, default=15, help="Rows of the ranked table to print.")
+    parser.add_argument("--bb-windows", type=int, nargs="+", default=DEFAULT_GRID['bb_window'])
+    parser.add_argument("--stds", type=float, nargs="+", default=DEFAULT_GRID['no_of_stds'])
+    parser.add_argument("--rsi-windows", type=int, nargs="+", default=DEFAULT_GRID['rsi_window'])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = sweep_universe(period=args.period, horizon=args.horizon, max_workers=args.workers, min_signals=args.min_signals,
+                             grid={'bb_window': args.bb_windows, 'no_of_stds': args.stds, 'rsi_window': args.rsi_windows})
+    print(f"\nTop {args.top} of {len(results)} parameter sets by hit rate ({args.horizon}-bar forward return):\n")
+    print(results.head(args.top).drop(columns=['enough_signals']).to_string(index=False))
+    current = results[results['current']]
+    if not current.empty:
+        print(f"\nCurrent settings rank #{current.index[0] + 1}:")
+        print(current.drop(columns=['enough_signals']).to_string(index=False))
+    print(f"\nSwept {len(results)} parameter sets in {time.perf_counter() - start:.2f}s")
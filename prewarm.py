@@ -0,0 +1,115 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from tqdm import tqdm
+
+import bar_store
+from bar_store import bars_to_frame
+from cache_utils import cache
+from data_providers import period_start
+from indicator_engine import average_true_range, build_matrix
+from metrics_table import table_cache_key, update_metrics
+from options_data_utils import calculate_universe_hv
+from stock_data_utils import load_universe
+from streaming_indicators import advance_indicator_states
+
+green_color_start = "\033[92m"
+color_reset = "\033[0m"
+
+@contextmanager
+def _stage(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
+
+def prewarm_universe(tickers=None, provider=None, max_workers=8):
+    """
+    Fetch and compute the metrics table that filter_extreme_stocks and get_top_volatile_stocks
+    query, plus the per-ticker ATR and HV, for the whole universe, advance the saved streaming
+    indicator states, then publish it all in one step.
+
+    Nothing is written until every fetch and computation has finished. The metrics table, ATR,
+    HV and streaming indicator state entries are then committed in a single cache transaction,
+    so the screens see either the old or the new values. The bar store is not versioned: bars
+    are swapped in ticker by ticker, and a reader of raw bars during the publish can see some
+    tickers refreshed and others not. Each ticker's bars are swapped in before its metadata,
+    so such a reader at worst refetches a ticker, never treats stale bars as fresh.
+
+    :param tickers: Symbols to prewarm; defaults to the screener CSV.
+    :param provider: Market data provider; defaults to the active provider.
+    :param max_workers: Maximum number of concurrent upstream requests.
+    :return: A dict of seconds spent per stage.
+    """
+    timings = {}
+    store = bar_store.store
+
+    with _stage(timings, 'load universe'):
+        if tickers is None:
+            tickers = load_universe()['Symbol'].tolist()
+
+    updates = {}
+    errors = {}
+    with _stage(timings, 'fetch bars'):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(store.fetch_update, ticker, "1y", provider): ticker for ticker in tickers}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Prewarming stocks", colour='blue'):
+                ticker = futures[future]
+                bars, meta, error = future.result()
+                if error:
+                    errors[ticker] = error
+                elif bars is not None:
+                    updates[ticker] = (bars, meta)
+
+    with _stage(timings, 'compute'):
+        histories = {}
+        for ticker in tickers:
+            if ticker in updates:
+                histories[ticker] = bars_to_frame(updates[ticker][0], "1y")
+            elif ticker not in errors:
+                hist = store.read(ticker, "1y")
+                if hist is not None and not hist.empty:
+                    histories[ticker] = hist
+        # Options 2 and 6 query the metrics table; only rows whose bars changed are recomputed
+        metrics_key = table_cache_key(tickers)
+        metrics, _ = update_metrics(cache.get('metrics_table', metrics_key), histories)
+        atr_values = {}
+        hv_values = {}
+        indicator_states = {}
+        if histories:
+            recent = {ticker: hist[hist.index >= period_start("3mo")] for ticker, hist in histories.items()}
+            atr_values = average_true_range(build_matrix(recent, 'High'), build_matrix(recent, 'Low'),
+                                            build_matrix(recent, 'Close'), latest_only=True).dropna().to_dict()
+            hv_values = calculate_universe_hv(build_matrix(histories, 'Close')).dropna().to_dict()
+            # Saved streaming state only needs the bars that arrived since the last prewarm
+            _, indicator_states = advance_indicator_states(histories)
+
+    with _stage(timings, 'publish'):
+        # Per-ticker swaps; the cache entries derived from these bars land together below
+        for ticker, (bars, meta) in updates.items():
+            store.commit(ticker, bars, meta)
+        with cache.disk.transact():
+            cache.set('metrics_table', metrics_key, metrics)
+            cache.set('metrics_table', f"{metrics_key}_checked", True, expire='session')
+            cache.set_many('atr', atr_values, expire='week')
+            cache.set_many('hv', {f"{ticker}_1y": hv for ticker, hv in hv_values.items()}, expire='session')
+            cache.set_many('indicator_state', indicator_states)
+
+    for ticker, error in errors.items():
+        print(f"Error fetching data for {ticker}: {error}")
+    print(f"\n{green_color_start}Prewarmed {len(histories)} of {len(tickers)} tickers "
+          f"({len(updates)} refreshed, {len(errors)} failed).{color_reset}")
+    return timings
+
+def print_stage_summary(timings):
+    print("\nTime spent per stage:")
+    for stage, seconds in timings.items():
+        print(f" - {stage}: {seconds:.2f}s")
+    print(f" - total: {sum(timings.values()):.2f}s\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prewarm the bar store and cache for the whole universe.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch workers.")
+    args = parser.parse_args()
+
+    print_stage_summary(prewarm_universe(max_workers=args.workers))
@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+import pandas as pd
+
+from data_providers import get_provider, period_start, set_provider
+
+class CoalescingProvider:
+    """
+    Provider wrapper that deduplicates identical and overlapping requests within a session.
+
+    The first caller for a ticker issues the upstream request; callers that arrive while it
+    is in flight wait on the same future instead of issuing another. History requests whose
+    window is already covered by an earlier, longer fetch are served as a slice of it.
+
+    :param provider: The upstream provider to wrap.
+    :param widen_to: Optional period (e.g. '1y') every history fetch is widened to, so a
+                     short first request also covers the longer windows that follow it.
+    """
+
+    def __init__(self, provider, widen_to=None):
+        self.provider = provider
+        self.widen_to = widen_to
+        self.requests = 0
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+        self._histories = {}
+        self._infos = {}
+
+    def __getattr__(self, name):
+        # Requests this layer does not coalesce go straight to the upstream provider
+        return getattr(self.provider, name)
+
+    @property
+    def saved_calls(self):
+        return self.requests - self.upstream_calls
+
+    def _single_flight(self, table, key, covers, fetch):
+        with self._lock:
+            self.requests += 1
+            entry = table.get(key)
+            if entry is not None and covers(entry):
+                return entry[-1], False
+            future = Future()
+            table[key] = fetch[0] + (future,)
+            self.upstream_calls += 1
+        try:
+            future.set_result(fetch[1]())
+        except Exception as e:
+            future.set_exception(e)
+            # Let the next caller retry instead of replaying the failure
+            with self._lock:
+                if table.get(key, (None,))[-1] is future:
+                    del table[key]
+        return future, True
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        start = pd.Timestamp(start) if start is not None else period_start(period)
+        fetch_start = min(start, period_start(self.widen_to)) if self.widen_to else start
+
+        future, _ = self._single_flight(
+            self._histories, (ticker, interval),
+            covers=lambda entry: entry[0] <= start,
+            fetch=((fetch_start,), lambda: self.provider.history(ticker, interval=interval,
+                                                                 start=fetch_start.strftime('%Y-%m-%d'))))
+        return _slice_from(future.result(), start)
+
+    def info(self, ticker):
+        future, _ = self._single_flight(self._infos, ticker, covers=lambda entry: True,
+                                        fetch=((), lambda: self.provider.info(ticker)))
+        return future.result()
+
+def _slice_from(hist, start):
+    if hist is None or hist.empty:
+        return hist
+    if hist.index.tz is not None:
+        start = start.tz_localize(hist.index.tz)
+    return hist[hist.index >= start]
+
+@contextmanager
+def coalescing_session(widen_to=None):
+    """Route every provider request made inside the block through one CoalescingProvider."""
+    upstream = get_provider()
+    session = CoalescingProvider(upstream, widen_to=widen_to)
+    set_provider(session)
+    try:
+        yield session
+    finally:
+        set_provider(upstream)
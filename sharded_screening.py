@@ -0,0 +1,157 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+from bar_store import BarStore, store as default_store
+from data_providers import create_provider, get_provider
+from instrumentation import traced
+from metrics_table import MetricsTable, compute_metrics, extreme_stocks, volatile_stocks
+from stock_data_utils import load_universe
+
+CHUNK_SIZE = 250
+# Screen name -> rule applied to each shard's table and again to the merged shard results
+SCREENS = {
+    'extreme': lambda table, count, options: extreme_stocks(table, count),
+    'volatile': lambda table, count, options: volatile_stocks(table, options.get('min_move', 0.0),
+                                                              options.get('max_price', float('inf')), count),
+}
+
+green_color_start = "\033[92m"
+orange_color_start = "\033[38;5;208m"
+color_reset = "\033[0m"
+
+def chunks(tickers, size=CHUNK_SIZE):
+    for start in range(0, len(tickers), size):
+        yield tickers[start:start + size]
+
+def screen_shard(tickers, directory, screens, count=10, options=None, period="1y", refresh=True, provider_name=None):
+    """
+    Run screens over one shard of the universe, inside a worker process.
+
+    Bars are read straight from the memory-mapped bar store, so nothing but ticker names goes
+    to the worker and only each screen's top `count` rows come back. Stale tickers are brought
+    up to date first when `refresh` is set.
+
+    :param directory: Bar store directory.
+    :param screens: Names of SCREENS to run.
+    :param provider_name: Provider to refresh from (see data_providers.PROVIDERS); defaults to the active one.
+    :return: ({screen: DataFrame of its top rows}, stats) with 'screened', 'errors' ({ticker: error})
+             and the worker's 'peak_memory_mb'.
+    """
+    store = BarStore(directory)
+    provider = create_provider(provider_name) if provider_name else get_provider()
+    histories, errors = {}, {}
+    for ticker in tickers:
+        error = store.update(ticker, period, provider) if refresh else None
+        hist = store.read(ticker, period)
+        if hist is None or hist.empty:
+            errors[ticker] = error or "No data"
+            continue
+        histories[ticker] = hist
+    table = MetricsTable(compute_metrics(histories))
+    results = {name: SCREENS[name](table, count, options or {}) for name in screens}
+    return results, {'screened': len(histories), 'errors': errors, 'peak_memory_mb': _peak_memory_mb()}
+
+@traced('compute')
+def screen_universe(tickers, screens=('extreme', 'volatile'), count=10, options=None, workers=None,
+                    chunk_size=CHUNK_SIZE, directory=None, period="1y", refresh=True, provider_name=None):
+    """
+    Run screens over a universe of any size, one chunk per task on a process pool.
+
+    Each worker holds one chunk's bars at a time and returns its top rows, so memory is
+    bounded by the chunk size and worker count, not the universe. The top rows of the
+    union are the top rows of the per-shard tops, so merging re-applies each screen to the
+    shard results.
+
+    :param screens: Names of SCREENS; 'volatile' reads min_move and max_price from `options`.
+    :param workers: Processes; defaults to the CPU count.
+    :param directory: Bar store directory; defaults to the shared store.
+    :return: ({screen: DataFrame of the top `count` rows}, stats) with 'screened', 'errors'
+             ({ticker: error}) and 'peak_memory_mb' of the largest worker.
+    """
+    directory = directory or default_store.directory
+    merged = {name: [] for name in screens}
+    stats = {'screened': 0, 'errors': {}, 'peak_memory_mb': 0.0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(screen_shard, chunk, directory, screens, count, options, period, refresh, provider_name)
+                   for chunk in chunks(list(tickers), chunk_size)]
+        for future in futures:
+            results, shard = future.result()
+            stats['screened'] += shard['screened']
+            stats['errors'].update(shard['errors'])
+            stats['peak_memory_mb'] = max(stats['peak_memory_mb'], shard['peak_memory_mb'])
+            for name, rows in results.items():
+                merged[name].append(rows)
+    return {name: SCREENS[name](MetricsTable(pd.concat(parts) if parts else compute_metrics({})), count, options or {})
+            for name, parts in merged.items()}, stats
+
+def synthetic_universe(size):
+    return [f"SYN{i:04d}" for i in range(size)]
+
+def _peak_memory_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else float('nan')
+
+def print_results(results):
+    for name, rows in results.items():
+        print(f"\n{orange_color_start}Top {name} stocks:{color_reset}")
+        for ticker, row in rows.iterrows():
+            print(f"{green_color_start}{ticker}: price {row['price']:.2f}, RSI {row['rsi']:.2f}, "
+                  f"weekly range {row['weekly_range']:.2f}{color_reset}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen a large universe in shards on a process pool.")
+    parser.add_argument("--universe", help="Screener CSV with a Symbol column; defaults to the NASDAQ-100 CSV.")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Screen N synthetic tickers in a scratch bar store instead.")
+    parser.add_argument("--screen", choices=list(SCREENS), action="append", help="Screens to run (default: all).")
+    parser.add_argument("--min-move", type=float, default=0.0, help="Smallest weekly range of the volatile screen.")
+    parser.add_argument("--max-price", type=float, default=float('inf'), help="Highest price of the volatile screen.")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count()],
+                        help="Worker counts to time, e.g. 1 2 4 8 to measure scaling.")
+    args = parser.parse_args()
+
+    screens = args.screen or list(SCREENS)
+    options = {'min_move': args.min_move, 'max_price': args.max_price}
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.synthetic:
+            tickers, directory, provider_name = synthetic_universe(args.synthetic), os.path.join(scratch, 'bar_store'), 'synthetic'
+        else:
+            if args.universe:
+                tickers = pd.read_csv(args.universe)['Symbol'].tolist()
+            else:
+                tickers = load_universe()['Symbol'].tolist()
+            directory, provider_name = default_store.directory, None
+
+        # Fill (or refresh) the bar store once, so the timed runs below only screen
+        start = time.perf_counter()
+        results, stats = screen_universe(tickers, screens, args.top, options, max(args.workers),
+                                         args.chunk_size, directory, provider_name=provider_name)
+        print(f"Synced bars of {len(tickers)} tickers in {time.perf_counter() - start:.2f}s")
+        for ticker, error in list(stats['errors'].items())[:10]:
+            print(f"Error fetching data for {ticker}: {error}")
+
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            results, stats = screen_universe(tickers, screens, args.top, options, workers, args.chunk_size,
+                                             directory, refresh=False)
+            seconds = time.perf_counter() - start
+            # Efficiency relative to the first worker count
+            baseline = baseline or seconds * workers
+            print(f"{workers} worker(s): {stats['screened']} tickers in {seconds:.2f}s "
+                  f"({stats['screened'] / seconds:,.0f} tickers/s, "
+                  f"{baseline / seconds / workers:.0%} of linear scaling)")
+            print(f"  peak memory: {_peak_memory_mb():.0f} MB in the parent, "
+                  f"{stats['peak_memory_mb']:.0f} MB in the largest worker")
+        print_results(results)
@@ -0,0 +1,118 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+def _stack_chains(chains):
+    """Pad every expiration's calls into (expirations, strikes) arrays sorted by strike."""
+    expirations = list(chains)
+    width = max((len(calls) for calls in chains.values()), default=0)
+    columns = ['strike', 'bid', 'ask', 'openInterest', 'impliedVolatility']
+    stacked = {column: np.full((len(expirations), width), np.nan) for column in columns}
+    for row, expiration in enumerate(expirations):
+        calls = chains[expiration].sort_values('strike')
+        for column in columns:
+            stacked[column][row, :len(calls)] = calls[column].to_numpy(dtype=float)
+    return expirations, stacked
+
+def scan_debit_spreads(chains, bid_ask_spread_pct_threshold=None, min_open_interest=1, top_n=10,
+                       sort_by='rewardRiskRatio'):
+    """
+    Rank every vertical call debit spread across a set of option chains.
+
+    Each spread buys the lower strike at the ask and sells the higher strike at the bid.
+    All long/short pairs of all expirations are evaluated at once by broadcasting.
+
+    :param chains: Dict mapping expiration date ('YYYY-MM-DD') to that expiration's calls DataFrame.
+    :param bid_ask_spread_pct_threshold: Maximum bid-ask spread, as a percentage of the ask, for either leg.
+    :param min_open_interest: Minimum open interest for either leg.
+    :param top_n: Number of spreads to return.
+    :param sort_by: Column to rank by, descending.
+    :return: A DataFrame with the top spreads, best first.
+    """
+    if not chains:
+        return pd.DataFrame()
+    expirations, legs = _stack_chains(chains)
+    strike, bid, ask, open_interest = legs['strike'], legs['bid'], legs['ask'], legs['openInterest']
+
+    # Liquidity filter applied to every leg
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread_pct = (ask - bid) / ask * 100
+    liquid = (bid > 0) & (ask > 0) & (open_interest >= min_open_interest)
+    if bid_ask_spread_pct_threshold is not None:
+        liquid &= spread_pct <= bid_ask_spread_pct_threshold
+
+    # Axis 1 is the long leg, axis 2 the short leg
+    long_strike, short_strike = strike[:, :, None], strike[:, None, :]
+    net_debit = ask[:, :, None] - bid[:, None, :]
+    spread_width = short_strike - long_strike
+    max_profit = spread_width - net_debit
+    valid = liquid[:, :, None] & liquid[:, None, :] & (spread_width > 0) & (net_debit > 0) & (max_profit > 0)
+
+    exp_idx, long_idx, short_idx = np.nonzero(valid)
+    if not len(exp_idx):
+        return pd.DataFrame()
+    debit = net_debit[exp_idx, long_idx, short_idx]
+    profit = max_profit[exp_idx, long_idx, short_idx]
+    spreads = {
+        'expirationDate': np.asarray(expirations)[exp_idx],
+        'longStrike': strike[exp_idx, long_idx],
+        'shortStrike': strike[exp_idx, short_idx],
+        'netDebit': debit,
+        'maxProfit': profit,
+        'maxLoss': debit,
+        'breakEvenPrice': strike[exp_idx, long_idx] + debit,
+        'rewardRiskRatio': profit / debit,
+        'longOpenInterest': open_interest[exp_idx, long_idx],
+        'shortOpenInterest': open_interest[exp_idx, short_idx],
+        'longImpliedVolatility': legs['impliedVolatility'][exp_idx, long_idx],
+        'longBidAskSpreadPct': spread_pct[exp_idx, long_idx],
+        'shortBidAskSpreadPct': spread_pct[exp_idx, short_idx],
+    }
+
+    # Partial sort: only the top N candidates are ordered
+    scores = spreads[sort_by]
+    count = min(top_n, len(scores))
+    top = np.argpartition(-scores, count - 1)[:count]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return pd.DataFrame({column: values[top] for column, values in spreads.items()}).reset_index(drop=True)
+
+def save_chain_fixture(path, chains, stock_price):
+    """Save option chains and the underlying price to a CSV fixture for offline scans."""
+    frames = [calls.assign(expirationDate=expiration, underlyingPrice=stock_price) for expiration, calls in chains.items()]
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+
+def load_chain_fixture(path):
+    """Load a fixture written by save_chain_fixture, returning (chains, stock_price)."""
+    data = pd.read_csv(path)
+    stock_price = float(data['underlyingPrice'].iloc[0])
+    chains = {expiration: calls.drop(columns=['expirationDate', 'underlyingPrice']).reset_index(drop=True)
+              for expiration, calls in data.groupby('expirationDate', sort=True)}
+    return chains, stock_price
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan vertical call debit spreads in a saved option chain fixture.")
+    parser.add_argument("fixture", help="CSV written by save_chain_fixture.")
+    parser.add_argument("--save", metavar="TICKER", help="First save TICKER's nearest chains from the active provider to the fixture.")
+    parser.add_argument("--expirations", type=int, default=4, help="Number of expirations --save records.")
+    parser.add_argument("--threshold", type=float, help="Maximum bid-ask spread of either leg, as a percentage of the ask.")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.save:
+        from data_providers import get_provider
+        provider = get_provider()
+        chains = {expiration: provider.option_chain(args.save, expiration)
+                  for expiration in provider.options(args.save)[:args.expirations]}
+        stock_price = next(iter(chains.values())).underlying['regularMarketPrice']
+        save_chain_fixture(args.fixture, {expiration: chain.calls for expiration, chain in chains.items()}, stock_price)
+        print(f"Saved {len(chains)} expirations of {args.save} calls to {args.fixture}")
+
+    chains, stock_price = load_chain_fixture(args.fixture)
+    start = time.perf_counter()
+    spreads = scan_debit_spreads(chains, bid_ask_spread_pct_threshold=args.threshold, top_n=args.top)
+    seconds = time.perf_counter() - start
+    print(spreads.to_string(float_format=lambda v: f"{v:,.2f}"))
+    print(f"\nScanned {sum(len(calls) for calls in chains.values())} calls across {len(chains)} expirations "
+          f"(underlying {stock_price:.2f}) in {seconds * 1000:.2f} ms")
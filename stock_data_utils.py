@@ -1,85 +1,81 @@
+import datetime
 import os
-import pickle
-from diskcache import Cache
-from tqdm import tqdm
 
-import yfinance as yf
 import pandas as pd
 import ta
-import time
-from market_time_utils import get_next_friday_market_close
+from bar_aggregation import bucket_label, get_bars, resample_bars
+from bar_store import get_histories, get_history
+from indicator_engine import bollinger_bands as bollinger_bands_matrix, build_matrix, latest_values, relative_strength_index
+from instrumentation import span, traced
+from market_time_utils import is_trading_day
 
 red_color_start = "\033[91m"
 green_color_start = "\033[92m"
 blue_color_start = "\033[94m"
 color_reset = "\033[0m"
 
-cache = Cache('./cache')
-
 current_directory = os.path.dirname(__file__)
 
 csv_file_path = os.path.join(current_directory, 'stocks-screener-02-29-2024.csv')
 
-def fetch_data_with_progress_bar(ticker):
-    """Fetch historical data with a loading indicator."""
-    print(f"Fetching data for {ticker}...")
-    for _ in tqdm(range(1), desc=f"Loading {ticker}"):
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="1y")
-            if hist.empty:
-                return None, "No data"
-            return hist, None
-        except Exception as e:
-            return None, str(e)
-
-def fetch_weekly_range(ticker):
-    cache_key = f"{ticker}_weekly_range"
+INTRADAY_TIMEFRAMES = ('5m', '15m', '30m', '1h')
+# History each timeframe needs for a 20-bar Bollinger Band and 14-bar RSI
+INDICATOR_PERIODS = {'1d': '3mo', '1wk': '1y', '1mo': '5y'}
+
+def load_universe():
+    """The screener universe: one row per symbol with its Last/High/Low snapshot."""
+    return pd.read_csv(csv_file_path)
+
+def set_universe_file(path):
+    global csv_file_path
+    csv_file_path = path
+
+def opens_its_period(timestamp, timeframe):
+    """Whether a daily bar is the first session of its week (or month), so a roll-up starting there is complete."""
+    session = bucket_label(timestamp, timeframe).date()
+    while not is_trading_day(session):
+        session += datetime.timedelta(days=1)
+    return pd.Timestamp(timestamp).date() == session
+
+@traced('render')
+def fetch_weekly_range(ticker, timeframe='1wk'):
+    """Print the high-low range of the ticker's last 12 weeks of bars, rolled up from daily (or 5m) bars."""
     try:
-        if cache_key in cache:
-            print(f"\n{blue_color_start}Loading weekly range from cache for {ticker}.{color_reset}\n")
-            weekly_data = cache[cache_key]
-        else:
-            print(f"\n{green_color_start}Fetching weekly range data for {ticker}.{color_reset}\n")
-            weekly_data = yf.download(ticker, period='12wk', interval='1wk')
-            if not weekly_data.empty:
-                weekly_data['Weekly Range'] = weekly_data['High'] - weekly_data['Low']
-                expiration_time = get_next_friday_market_close() - time.time()
-                cache.set(cache_key, weekly_data, expire=expiration_time)
-            else:
-                print(f"\n{red_color_start}Failed to fetch weekly data.{color_reset}\n")
-        
-        if not weekly_data.empty:
-            print(weekly_data[['High', 'Low', 'Close', 'Weekly Range']])
+        print(f"\n{blue_color_start}Loading {timeframe} range for {ticker}.{color_reset}\n")
+        base_data, error = get_bars(ticker, '5m' if timeframe in INTRADAY_TIMEFRAMES else '1d', period='12wk')
+        if base_data is None:
+            print(f"\n{red_color_start}Failed to fetch weekly data for {ticker}: {error}{color_reset}\n")
+            return
+        with span('resample_bars', 'compute'):
+            weekly_data = resample_bars(base_data, timeframe)
+            weekly_data['Weekly Range'] = weekly_data['High'] - weekly_data['Low']
+        # The 12wk window rarely starts on a Monday, so its first week would show a partial range
+        if timeframe not in INTRADAY_TIMEFRAMES and len(base_data) and not opens_its_period(base_data.index[0], timeframe):
+            weekly_data = weekly_data.iloc[1:]
+        print(weekly_data[['High', 'Low', 'Close', 'Weekly Range']])
     except Exception as e:
         print(f"\n{red_color_start}An error occurred while fetching weekly range for {ticker}: {e}{color_reset}\n")
 
-def fetch_and_display_technical_indicators(ticker):
-    cache_key = f"{ticker}_daily_technical_indicators"
+@traced('render')
+def fetch_and_display_technical_indicators(ticker, timeframe='1d'):
     try:
-        if cache_key in cache:
-            print(f"\n{blue_color_start}Loading daily technical indicators from cache for {ticker}.{color_reset}\n")
-            daily_data = cache[cache_key]
+        print(f"\n{blue_color_start}Loading {timeframe} data for technical indicators for {ticker}.{color_reset}\n")
+        bars, error = get_bars(ticker, timeframe, period=INDICATOR_PERIODS.get(timeframe, '3mo'))
+        if bars is not None:
+            bars = bars.copy()  # Daily bars are a read-only view of the bar store
+            with span('ta_indicators', 'compute'):
+                bars['RSI'] = ta.momentum.RSIIndicator(bars['Close']).rsi()
+                bars['BB_high'] = ta.volatility.bollinger_hband(bars['Close'])
+                bars['BB_mid'] = ta.volatility.bollinger_mavg(bars['Close'])
+                bars['BB_low'] = ta.volatility.bollinger_lband(bars['Close'])
+            print(f"\nTechnical Indicators (RSI and Bollinger Bands) on {timeframe} bars:\n")
+            print(bars[['RSI', 'BB_high', 'BB_mid', 'BB_low']].tail())
         else:
-            print(f"\n{green_color_start}Fetching daily data for technical indicators for {ticker}.{color_reset}\n")
-            daily_data = yf.download(ticker, period='3mo', interval='1d')
-            if not daily_data.empty:
-                daily_data['RSI'] = ta.momentum.RSIIndicator(daily_data['Close']).rsi()
-                daily_data['BB_high'] = ta.volatility.bollinger_hband(daily_data['Close'])
-                daily_data['BB_mid'] = ta.volatility.bollinger_mavg(daily_data['Close'])
-                daily_data['BB_low'] = ta.volatility.bollinger_lband(daily_data['Close'])
-                expiration_time = get_next_friday_market_close() - time.time()
-                cache.set(cache_key, daily_data, expire=expiration_time)
-            else:
-                print(f"\n{red_color_start}Failed to fetch daily data.{color_reset}\n")
-        
-        if not daily_data.empty:
-            print("\nDaily Technical Indicators (RSI and Bollinger Bands):\n")
-            print(daily_data[['RSI', 'BB_high', 'BB_mid', 'BB_low']].tail())
+            print(f"\n{red_color_start}Failed to fetch {timeframe} data.{color_reset}\n")
     except Exception as e:
-        print(f"\n{red_color_start}An error occurred while fetching daily technical indicators for {ticker}: {e}{color_reset}\n")
-
+        print(f"\n{red_color_start}An error occurred while fetching {timeframe} technical indicators for {ticker}: {e}{color_reset}\n")
 
+@traced('compute')
 def calculate_bollinger_bands(prices, window=20, no_of_stds=2):
     """
     Calculate Bollinger Bands for a given set of prices.
@@ -98,10 +94,13 @@ def calculate_bollinger_bands(prices, window=20, no_of_stds=2):
     return pd.DataFrame({'ma': rolling_mean, 'upper_band': upper_band, 'lower_band': lower_band})
 
 
+@traced('render')
 def fetch_and_display_price_against_BB(ticker):
     # Fetch historical data
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period="1y")  # Example period
+    hist, error = get_history(ticker, period="1y")  # Example period
+    if hist is None:
+        print(f"\n{red_color_start}Failed to fetch data for {ticker}: {error}{color_reset}\n")
+        return
     close_prices = hist['Close']
     
     # Calculate Bollinger Bands
@@ -126,6 +125,7 @@ def fetch_and_display_price_against_BB(ticker):
     else:
         print("\nThe latest price is within the Bollinger Bands.\n")
         
+@traced('compute')
 def calculate_rsi(prices, window=14):
     """
     Calculate the Relative Strength Index (RSI) for a given set of prices.
@@ -146,9 +146,12 @@ def calculate_rsi(prices, window=14):
     
     return rsi        
         
+@traced('render')
 def fetch_and_display_against_RSI(ticker):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period="1y")  # Fetch 6 months of historical data
+    hist, error = get_history(ticker, period="1y")  # Fetch 1 year of historical data
+    if hist is None:
+        print(f"\n{red_color_start}Failed to fetch data for {ticker}: {error}{color_reset}\n")
+        return
     close_prices = hist['Close']
     
     # Calculate RSI using the refined function
@@ -165,39 +168,42 @@ def fetch_and_display_against_RSI(ticker):
     else:
         print("\nThe RSI is within normal range.\n")
         
-def filter_extreme_stocks():
-    file_path = csv_file_path
-    stock_list = pd.read_csv(file_path)['Symbol'].tolist()
-    extreme_stocks = []
-    
-    for ticker in tqdm(stock_list, desc="Analyzing stocks", colour='green'):
-        # Check cache first
-        cached_data = cache.get(ticker)
-        if cached_data:
-            hist, error = pickle.loads(cached_data), None
-        else:
-            hist, error = fetch_data_with_progress_bar(ticker)
-            if hist is not None:
-                cache.set(ticker, pickle.dumps(hist), expire=86400)  # Cache for 1 day
+@traced('compute')
+def technical_snapshot(tickers=None, provider=None, max_workers=8):
+    """
+    Latest price, Bollinger Bands and RSI of many tickers, computed in one pass.
+
+    :param tickers: Symbols to include; defaults to the screener universe.
+    :return: A DataFrame indexed by Symbol with price, rsi, upper_band and lower_band columns.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
 
+    # Refresh only the bars each ticker is missing, then read its 1y window from the store
+    histories = {}
+    for ticker, (hist, error) in get_histories(tickers, period="1y", provider=provider, max_workers=max_workers).items():
         if error or hist is None:
             print(f"Error fetching data for {ticker}: {error}")
             continue
-
-        close_prices = hist['Close']
-        bollinger_bands = calculate_bollinger_bands(close_prices)
-        rsi = calculate_rsi(close_prices)
-        
-        latest_price = close_prices.iloc[-1]
-        latest_upper_band = bollinger_bands['upper_band'].iloc[-1]
-        latest_lower_band = bollinger_bands['lower_band'].iloc[-1]
-        latest_rsi = rsi.iloc[-1]
-
-        # Check for extreme conditions
-        if (latest_price >= latest_upper_band and latest_rsi >= 70) or \
-           (latest_price <= latest_lower_band and latest_rsi <= 30):
-            extreme_stocks.append((ticker, latest_price, latest_rsi, latest_upper_band, latest_lower_band))
-    
-    # Sort and limit the list based on your criteria
-    extreme_stocks.sort(key=lambda x: -x[2])  # Example: Sort by RSI value, descending
-    return extreme_stocks[:10]
\ No newline at end of file
+        histories[ticker] = hist
+
+    if not histories:
+        return pd.DataFrame(columns=['price', 'rsi', 'upper_band', 'lower_band'], index=pd.Index([], name='Symbol'))
+
+    # Compute the latest bands and RSI for the whole universe in one pass
+    close_matrix = build_matrix(histories, 'Close')
+    bollinger_bands = bollinger_bands_matrix(close_matrix, latest_only=True)
+    snapshot = pd.DataFrame({
+        'price': latest_values(close_matrix),
+        'rsi': relative_strength_index(close_matrix, latest_only=True),
+        'upper_band': bollinger_bands['upper_band'],
+        'lower_band': bollinger_bands['lower_band'],
+    })
+    snapshot.index.name = 'Symbol'
+    return snapshot
+
+def filter_extreme_stocks(provider=None, max_workers=8):
+    # The materialized table is rebuilt only when bars change; RSI bounds are binary searches on it
+    from metrics_table import extreme_stocks, metrics_table
+    rows = extreme_stocks(metrics_table(provider=provider, max_workers=max_workers))
+    return [(ticker, row['price'], row['rsi'], row['upper_band'], row['lower_band']) for ticker, row in rows.iterrows()]
\ No newline at end of file
@@ -0,0 +1,294 @@
+import math
+from collections import deque
+import pandas as pd
+
+from cache_utils import cache
+
+# Streaming values match the batch functions (calculate_bollinger_bands, calculate_rsi,
+# ta.momentum.RSIIndicator and calculate_ATR_series) to within this relative tolerance.
+TOLERANCE = 1e-8
+
+class _RollingWindow:
+    """Fixed-length window with O(1) running sums, resynchronised every `window` updates to bound drift."""
+
+    def __init__(self, window, values=(), reference=None):
+        self.window = window
+        self.values = deque(values, maxlen=window)
+        self.reference = reference
+        self._resync()
+
+    def _resync(self):
+        shifted = [v - self.reference for v in self.values] if self.reference is not None else list(self.values)
+        self.sum = math.fsum(shifted)
+        self.sum_sq = math.fsum(v * v for v in shifted)
+        self.updates = 0
+
+    def push(self, value):
+        if self.reference is None:
+            self.reference = value
+        if len(self.values) == self.window:
+            old = self.values[0] - self.reference
+            self.sum -= old
+            self.sum_sq -= old * old
+        self.values.append(value)
+        new = value - self.reference
+        self.sum += new
+        self.sum_sq += new * new
+        self.updates += 1
+        if self.updates >= self.window:
+            self._resync()
+
+    def mean(self):
+        return self.reference + self.sum / len(self.values)
+
+    def std(self, ddof=1):
+        n = len(self.values)
+        var = (self.sum_sq - self.sum * self.sum / n) / (n - ddof)
+        return math.sqrt(max(var, 0.0))
+
+    def to_dict(self):
+        return {'window': self.window, 'values': list(self.values), 'reference': self.reference}
+
+class RollingBollinger:
+    """
+    Incremental Bollinger Bands, matching calculate_bollinger_bands.
+
+    :param window: The period for calculating the moving average.
+    :param no_of_stds: The number of standard deviations to consider for the band width.
+    """
+
+    def __init__(self, window=20, no_of_stds=2, closes=None):
+        self.no_of_stds = no_of_stds
+        self.closes = closes or _RollingWindow(window)
+
+    def update(self, close):
+        self.closes.push(close)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.closes.values) < self.closes.window:
+            return None
+        ma = self.closes.mean()
+        std = self.closes.std()
+        return {'ma': ma, 'upper_band': ma + std * self.no_of_stds, 'lower_band': ma - std * self.no_of_stds}
+
+    def to_dict(self):
+        return {'no_of_stds': self.no_of_stds, 'closes': self.closes.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(no_of_stds=state['no_of_stds'], closes=_RollingWindow(**state['closes']))
+
+class RollingRSI:
+    """
+    Incremental simple-average RSI, matching calculate_rsi.
+
+    :param window: The period (number of days) over which to calculate the RSI.
+    """
+
+    def __init__(self, window=14, prev_close=None, gains=None, losses=None):
+        self.prev_close = prev_close
+        self.gains = gains or _RollingWindow(window, reference=0.0)
+        self.losses = losses or _RollingWindow(window, reference=0.0)
+
+    def update(self, close):
+        # The first bar has no previous close and counts as a zero move, like calculate_rsi
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.gains.push(max(delta, 0.0))
+        self.losses.push(max(-delta, 0.0))
+        return self.value
+
+    @property
+    def value(self):
+        if not self.gains.values:
+            return None
+        avg_gain = self.gains.sum / len(self.gains.values)
+        avg_loss = self.losses.sum / len(self.losses.values)
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else None
+        return 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+
+    def to_dict(self):
+        return {'prev_close': self.prev_close, 'gains': self.gains.to_dict(), 'losses': self.losses.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(prev_close=state['prev_close'], gains=_RollingWindow(**state['gains']),
+                   losses=_RollingWindow(**state['losses']))
+
+class WilderRSI:
+    """
+    Incremental Wilder-smoothed RSI, matching ta.momentum.RSIIndicator.
+
+    :param window: The smoothing period.
+    """
+
+    def __init__(self, window=14, prev_close=None, avg_gain=None, avg_loss=None, count=0):
+        self.window = window
+        self.prev_close = prev_close
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.count = count
+
+    def update(self, close):
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.avg_gain is None:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            alpha = 1.0 / self.window
+            self.avg_gain = (1 - alpha) * self.avg_gain + alpha * gain
+            self.avg_loss = (1 - alpha) * self.avg_loss + alpha * loss
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.window:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100.0 - (100.0 / (1.0 + self.avg_gain / self.avg_loss))
+
+    def to_dict(self):
+        return {'window': self.window, 'prev_close': self.prev_close, 'avg_gain': self.avg_gain,
+                'avg_loss': self.avg_loss, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(**state)
+
+class RollingATR:
+    """
+    Incremental true-range ATR, matching calculate_ATR_series.
+
+    :param window: Number of bars in the rolling mean of the true range.
+    """
+
+    def __init__(self, window=14, prev_close=None, true_ranges=None):
+        self.prev_close = prev_close
+        self.true_ranges = true_ranges or _RollingWindow(window, reference=0.0)
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.true_ranges.push(true_range)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.true_ranges.values) < self.true_ranges.window:
+            return None
+        return self.true_ranges.sum / self.true_ranges.window
+
+    def to_dict(self):
+        return {'prev_close': self.prev_close, 'true_ranges': self.true_ranges.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(prev_close=state['prev_close'], true_ranges=_RollingWindow(**state['true_ranges']))
+
+class IndicatorState:
+    """
+    Bollinger, RSI and ATR state for one ticker, plus the date of the last bar it has seen.
+
+    The last bar may have been saved while it was still forming, so the state also keeps a
+    snapshot from before that bar and the (high, low, close) it was applied with.
+    """
+
+    def __init__(self, bollinger=None, rsi=None, atr=None, last_bar=None, last_values=None, previous=None):
+        self.bollinger = bollinger or RollingBollinger()
+        self.rsi = rsi or RollingRSI()
+        self.atr = atr or RollingATR()
+        self.last_bar = last_bar
+        self.last_values = last_values
+        self.previous = previous  # _snapshot() from before the last bar
+
+    def update(self, hist):
+        """
+        Feed the bars of `hist` from the last one seen on; returns the number of bars applied.
+
+        A revised copy of the last bar seen rolls the state back to before that bar and is
+        applied again; an unchanged copy is skipped.
+        """
+        if self.last_bar is not None:
+            hist = hist[hist.index >= self.last_bar]
+            if len(hist) and hist.index[0] == self.last_bar:
+                revised = (float(hist['High'].iloc[0]), float(hist['Low'].iloc[0]), float(hist['Close'].iloc[0]))
+                if self.previous is not None and revised != self.last_values:
+                    self._restore(self.previous)
+                else:
+                    hist = hist.iloc[1:]
+        rows = list(zip(hist.index, hist['High'], hist['Low'], hist['Close']))
+        for i, row in enumerate(rows):
+            snapshot = self._snapshot() if i == len(rows) - 1 else None
+            self.push(*row)
+            self.previous = snapshot
+        return len(rows)
+
+    def push(self, date, high, low, close):
+        """Apply a single bar. It cannot be revised later; update() keeps the snapshot for that."""
+        self.bollinger.update(close)
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.last_bar = date
+        self.last_values = (float(high), float(low), float(close))
+        self.previous = None
+
+    def latest(self):
+        bands = self.bollinger.value or {}
+        return {
+            'Latest Price': self.rsi.prev_close,
+            'RSI': self.rsi.value,
+            'ATR': self.atr.value,
+            'Upper Band': bands.get('upper_band'),
+            'Moving Average': bands.get('ma'),
+            'Lower Band': bands.get('lower_band'),
+        }
+
+    def _snapshot(self):
+        return {'bollinger': self.bollinger.to_dict(), 'rsi': self.rsi.to_dict(), 'atr': self.atr.to_dict(),
+                'last_bar': self.last_bar.strftime('%Y-%m-%d') if self.last_bar is not None else None}
+
+    def _restore(self, snapshot):
+        restored = IndicatorState.from_dict(snapshot)
+        self.bollinger, self.rsi, self.atr, self.last_bar = restored.bollinger, restored.rsi, restored.atr, restored.last_bar
+        self.last_values = self.previous = None
+
+    def to_dict(self):
+        return dict(self._snapshot(), last_values=self.last_values, previous=self.previous)
+
+    @classmethod
+    def from_dict(cls, state):
+        # States saved before the snapshot was kept have no last_values or previous
+        return cls(bollinger=RollingBollinger.from_dict(state['bollinger']), rsi=RollingRSI.from_dict(state['rsi']),
+                   atr=RollingATR.from_dict(state['atr']),
+                   last_bar=pd.Timestamp(state['last_bar']) if state['last_bar'] else None,
+                   last_values=tuple(state['last_values']) if state.get('last_values') else None,
+                   previous=state.get('previous'))
+
+def advance_indicator_states(histories):
+    """
+    Apply the bars each ticker gained since its saved indicator state, without saving.
+
+    A ticker without saved state is seeded from its full window once; after that only the
+    bars that arrived since the last one seen are applied, one O(1) update each.
+
+    :param histories: Dict mapping ticker to its daily OHLCV DataFrame.
+    :return: (DataFrame of the latest indicator values indexed by ticker, {ticker: state dict} of
+             the states that moved, to pass to cache.set_many('indicator_state', ...)).
+    """
+    latest = {}
+    updated = {}
+    for ticker, hist in histories.items():
+        saved = cache.get('indicator_state', ticker)
+        state = IndicatorState.from_dict(saved) if saved else IndicatorState()
+        if state.update(hist):
+            updated[ticker] = state.to_dict()
+        latest[ticker] = state.latest()
+    return pd.DataFrame.from_dict(latest, orient='index'), updated
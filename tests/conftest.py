@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bar_store
+import stock_data_utils
+from cache_utils import cache, set_cache_directory
+from data_providers import SyntheticProvider, get_provider, set_provider
+
+@pytest.fixture(autouse=True, scope='session')
+def offline_environment(tmp_path_factory):
+    """Run every test against the synthetic provider with its own cache and bar store."""
+    original_provider = get_provider()
+    original_store = bar_store.store.directory
+    original_cache = cache.directory
+    original_universe = stock_data_utils.csv_file_path
+    workdir = tmp_path_factory.mktemp('offline')
+    set_provider(SyntheticProvider())
+    set_cache_directory(str(workdir / 'cache'))
+    bar_store.set_store_directory(str(workdir / 'bar_store'))
+    yield workdir
+    cache.close()
+    set_provider(original_provider)
+    bar_store.set_store_directory(original_store)
+    set_cache_directory(original_cache)
+    stock_data_utils.set_universe_file(original_universe)
@@ -0,0 +1,71 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import upstream_server
+from async_provider import AsyncProvider, AsyncYahooClient, RateLimitedError
+from data_providers import SyntheticProvider
+
+def test_async_provider_recovers_from_throttling(tickers=("AAPL", "MSFT", "NVDA", "MDB", "^VIX")):
+    """Retries against a server that throttles every third request return what SyntheticProvider serves."""
+    expected = SyntheticProvider()
+    with upstream_server.serve(latency=0.01, throttle_every=3) as server:
+        provider = AsyncProvider(base_url=server.url, cookie_url=None, rate=200, burst=20, backoff_base=0.01)
+        try:
+            for ticker, hist in provider.gather_histories(list(tickers), period="1y").items():
+                assert not isinstance(hist, Exception), f"{ticker}: {hist}"
+                assert np.allclose(hist['Close'].to_numpy(), expected.history(ticker, period="1y")['Close'].to_numpy())
+            intraday = provider.history("AAPL", period="5d", interval="5m")
+            reference = expected.history("AAPL", period="5d", interval="5m")
+            assert intraday.index.equals(reference.index)
+            assert np.allclose(intraday['Close'], reference['Close'])
+            assert provider.info("AAPL")['forwardPE'] == expected.info("AAPL")['forwardPE']
+            expiration = provider.options("AAPL")[0]
+            calls = provider.option_chain("AAPL", expiration).calls
+            assert np.allclose(calls['strike'], expected.option_chain("AAPL", expiration).calls['strike'])
+            stats = dict(provider.client.stats)
+        finally:
+            provider.close()
+    assert stats['throttled'] and stats['retries'], "the stand-in server never throttled the client"
+
+def test_async_provider_surfaces_permanent_throttling():
+    with upstream_server.serve(throttle_every=1, retry_after=0) as server:
+        provider = AsyncProvider(base_url=server.url, cookie_url=None, max_retries=2)
+        try:
+            with pytest.raises(RateLimitedError):
+                provider.history("AAPL")
+        finally:
+            provider.close()
+
+def test_expired_crumb_is_refreshed_once():
+    """A 401 on a crumb-protected endpoint fetches a new crumb and retries with it."""
+    expected = SyntheticProvider()
+    with upstream_server.serve() as server:
+        provider = AsyncProvider(base_url=server.url, cookie_url=None, backoff_base=0.01)
+        try:
+            assert provider.info("AAPL")['forwardPE'] == expected.info("AAPL")['forwardPE']
+            server.expire_crumb()
+            assert provider.info("MSFT")['forwardPE'] == expected.info("MSFT")['forwardPE']
+            assert provider.options("MSFT") == expected.options("MSFT")
+            crumb, stats = provider.client._crumb, dict(provider.client.stats)
+        finally:
+            provider.close()
+    assert server.unauthorized == 1 and stats['retries'] == 1
+    assert crumb == server.crumb
+
+def test_info_flattens_raw_and_formatted_values():
+    """quoteSummary wraps numbers as {"raw", "fmt"}; .info keeps the raw number and drops empty values."""
+    payload = {'quoteSummary': {'result': [{
+        'financialData': {'forwardPE': {'raw': 21.5, 'fmt': '21.50'}, 'recommendationKey': 'buy',
+                          'targetMeanPrice': {}, 'maxAge': 86400},
+        'summaryDetail': {'marketCap': {'raw': 3.1e12, 'fmt': '3.1T', 'longFmt': '3,100,000,000,000'}},
+    }], 'error': None}}
+
+    async def respond(path, params=None, as_text=False):
+        return 'crumb' if as_text else payload
+
+    client = AsyncYahooClient(cookie_url=None)
+    client._request = respond
+    info = asyncio.run(client.info("AAPL"))
+    assert info == {'forwardPE': 21.5, 'recommendationKey': 'buy', 'maxAge': 86400, 'marketCap': 3.1e12}
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+import backtest_engine
+import stock_data_utils
+from data_providers import SyntheticProvider
+from indicator_engine import build_matrix
+
+TICKERS = ("AAPL", "MSFT", "NVDA", "MDB", "TSLA", "AMD")
+COST = 0.0005
+
+@pytest.fixture(scope='module')
+def close():
+    provider = SyntheticProvider()
+    # One shorter history exercises the NaN padding of the aligned matrix
+    histories = {ticker: provider.history(ticker, period="3y" if i else "2y") for i, ticker in enumerate(TICKERS)}
+    return build_matrix(histories, 'Close')
+
+def _signals(prices, strategy):
+    """(long entry, long exit, short entry, short exit) at each close, from the per-series indicators."""
+    if strategy == 'mean_reversion':
+        bands = ta.volatility.BollingerBands(prices, window=20, window_dev=2)
+        rsi = ta.momentum.RSIIndicator(prices).rsi()
+        return [(c < low and r < 30, c >= ma, False, False)
+                for c, low, ma, r in zip(prices, bands.bollinger_lband(), bands.bollinger_mavg(), rsi)]
+    bands = stock_data_utils.calculate_bollinger_bands(prices)
+    rsi = stock_data_utils.calculate_rsi(prices)
+    return [(c <= low and r <= 30, c >= ma, c >= up and r >= 70, c <= ma)
+            for c, low, ma, up, r in zip(prices, bands['lower_band'], bands['ma'], bands['upper_band'], rsi)]
+
+def _backtest_by_loop(prices, strategy, cost=COST):
+    """Daily returns and trades of one ticker, simulated one bar at a time."""
+    dates = prices.index
+    long_side = short_side = held = previous = 0.0
+    returns, trades, trade = [], [], None
+    for i, (long_entry, long_exit, short_entry, short_exit) in enumerate(_signals(prices, strategy)):
+        # Bar i earns the position decided at bar i-1's close
+        move = prices.iloc[i] / prices.iloc[i - 1] - 1 if i else np.nan
+        gross = held * (0.0 if np.isnan(move) else move)
+        returns.append(gross - abs(held - previous) * cost)
+        if held != previous:
+            if trade is not None:
+                trades.append(dict(trade, exit_date=dates[i - 1], growth=trade['growth'] * (1 - cost), open=False))
+            trade = None
+            if held:
+                trade = {'side': 'long' if held > 0 else 'short', 'entry_date': dates[i - 1],
+                         'holding_days': 0, 'growth': 1 - cost}
+        if trade is not None:
+            trade['holding_days'] += 1
+            trade['growth'] *= 1 + gross
+
+        # The signal at this close sets the position for the next bar
+        long_side = 1.0 if long_entry else 0.0 if long_exit else long_side
+        short_side = -1.0 if short_entry else 0.0 if short_exit else short_side
+        previous, held = held, long_side + short_side
+    if trade is not None:
+        trades.append(dict(trade, exit_date=pd.NaT, open=True))
+    return np.array(returns), trades
+
+@pytest.mark.parametrize('strategy', sorted(backtest_engine.STRATEGIES))
+def test_backtest_matches_per_bar_loop(close, strategy):
+    result = backtest_engine.run_backtest(close, backtest_engine.STRATEGIES[strategy](close), cost=COST)
+    for ticker in TICKERS:
+        returns, expected = _backtest_by_loop(close[ticker], strategy)
+        assert np.allclose(result.returns[ticker].to_numpy(), returns, atol=1e-12), ticker
+
+        actual = result.trades[result.trades['ticker'] == ticker]
+        assert len(actual) == len(expected), ticker
+        for row, trade in zip(actual.to_dict('records'), expected):
+            for column in ('side', 'entry_date', 'holding_days', 'open'):
+                assert row[column] == trade[column], (ticker, column)
+            assert row['exit_date'] == trade['exit_date'] or (pd.isna(row['exit_date']) and pd.isna(trade['exit_date']))
+            assert row['return'] == pytest.approx(trade['growth'] - 1, abs=1e-12)
+        assert result.tickers.at[ticker, 'trades'] == len(expected)
+    assert result.portfolio['trades'] == len(result.trades) > 0
+
+@pytest.mark.parametrize('strategy', sorted(backtest_engine.STRATEGIES))
+def test_backtest_never_trades_on_the_signal_bar(close, strategy):
+    """Positions are held from the bar after the signal, and later bars never change earlier returns."""
+    positions = backtest_engine.STRATEGIES[strategy](close)
+    full = backtest_engine.run_backtest(close, positions, cost=COST)
+    assert (full.positions.iloc[0] == 0).all()
+    assert np.array_equal(full.positions.to_numpy()[1:], positions.to_numpy()[:-1])
+    for cut in (300, 500, len(close) - 1):
+        partial = close.iloc[:cut]
+        truncated = backtest_engine.run_backtest(partial, backtest_engine.STRATEGIES[strategy](partial), cost=COST)
+        assert np.allclose(truncated.returns.to_numpy(), full.returns.iloc[:cut].to_numpy(), atol=1e-12), cut
@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from data_providers import SyntheticProvider, period_start
+
+class _RecordingProvider(SyntheticProvider):
+    """Records each history request's start; `forming` shows the last bar half printed."""
+
+    def __init__(self):
+        super().__init__()
+        self.starts = []
+        self.forming = False
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        self.starts.append(pd.Timestamp(start))
+        hist = super().history(ticker, period=period, interval=interval, start=start)
+        if self.forming:
+            hist = hist.copy()
+            hist.iloc[-1, hist.columns.get_loc('Close')] = hist['Open'].iloc[-1]
+            hist.iloc[-1, hist.columns.get_loc('Volume')] = hist['Volume'].iloc[-1] / 2
+        return hist
+
+def _expire(store, ticker):
+    """Mark a ticker as synced before the last market close, as on the next trading day."""
+    path = os.path.join(store.directory, ticker, 'meta.json')
+    with open(path) as f:
+        meta = json.load(f)
+    meta['synced_at'] = 0
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+
+def test_refresh_fetches_from_the_last_bar_and_replaces_it(tmp_path, ticker="BS1"):
+    store = BarStore(str(tmp_path))
+    provider = _RecordingProvider()
+    provider.forming = True
+    assert store.update(ticker, "1y", provider) is None
+    assert provider.starts == [period_start("1y")]
+    forming = store.read(ticker).copy()
+
+    # Fresh bars are not fetched again
+    assert store.update(ticker, "1y", provider) is None
+    assert len(provider.starts) == 1
+
+    provider.forming = False
+    _expire(store, ticker)
+    assert store.update(ticker, "1y", provider) is None
+    assert provider.starts[1] == forming.index[-1]
+    refreshed = store.read(ticker)
+    expected = SyntheticProvider().history(ticker, period="1y")
+    assert refreshed.index.is_unique and refreshed.index.equals(forming.index)
+    assert np.allclose(refreshed.to_numpy(), expected.to_numpy())
+    assert refreshed['Close'].iloc[-1] != forming['Close'].iloc[-1]
+
+def test_longer_period_backfills_the_store(tmp_path, ticker="BS2"):
+    store = BarStore(str(tmp_path))
+    provider = _RecordingProvider()
+    store.update(ticker, "6mo", provider)
+    # Already covered: no request
+    store.update(ticker, "3mo", provider)
+    assert provider.starts == [period_start("6mo")]
+
+    hist, error = store.get(ticker, "2y", provider)
+    assert error is None
+    assert provider.starts[1] == period_start("2y")
+    assert store._load_meta(ticker)['covered_from'] == period_start("2y").strftime('%Y-%m-%d')
+    expected = SyntheticProvider().history(ticker, period="2y")
+    assert hist.index.equals(expected.index) and np.allclose(hist.to_numpy(), expected.to_numpy())
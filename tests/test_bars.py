@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_aggregation
+import bar_store
+from cache_utils import cache
+from data_providers import ReplayProvider, SyntheticProvider, period_start
+from streaming_indicators import TOLERANCE
+
+OHLCV = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+@pytest.mark.parametrize('ticker', ("AAPL", "MSFT", "NVDA"))
+def test_resampled_and_rolled_up_bars_match_pandas_resample(ticker):
+    """W-MON weeks, month starts and 1h bins anchored at the 9:30 open; 5m bars replayed partially first."""
+    provider = SyntheticProvider()
+    daily = provider.history(ticker, period="2y")
+    intraday = provider.history(ticker, period="60d", interval="5m")
+    expected = {
+        '1wk': daily.resample('W-MON', closed='left', label='left').agg(OHLCV),
+        '1mo': daily.resample('MS').agg(OHLCV),
+        '1h': intraday.resample('1h', offset='30min').agg(OHLCV),
+    }
+    for timeframe, reference in expected.items():
+        reference = reference.dropna(subset=['Close'])
+        base = intraday if timeframe == '1h' else daily
+        half = len(base) // 2
+        aggregator = bar_aggregation.BarAggregator(timeframe).extend(base.iloc[:half])
+        for timestamp, row in zip(base.index[half:], base.iloc[half:].itertuples(index=False)):
+            aggregator.update(timestamp, row.Open, row.Open, row.Open, row.Open, 0.0)
+            aggregator.update(timestamp, *row)
+        for frame in (bar_aggregation.resample_bars(base, timeframe), aggregator.bars()):
+            assert frame.index.equals(reference.index), f"{timeframe}: bar boundaries differ from pandas resample"
+            error = np.abs(frame.to_numpy() - reference.to_numpy()) / np.maximum(np.abs(reference.to_numpy()), 1.0)
+            assert error.max() <= TOLERANCE, timeframe
+
+def test_early_close_sessions_end_at_one_pm():
+    """Bars printed after a 1:00 pm early close (the day after Thanksgiving) are out of session."""
+    index = pd.date_range('2024-11-29 09:30', '2024-11-29 15:55', freq='5min', tz='America/New_York')
+    bars = pd.DataFrame(1.0, index=index, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+    hourly = bar_aggregation.resample_bars(bars, '1h')
+    assert list(hourly.index.strftime('%H:%M')) == ['09:30', '10:30', '11:30', '12:30']
+    assert hourly['Volume'].tolist() == [12.0, 12.0, 12.0, 6.0]
+    aggregator = bar_aggregation.BarAggregator('1h')
+    for timestamp, row in zip(bars.index, bars.itertuples(index=False)):
+        aggregator.update(timestamp, *row)
+    assert aggregator.bars().equals(hourly)
+
+class _RecordingReplay(ReplayProvider):
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        self.starts.append(start)
+        return super().history(ticker, period=period, interval=interval, start=start)
+
+def test_get_bars_rolls_up_only_the_intraday_bars_since_the_last_call(ticker="RB1", steps=30):
+    """Each refresh fetches from the last stored day; the persisted 1h bars match a fresh resample."""
+    recorded = {ticker: SyntheticProvider().history(ticker, period="60d", interval="5m")}
+    replay = _RecordingReplay(recorded, start=recorded[ticker].index[-steps], steps_per_bar=2)
+    replay.starts = []
+    for step in range(steps):
+        if step:
+            replay.advance()
+            cache.delete('intraday_synced', ticker)  # As if INTRADAY_TTL had passed
+        bars, error = bar_aggregation.get_bars(ticker, '1h', period="60d", provider=replay)
+        assert error is None
+        expected = bar_aggregation.resample_bars(replay.history(ticker, period="60d", interval="5m"), '1h')
+        assert bars.index.equals(expected.index), f"step {step}"
+        assert np.allclose(bars.to_numpy(), expected.to_numpy()), f"step {step}"
+        replay.starts.pop()
+    assert replay.starts[0] is None
+    assert set(replay.starts[1:]) == {recorded[ticker].index[-steps - 1].strftime('%Y-%m-%d')}
+    # A cached refresh makes no request at all
+    bar_aggregation.get_bars(ticker, '15m', period="5d", provider=replay)
+    assert len(replay.starts) == steps
+
+@pytest.mark.parametrize('timeframe', ('1wk', '1mo'))
+def test_get_bars_reuses_the_persisted_roll_up(timeframe, ticker="RB2"):
+    """A longer period rebuilds the roll-up; a shorter one is sliced from it, its first bar complete."""
+    for period, seeded in (("6mo", "6mo"), ("2y", "2y"), ("1y", "2y")):
+        bars, _ = bar_aggregation.get_bars(ticker, timeframe, period=period)
+        expected = bar_aggregation.resample_bars(bar_store.store.read(ticker, seeded), timeframe)
+        expected = expected[expected.index >= bar_aggregation.bucket_label(period_start(period), timeframe)]
+        assert bars.equals(expected), period
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_utils import TieredCache, decode_frame, encode_frame
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = TieredCache(str(tmp_path))
+    yield cache
+    cache.close()
+
+def test_frames_round_trip_through_the_columnar_encoding():
+    index = pd.date_range('2024-03-08 09:30', periods=6, freq='5min', tz='America/New_York', name='Datetime')
+    frame = pd.DataFrame({
+        'Close': np.linspace(100, 101, 6),
+        'Volume': np.arange(6, dtype=np.int64),
+        'Signal': [True, False, True, True, False, False],
+        'sector': ['Tech', None, 'Energy', 'Tech', 'Utilities', None],
+    }, index=index)
+    decoded = decode_frame(encode_frame(frame))
+    pd.testing.assert_frame_equal(decoded, frame, check_freq=False)
+    assert str(decoded.index.tz) == 'America/New_York'
+
+    # Numeric columns are views over the payload, not copies
+    assert not decoded['Close'].to_numpy().flags.writeable
+
+    labelled = pd.DataFrame({'forwardPE': [21.5, np.nan]}, index=pd.Index(['AAPL', 'MSFT'], name='ticker'))
+    pd.testing.assert_frame_equal(decode_frame(encode_frame(labelled)), labelled)
+    ranged = pd.DataFrame({'x': [1.0, 2.0, 3.0]})
+    pd.testing.assert_frame_equal(decode_frame(encode_frame(ranged)), ranged)
+
+def test_frames_the_encoding_does_not_cover_fall_back_to_pickle(disk_cache):
+    frame = pd.DataFrame(np.ones((3, 4)), columns=pd.MultiIndex.from_product([['AAPL', 'MSFT'], ['Open', 'Close']]))
+    assert encode_frame(frame) is None
+    disk_cache.set('bars', 'multi', frame)
+    disk_cache._memory.clear()
+    pd.testing.assert_frame_equal(disk_cache.get('bars', 'multi'), frame)
+
+def test_memory_tier_evicts_least_recently_used_entries_by_size(tmp_path):
+    frame = pd.DataFrame({'Close': np.zeros(1000)})
+    size = len(encode_frame(frame))
+    cache = TieredCache(str(tmp_path), memory_limit=int(size * 2.5))
+    try:
+        for key in ('a', 'b'):
+            cache.set('bars', key, frame)
+        cache.get('bars', 'a')  # 'b' is now the least recently used
+        cache.set('bars', 'c', frame)
+        assert list(cache._memory) == ['bars:a', 'bars:c'] and cache._memory_bytes == 2 * size
+        # An entry larger than the whole budget is kept on disk only
+        cache.set('bars', 'big', pd.DataFrame({'Close': np.zeros(5000)}))
+        assert 'bars:big' not in cache._memory
+        assert len(cache.get('bars', 'b')) == 1000 and cache.stats['bars']['bytes_read'] == size
+    finally:
+        cache.close()
+
+def test_namespaces_are_listed_counted_and_evicted_by_age(disk_cache):
+    disk_cache.set_many('atr', {f"T{i:03d}": float(i) for i in range(50)})
+    disk_cache.set('atr', 'SHORT', 1.0, expire=0.05)
+    disk_cache.set('hv', 'AAPL', 0.3)
+    assert disk_cache.namespaces() == {'atr': 51, 'hv': 1}
+
+    time.sleep(0.1)
+    assert disk_cache.namespaces() == {'atr': 50, 'hv': 1}, "an expired entry was still counted"
+
+    disk_cache.delete('atr', 'T000')
+    assert disk_cache.namespaces()['atr'] == 49
+    time.sleep(0.01)
+    disk_cache.set('atr', 'FRESH', 2.0)
+    assert disk_cache.evict_older_than(0.005, namespace='atr') == 49
+    assert disk_cache.namespaces() == {'atr': 1, 'hv': 1}
+    assert disk_cache.get('atr', 'FRESH') == 2.0 and disk_cache.get('atr', 'T001') is None
+
+    assert disk_cache.evict_namespace('hv') == 1
+    assert disk_cache.namespaces() == {'atr': 1}
@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from data_providers import SyntheticProvider, period_start
+from request_coalescing import CoalescingProvider
+
+class _GatedProvider(SyntheticProvider):
+    """Holds every history request until `release` is set, and can fail the first few."""
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.failures = failures
+
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        self.entered.set()
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise ConnectionError("upstream reset the connection")
+        return super().history(ticker, period=period, interval=interval, start=start)
+
+def test_concurrent_identical_requests_hit_upstream_once(callers=8):
+    upstream = _GatedProvider()
+    session = CoalescingProvider(upstream)
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [executor.submit(session.history, "AAPL", period="1y") for _ in range(callers)]
+        upstream.entered.wait(5)
+        upstream.release.set()
+        results = [future.result() for future in futures]
+    assert upstream.calls == 1
+    assert (session.requests, session.upstream_calls, session.saved_calls) == (callers, 1, callers - 1)
+    assert all(result.equals(results[0]) for result in results)
+
+def test_request_for_a_window_in_flight_is_served_by_slicing():
+    upstream = _GatedProvider()
+    session = CoalescingProvider(upstream)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        longer = executor.submit(session.history, "MSFT", period="1y")
+        upstream.entered.wait(5)
+        shorter = executor.submit(session.history, "MSFT", period="3mo")
+        upstream.release.set()
+        year, quarter = longer.result(), shorter.result()
+    assert upstream.calls == 1
+    assert quarter.equals(year[year.index >= period_start("3mo")])
+    assert quarter.index[0] > year.index[0]
+
+    # A longer window than the one fetched is a new upstream request
+    session.history("MSFT", period="2y")
+    assert upstream.calls == 2
+
+def test_failed_flight_is_retried_not_cached():
+    upstream = _GatedProvider(failures=1)
+    upstream.release.set()
+    session = CoalescingProvider(upstream)
+    with pytest.raises(ConnectionError):
+        session.history("NVDA", period="1y")
+    hist = session.history("NVDA", period="1y")
+    assert not hist.empty and upstream.calls == 2
+    # Once it succeeded, the result is shared again
+    session.history("NVDA", period="6mo")
+    assert upstream.calls == 2
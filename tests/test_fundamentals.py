@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+
+import bar_store
+import fundamentals_table
+import metrics_table
+from data_providers import SyntheticProvider
+
+class _PatchyProvider(SyntheticProvider):
+    """Synthetic .info with the 'N/A' and missing values Yahoo returns for some tickers."""
+
+    def __init__(self):
+        super().__init__()
+        self.requested = []
+
+    def info(self, ticker):
+        self.requested.append(ticker)
+        info = super().info(ticker)
+        if ticker.endswith('X'):
+            info.update(forwardPE='N/A', trailingEps=None, recommendationKey='N/A')
+            del info['freeCashflow']
+        return info
+
+def test_missing_values_become_typed_nulls(tickers=("FNA", "FNX")):
+    table, errors = fundamentals_table.refresh_snapshot(list(tickers), provider=_PatchyProvider(), show_progress=False)
+    assert not errors and list(table.index) == list(tickers)
+    for column, (_, dtype) in fundamentals_table.FUNDAMENTAL_FIELDS.items():
+        assert table[column].dtype == dtype, column
+    assert table.loc["FNX", ['forwardPE', 'trailingEps', 'freeCashflow', 'recommendationKey']].isna().all()
+    assert table.loc["FNA"].drop('fetched_at').notna().all()
+    assert fundamentals_table.fundamentals_for("FNX")["PE Ratio"] == 'N/A'
+
+def test_only_stale_rows_are_refreshed(tickers=("FS1", "FS2", "FS3", "FS4")):
+    fundamentals_table.refresh_snapshot(list(tickers), provider=SyntheticProvider(), show_progress=False)
+    # Age two rows past the cutoff by hand, as if fetched a week ago
+    snapshot = fundamentals_table.load_snapshot().copy()
+    snapshot.loc[["FS2", "FS4"], 'fetched_at'] = time.time() - 8 * 24 * 3600
+    fundamentals_table.cache.set('fundamentals_table', fundamentals_table.SNAPSHOT_KEY, snapshot)
+
+    assert fundamentals_table.stale_tickers(snapshot, list(tickers) + ["FS5"]) == ["FS2", "FS4", "FS5"]
+    assert fundamentals_table.stale_tickers(snapshot, list(tickers), max_age=0) == list(tickers)
+    provider = _PatchyProvider()
+    table, _ = fundamentals_table.refresh_snapshot(list(tickers) + ["FS5"], provider=provider, show_progress=False)
+    assert sorted(provider.requested) == ["FS2", "FS4", "FS5"]
+    assert (table.loc[["FS1", "FS3"], 'fetched_at'] == snapshot.loc[["FS1", "FS3"], 'fetched_at']).all()
+    assert not fundamentals_table.stale_tickers(table, list(table.index))
+
+def test_screen_joins_technicals_and_filters_like_pandas(tickers=tuple(f"FT{i:02d}" for i in range(40))):
+    query = "forwardPE < 35 and rsi > 40"
+    result = fundamentals_table.screen(query, sort_by='forwardPE', tickers=list(tickers), technicals=True,
+                                       provider=SyntheticProvider())
+    fundamentals = fundamentals_table.load_snapshot().loc[list(tickers)]
+    technicals = metrics_table.compute_metrics({ticker: bar_store.store.read(ticker) for ticker in tickers})
+    joined = fundamentals.join(technicals[['price', 'rsi', 'upper_band', 'lower_band']])
+    expected = joined[(joined['forwardPE'] < 35) & (joined['rsi'] > 40)].sort_values('forwardPE')
+    assert 0 < len(result) < len(tickers)
+    assert list(result.index) == list(expected.index)
+    assert np.allclose(result['rsi'].to_numpy(dtype=float), expected['rsi'].to_numpy(dtype=float))
+    assert np.allclose(result['upper_band'].to_numpy(dtype=float), expected['upper_band'].to_numpy(dtype=float))
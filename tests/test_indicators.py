@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+import bar_store
+import parameter_sweep
+import prewarm
+import stock_data_utils
+import volatility
+from atr_calculator import calculate_ATR_series
+from cache_utils import cache, set_cache_directory
+from data_providers import SyntheticProvider
+from indicator_engine import average_true_range, bollinger_bands, build_matrix, relative_strength_index
+from streaming_indicators import TOLERANCE, IndicatorState, WilderRSI, advance_indicator_states
+
+TICKERS = ("AAPL", "MSFT", "NVDA", "MDB", "TSLA")
+
+def test_indicator_engine_matches_per_series_functions():
+    provider = SyntheticProvider()
+    # Uneven history lengths exercise the NaN padding of the aligned matrix
+    histories = {ticker: provider.history(ticker, period=f"{6 + i}mo") for i, ticker in enumerate(TICKERS)}
+    close, high, low = (build_matrix(histories, column) for column in ('Close', 'High', 'Low'))
+
+    bands = bollinger_bands(close)
+    rsi = relative_strength_index(close)
+    wilder_rsi = relative_strength_index(close, method='wilder')
+    atr = average_true_range(high, low, close)
+    latest_bands = bollinger_bands(close, latest_only=True)
+    latest_rsi = relative_strength_index(close, latest_only=True)
+    latest_atr = average_true_range(high, low, close, latest_only=True)
+
+    for ticker, hist in histories.items():
+        expected_bands = stock_data_utils.calculate_bollinger_bands(hist['Close'])
+        expected_rsi = stock_data_utils.calculate_rsi(hist['Close'])
+        expected_wilder = ta.momentum.RSIIndicator(hist['Close']).rsi()
+        expected_atr = calculate_ATR_series(hist.copy())
+        pairs = [
+            (bands['upper_band'][ticker].loc[hist.index], expected_bands['upper_band']),
+            (bands['lower_band'][ticker].loc[hist.index], expected_bands['lower_band']),
+            (rsi[ticker].loc[hist.index], expected_rsi),
+            (wilder_rsi[ticker].loc[hist.index], expected_wilder),
+            (atr[ticker].loc[hist.index], expected_atr),
+            (latest_bands['upper_band'][ticker], expected_bands['upper_band'].iloc[-1]),
+            (latest_rsi[ticker], expected_rsi.iloc[-1]),
+            (latest_atr[ticker], expected_atr.iloc[-1]),
+        ]
+        for actual, expected in pairs:
+            assert np.nanmax(np.abs(np.asarray(actual) - np.asarray(expected))) <= 1e-8, ticker
+
+def test_volatility_table_matches_per_ticker_estimators():
+    provider = SyntheticProvider()
+    histories = {ticker: provider.history(ticker, period=f"{18 + i}mo") for i, ticker in enumerate(TICKERS)}
+    table = volatility.volatility_table(histories)
+
+    for ticker, hist in histories.items():
+        o, h, l, c = (np.log(hist[column]) for column in ('Open', 'High', 'Low', 'Close'))
+        for window in (10, 20, 60, 252):
+            overnight, open_close = (o - c.shift(1)).tail(window), (c - o).tail(window)
+            high_low, rogers_satchell = (h - l).tail(window), ((h - c) * (h - o) + (l - c) * (l - o)).tail(window)
+            k = 0.34 / (1.34 + (window + 1) / (window - 1))
+            expected = {
+                'cc': (c - c.shift(1)).tail(window).var(),
+                'parkinson': (high_low ** 2).mean() / (4 * np.log(2)),
+                'gk': (0.5 * high_low ** 2 - (2 * np.log(2) - 1) * open_close ** 2).mean(),
+                'yz': overnight.var() + k * open_close.var() + (1 - k) * rogers_satchell.mean(),
+            }
+            for name, variance in expected.items():
+                assert table.loc[ticker, f"{name}_{window}"] == pytest.approx(np.sqrt(variance * 252), abs=1e-8)
+        # The 252-day close-to-close figure is calculate_hv over the same returns
+        returns = np.log(hist['Close'] / hist['Close'].shift(1)).tail(252)
+        assert table.loc[ticker, 'cc_252'] == pytest.approx(returns.std() * np.sqrt(252), abs=1e-8)
+
+@pytest.mark.parametrize('ticker', TICKERS)
+def test_streaming_indicators_match_batch_functions(ticker):
+    hist = SyntheticProvider().history(ticker, period="1y")
+    state = IndicatorState()
+    wilder = WilderRSI()
+    values = []
+    for i in range(len(hist)):
+        # Round-trip the state through its serialized form on every bar, like a daily refresh
+        state = IndicatorState.from_dict(state.to_dict())
+        state.update(hist.iloc[:i + 1])
+        wilder = WilderRSI.from_dict(wilder.to_dict())
+        wilder.update(hist['Close'].iloc[i])
+        values.append((state.latest(), wilder.value))
+
+    expected_bands = stock_data_utils.calculate_bollinger_bands(hist['Close'])
+    expected_rsi = stock_data_utils.calculate_rsi(hist['Close'])
+    expected_wilder = ta.momentum.RSIIndicator(hist['Close']).rsi()
+    expected_atr = calculate_ATR_series(hist.copy())
+    for i, (latest, wilder_value) in enumerate(values):
+        for actual, expected in ((latest['Upper Band'], expected_bands['upper_band'].iloc[i]),
+                                 (latest['Lower Band'], expected_bands['lower_band'].iloc[i]),
+                                 (latest['RSI'], expected_rsi.iloc[i]),
+                                 (wilder_value, expected_wilder.iloc[i]),
+                                 (latest['ATR'], expected_atr.iloc[i])):
+            if np.isnan(expected):
+                assert actual is None, f"bar {i}: warm-up mismatch"
+            else:
+                assert abs(actual - expected) / max(abs(expected), 1.0) <= TOLERANCE, f"bar {i}"
+
+def test_prewarm_persists_streaming_state_and_refreshes_one_bar(tickers=("PW1", "PW2", "PW3")):
+    """Prewarm seeds the saved state; a refresh restored from disk applies one bar and matches a full recompute."""
+    prewarm.prewarm_universe(list(tickers), provider=SyntheticProvider())
+    # Drop the memory tier, so the states are read back from disk
+    set_cache_directory(cache.directory)
+    histories = {ticker: bar_store.store.read(ticker, "1y") for ticker in tickers}
+    for ticker, hist in histories.items():
+        state = IndicatorState.from_dict(cache.get('indicator_state', ticker))
+        assert state.last_bar == hist.index[-1]
+
+        # Replay yesterday's state forward by today's bar, like the next daily refresh
+        previous = IndicatorState()
+        previous.update(hist.iloc[:-1])
+        cache.set('indicator_state', ticker, previous.to_dict())
+    set_cache_directory(cache.directory)
+    latest, updated = advance_indicator_states(histories)
+    for ticker, hist in histories.items():
+        full = IndicatorState()
+        full.update(hist)
+        assert IndicatorState.from_dict(updated[ticker]).last_bar == hist.index[-1]
+        for column, expected in full.latest().items():
+            assert latest.at[ticker, column] == pytest.approx(expected, rel=TOLERANCE)
+
+def test_streaming_state_reapplies_a_bar_revised_after_it_was_saved(ticker="AAPL"):
+    """A state saved while the last bar was forming matches a full recompute once the bar is final."""
+    hist = SyntheticProvider().history(ticker, period="1y")
+    full = IndicatorState()
+    full.update(hist)
+    for forming_at, applied in ((-1, 1), (-2, 2)):
+        forming = hist.iloc[:len(hist) + forming_at + 1].copy()
+        bar = forming.index[-1]
+        forming.loc[bar, ['High', 'Low', 'Close']] = (forming.at[bar, 'Open'] + 0.5, forming.at[bar, 'Open'] - 0.5,
+                                                      forming.at[bar, 'Open'])
+        state = IndicatorState()
+        state.update(forming)
+        state = IndicatorState.from_dict(state.to_dict())
+        assert state.update(hist) == applied
+        for column, expected in full.latest().items():
+            assert state.latest()[column] == pytest.approx(expected, rel=TOLERANCE), (forming_at, column)
+        # The final bar again is not a revision
+        assert state.update(hist) == 0
+
+@pytest.fixture
+def sweep_close():
+    provider = SyntheticProvider()
+    histories = {f"SW{i:02d}": provider.history(f"SW{i:02d}", period="3y" if i % 4 else "2y") for i in range(24)}
+    return build_matrix(histories, 'Close')
+
+def test_sweep_signals_for_current_settings_match_indicator_engine(sweep_close, horizon=5):
+    parameter_sweep._shared.update(parameter_sweep.prepare_arrays(sweep_close, horizon))
+    try:
+        settings = parameter_sweep.CURRENT_SETTINGS
+        rows = parameter_sweep._evaluate((settings['bb_window'], settings['rsi_window'],
+                                          (settings['no_of_stds'],), (settings['rsi_thresholds'],)))
+    finally:
+        parameter_sweep._shared.clear()
+
+    bands = bollinger_bands(sweep_close)
+    rsi = relative_strength_index(sweep_close)
+    # The sweep only counts an RSI once its window holds a full set of price changes
+    rsi_full = sweep_close.diff().notna().rolling(settings['rsi_window']).sum() == settings['rsi_window']
+    forward = sweep_close.shift(-horizon) / sweep_close - 1
+    upper, lower = settings['rsi_thresholds']
+    oversold = (sweep_close <= bands['lower_band']) & (rsi <= lower) & rsi_full & forward.notna()
+    overbought = (sweep_close >= bands['upper_band']) & (rsi >= upper) & rsi_full & forward.notna()
+    signed = np.concatenate([forward.to_numpy()[oversold.to_numpy()], -forward.to_numpy()[overbought.to_numpy()]])
+
+    [row] = rows
+    assert (row['oversold'], row['overbought']) == (int(oversold.to_numpy().sum()), int(overbought.to_numpy().sum()))
+    assert row['signals'] == len(signed) > 0
+    assert row['hit_rate'] == pytest.approx((signed > 0).mean(), abs=1e-12)
+    assert row['mean_forward_return'] == pytest.approx(signed.mean(), abs=1e-12)
+
+def test_sweep_through_shared_memory_matches_a_serial_run(sweep_close):
+    grid = {'bb_window': (10, 20), 'no_of_stds': (2.0, 2.5), 'rsi_window': (7, 14), 'rsi_thresholds': ((70, 30),)}
+    shared = parameter_sweep.sweep(sweep_close, grid=grid, max_workers=2)
+
+    parameter_sweep._shared.update(parameter_sweep.prepare_arrays(sweep_close))
+    try:
+        serial = pd.DataFrame([row for bb_window in grid['bb_window'] for rsi_window in grid['rsi_window']
+                               for row in parameter_sweep._evaluate((bb_window, rsi_window, grid['no_of_stds'],
+                                                                     grid['rsi_thresholds']))])
+    finally:
+        parameter_sweep._shared.clear()
+    keys = ['bb_window', 'no_of_stds', 'rsi_window', 'rsi_upper', 'rsi_lower']
+    shared = shared.drop(columns=['current', 'enough_signals']).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(shared, serial.sort_values(keys).reset_index(drop=True))
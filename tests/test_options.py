@@ -0,0 +1,102 @@
+import math
+import os
+import time
+
+import numpy as np
+import pytest
+
+from data_providers import SyntheticProvider, get_provider, set_provider
+from options_data_utils import fetch_option_greeks, fetch_options_data_for_debit_spread, moneyness_labels
+from options_pricing import black_scholes_price, greeks, implied_volatility, norm_cdf
+from spread_scanner import load_chain_fixture, scan_debit_spreads
+
+CHAIN_FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'synthetic_calls.csv')
+
+def test_norm_cdf_matches_erf():
+    grid = np.linspace(-10, 10, 2001)
+    expected = np.array([0.5 * math.erfc(-x / math.sqrt(2)) for x in grid])
+    assert np.max(np.abs(norm_cdf(grid) - expected)) <= 1e-14
+
+def test_black_scholes_matches_textbook_values():
+    # Hull, Options, Futures and Other Derivatives
+    assert black_scholes_price(42, 40, 0.5, 0.2, True, rate=0.1) == pytest.approx(4.76, abs=0.005)
+    assert black_scholes_price(42, 40, 0.5, 0.2, False, rate=0.1) == pytest.approx(0.81, abs=0.005)
+    reference = greeks(49, 50, 20 / 52, 0.2, True, rate=0.05)
+    assert reference['delta'] == pytest.approx(0.522, abs=0.0005)
+    assert reference['gamma'] == pytest.approx(0.066, abs=0.0005)
+    assert reference['vega'] == pytest.approx(0.121, abs=0.0005)
+    assert reference['theta'] == pytest.approx(-4.31 / 365, abs=0.0005)
+
+def test_put_call_parity_and_implied_volatility_round_trip(contracts=10_000, seed=7):
+    rng = np.random.default_rng(seed)
+    spot = 100.0
+    strike = rng.uniform(50, 150, contracts)
+    years = rng.uniform(2 / 365, 2.0, contracts)
+    volatility = rng.uniform(0.05, 1.5, contracts)
+    is_call = rng.random(contracts) < 0.5
+    calls = black_scholes_price(spot, strike, years, volatility, True)
+    puts = black_scholes_price(spot, strike, years, volatility, False)
+    assert np.max(np.abs(calls - puts - (spot - strike * np.exp(-0.045 * years)))) <= 1e-9
+
+    solved = implied_volatility(np.where(is_call, calls, puts), spot, strike, years, is_call)
+    # Deep in/out of the money contracts carry no volatility information at double precision
+    informative = greeks(spot, strike, years, volatility, is_call)['vega'] > 1e-4
+    assert not np.isnan(solved[informative]).any()
+    assert np.max(np.abs(solved - volatility)[informative]) <= 1e-6
+
+def _spreads_by_loop(chains, threshold, min_open_interest=1):
+    """Every debit spread of the chains, found one long/short pair at a time."""
+    spreads = {}
+    for expiration, calls in chains.items():
+        legs = [leg for leg in calls.sort_values('strike').itertuples()
+                if leg.bid > 0 and leg.ask > 0 and leg.openInterest >= min_open_interest
+                and (threshold is None or (leg.ask - leg.bid) / leg.ask * 100 <= threshold)]
+        for long in legs:
+            for short in legs:
+                debit = long.ask - short.bid
+                profit = short.strike - long.strike - debit
+                if short.strike > long.strike and debit > 0 and profit > 0:
+                    spreads[(expiration, long.strike, short.strike)] = profit / debit
+    return spreads
+
+@pytest.mark.parametrize('threshold', [None, 10.0, 20.0])
+def test_spread_scan_matches_pairwise_loop(threshold):
+    chains, _ = load_chain_fixture(CHAIN_FIXTURE)
+    expected = _spreads_by_loop(chains, threshold)
+    assert expected
+    everything = scan_debit_spreads(chains, bid_ask_spread_pct_threshold=threshold, top_n=len(expected) + 1)
+    actual = dict(zip(zip(everything['expirationDate'], everything['longStrike'], everything['shortStrike']),
+                      everything['rewardRiskRatio']))
+    assert actual.keys() == expected.keys()
+    assert np.allclose([actual[key] for key in expected], list(expected.values()))
+
+    top = scan_debit_spreads(chains, bid_ask_spread_pct_threshold=threshold)
+    assert np.allclose(top['rewardRiskRatio'], sorted(expected.values(), reverse=True)[:10])
+
+def test_spread_scan_takes_milliseconds():
+    chains, _ = load_chain_fixture(CHAIN_FIXTURE)
+    seconds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        scan_debit_spreads(chains, bid_ask_spread_pct_threshold=20.0)
+        seconds.append(time.perf_counter() - start)
+    assert min(seconds) < 0.05
+
+class _NoHistoryProvider(SyntheticProvider):
+    def history(self, ticker, period="1y", interval="1d", start=None):
+        raise ConnectionError("history endpoint down")
+
+def test_debit_spreads_survive_a_failed_price_lookup():
+    """Without a stock price the spreads are still returned, just without the moneyness column."""
+    original = get_provider()
+    set_provider(_NoHistoryProvider())
+    try:
+        spreads = fetch_options_data_for_debit_spread("NOPX", 'weeks', 4, 20.0)
+        contracts = fetch_option_greeks("NOPX", 'weeks', 4)
+    finally:
+        set_provider(original)
+    assert not spreads.empty and "" not in spreads.columns
+    assert contracts.empty
+
+    priced = fetch_options_data_for_debit_spread("PRCD", 'weeks', 4, 20.0)
+    assert priced[""].notna().any() and set(priced[""].dropna()) <= set(moneyness_labels.values())
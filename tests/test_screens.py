@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_aggregation
+import bar_store
+import correlation_engine
+import metrics_table
+import prewarm
+import sharded_screening
+import stock_data_utils
+import watch_mode
+from atr_calculator import calculate_ATR_series
+from data_providers import ReplayProvider, SyntheticProvider
+from indicator_engine import bollinger_bands, build_matrix, relative_strength_index
+from streaming_indicators import TOLERANCE
+
+def _extreme_from_scratch(provider, tickers):
+    """filter_extreme_stocks's list computed in batch over the bars a provider currently shows."""
+    histories = {ticker: provider.history(ticker, period="1y") for ticker in tickers}
+    close = build_matrix(histories, 'Close')
+    bands = bollinger_bands(close, latest_only=True)
+    rsi = relative_strength_index(close, latest_only=True)
+    price = close.ffill().iloc[-1]
+    extreme = (((price >= bands['upper_band']) & (rsi >= 70)) | ((price <= bands['lower_band']) & (rsi <= 30)))
+    return rsi[extreme].sort_values(ascending=False).head(10)
+
+def test_watch_mode_matches_batch_ranking(size=100, moving=5, cycles=12, steps_per_bar=3, seed=3):
+    """Each cycle a few tickers print part of a bar; only they may count as changed."""
+    rng = np.random.default_rng(seed)
+    source = SyntheticProvider()
+    tickers = [f"W{i:04d}" for i in range(size)]
+    recorded = {ticker: source.history(ticker, period="2y") for ticker in tickers}
+    replay = ReplayProvider(recorded, start=recorded[tickers[0]].index[-cycles], steps_per_bar=steps_per_bar)
+    watcher = watch_mode.Watcher('extreme', tickers=tickers, provider=replay)
+    watcher.start()
+    for cycle in range(cycles):
+        moved = replay.advance(list(rng.choice(tickers, moving, replace=False)))
+        update = watcher.poll()
+        assert set(update.changed) == set(moved), f"cycle {cycle}"
+        expected = _extreme_from_scratch(replay, tickers)
+        actual = pd.Series(dict(update.ranking), dtype=float)
+        assert list(actual.index) == list(expected.index), f"cycle {cycle}"
+        assert np.allclose(actual.to_numpy(), expected.to_numpy(), rtol=TOLERANCE)
+
+def test_rolling_correlation_matches_dataframe_corr(tickers=100, days=504, window=252, missing=0.02, seed=11):
+    """Slide over correlated returns with missing bars; clustering must recover the four sectors."""
+    rng = np.random.default_rng(seed)
+    sectors = np.arange(tickers) % 4
+    market = rng.normal(0, 0.01, days)
+    sector_moves = rng.normal(0, 0.01, (days, 4))
+    values = market[:, None] + sector_moves[:, sectors] + rng.normal(0, 0.006, (days, tickers))
+    values[rng.random(values.shape) < missing] = np.nan
+    columns = [f"C{i:03d}" for i in range(tickers)]
+    returns = pd.DataFrame(values, index=pd.bdate_range("2024-01-01", periods=days), columns=columns)
+
+    engine = correlation_engine.RollingCorrelation(columns, window=window).extend(returns.iloc[:window])
+    checkpoints = {window - 1, window + 3, days - 1}
+    for i in range(window - 1, days):
+        if i >= window:
+            engine.push(returns.index[i], values[i])
+        if i not in checkpoints:
+            continue
+        frame = returns.iloc[i + 1 - window:i + 1]
+        expected = frame.corr(min_periods=correlation_engine.MIN_PERIODS)
+        assert np.nanmax(np.abs(engine.correlation().to_numpy() - expected.to_numpy())) <= 1e-9
+        beta = engine.beta(columns[0])
+        for ticker in columns[1:6]:
+            pair = frame[[ticker, columns[0]]].dropna()
+            assert beta[ticker] == pytest.approx(pair.cov().iloc[0, 1] / pair[columns[0]].var(), abs=1e-9)
+
+    clusters = correlation_engine.cluster_by_correlation(engine.correlation(), threshold=0.5)
+    assert clusters.nunique() == 4 and len(set(zip(clusters, sectors))) == 4
+
+@pytest.fixture(scope='module')
+def metrics_histories():
+    provider = SyntheticProvider()
+    return {f"M{i:04d}": provider.history(f"M{i:04d}", period="1y") for i in range(1000)}
+
+def test_metrics_match_per_ticker_functions(metrics_histories):
+    frame = metrics_table.compute_metrics(metrics_histories)
+    for ticker in list(metrics_histories)[:10]:
+        hist = metrics_histories[ticker]
+        week = bar_aggregation.resample_bars(hist, '1wk').iloc[-1]
+        bands = stock_data_utils.calculate_bollinger_bands(hist['Close']).iloc[-1]
+        expected = {
+            'price': hist['Close'].iloc[-1],
+            'weekly_range': week['High'] - week['Low'],
+            'atr': calculate_ATR_series(hist.copy()).iloc[-1],
+            'rsi': stock_data_utils.calculate_rsi(hist['Close']).iloc[-1],
+            'upper_band': bands['upper_band'],
+            'lower_band': bands['lower_band'],
+            'hv': np.log(hist['Close'] / hist['Close'].shift(1)).std() * np.sqrt(252),
+        }
+        for column, value in expected.items():
+            assert abs(frame.at[ticker, column] - value) / max(abs(value), 1.0) <= TOLERANCE, f"{ticker} {column}"
+    # Recomputing a subset gives the same rows as the full build
+    subset = list(metrics_histories)[::7]
+    partial = metrics_table.compute_metrics({ticker: metrics_histories[ticker] for ticker in subset})
+    assert np.nanmax(np.abs(partial[metrics_table.METRICS].to_numpy()
+                            - frame.loc[subset, metrics_table.METRICS].to_numpy())) <= TOLERANCE
+
+def test_metrics_table_queries_match_pandas(metrics_histories, queries=200, seed=5):
+    frame = metrics_table.compute_metrics(metrics_histories)
+    table = metrics_table.MetricsTable(frame)
+    rng = np.random.default_rng(seed)
+    for _ in range(queries):
+        bounds = {}
+        for column in rng.choice(metrics_table.METRICS, 2, replace=False):
+            low, high = np.sort(rng.choice(frame[column].dropna().to_numpy(), 2))
+            bounds[column] = (low if rng.random() < 0.7 else None, high if rng.random() < 0.7 else None)
+        sort_by, ascending = rng.choice(metrics_table.METRICS), bool(rng.random() < 0.5)
+        mask = np.ones(len(frame), dtype=bool)
+        for column, (low, high) in bounds.items():
+            mask &= (frame[column] >= (low if low is not None else -np.inf)) & (frame[column] <= (high if high is not None else np.inf))
+        expected = frame[mask].dropna(subset=[sort_by]).sort_values(sort_by, ascending=ascending, kind='stable').head(10)
+        # Ties may come in either order; the sorted values must agree
+        actual = table.top(sort_by, 10, ascending=ascending, **bounds)
+        assert np.array_equal(actual[sort_by].to_numpy(), expected[sort_by].to_numpy()), (sort_by, bounds)
+        assert set(table.select(**bounds).index) == set(frame[mask].index), bounds
+
+def test_sharded_screening_matches_unsharded_screens(tmp_path, size=300, chunk_size=40):
+    options = {'min_move': 2.0, 'max_price': 300.0}
+    tickers = sharded_screening.synthetic_universe(size)
+    results, stats = sharded_screening.screen_universe(tickers, count=10, options=options, workers=2,
+                                                       chunk_size=chunk_size, directory=str(tmp_path),
+                                                       provider_name='synthetic')
+    assert stats['screened'] == size and not stats['errors']
+    store = bar_store.BarStore(str(tmp_path))
+    table = metrics_table.MetricsTable(metrics_table.compute_metrics({ticker: store.read(ticker) for ticker in tickers}))
+    for name, rows in results.items():
+        assert list(rows.index) == list(sharded_screening.SCREENS[name](table, 10, options).index), name
+
+def test_prewarm_publishes_the_metrics_table(tickers=tuple(f"PM{i:02d}" for i in range(20))):
+    prewarm.prewarm_universe(list(tickers), provider=SyntheticProvider())
+    provider = SyntheticProvider()
+    table = metrics_table.metrics_table(list(tickers), provider=provider)
+    assert provider.calls == 0, "the screens' table was not warm after prewarm"
+    expected = metrics_table.compute_metrics({ticker: bar_store.store.read(ticker) for ticker in tickers})
+    assert np.allclose(table.frame[metrics_table.METRICS].to_numpy(dtype=float),
+                       expected[metrics_table.METRICS].to_numpy(dtype=float), equal_nan=True)
+
+def test_weekly_range_drops_a_partial_first_week(monkeypatch, capsys):
+    # MLK day leaves Tuesday 2024-01-16 the first session of its week
+    assert stock_data_utils.opens_its_period(pd.Timestamp("2024-01-16"), '1wk')
+    assert not stock_data_utils.opens_its_period(pd.Timestamp("2024-01-17"), '1wk')
+    assert stock_data_utils.opens_its_period(pd.Timestamp("2024-01-22"), '1wk')
+
+    bars = SyntheticProvider().history("AAPL", start="2024-01-02")
+    for first, weeks in ((pd.Timestamp("2024-01-17"), ["2024-01-22", "2024-01-29"]),
+                         (pd.Timestamp("2024-01-16"), ["2024-01-15", "2024-01-22", "2024-01-29"])):
+        window = bars.loc[first:pd.Timestamp("2024-02-02")]
+        monkeypatch.setattr(stock_data_utils, 'get_bars', lambda *args, **kwargs: (window, None))
+        stock_data_utils.fetch_weekly_range("AAPL")
+        printed = [line.split()[0] for line in capsys.readouterr().out.splitlines() if line.startswith("2024-")]
+        assert printed == weeks
+
+    monkeypatch.setattr(stock_data_utils, 'get_bars', lambda *args, **kwargs: (None, "no data returned"))
+    stock_data_utils.fetch_weekly_range("AAPL")
+    assert "Failed to fetch weekly data for AAPL: no data returned" in capsys.readouterr().out
@@ -0,0 +1,185 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+from data_providers import SyntheticProvider
+
+class UpstreamServer(ThreadingHTTPServer):
+    """
+    Local stand-in for Yahoo Finance's JSON API, serving SyntheticProvider data.
+
+    It answers the chart, options, quoteSummary and getcrumb endpoints that AsyncYahooClient
+    uses, and can inject the failure modes the client must survive.
+
+    :param latency: Seconds added to every response.
+    :param throttle_every: Answer every n-th request with 429 (0 disables).
+    :param rate_limit: Answer 429 once more than this many requests arrive within a second (None disables).
+    :param retry_after: Retry-After seconds sent with each 429, or None to omit the header.
+    :param seed: Seed of the SyntheticProvider behind the responses.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, throttle_every=0, rate_limit=None, retry_after=None, seed=0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.provider = SyntheticProvider(seed=seed)
+        self.requests = 0
+        self.throttled = 0
+        self.unauthorized = 0
+        self.crumb = 'stand-in-crumb-0'
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients closing pooled keep-alive connections are expected, not errors
+        pass
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def expire_crumb(self):
+        """Issue a new crumb; requests still sending the old one are answered 401, like an expired session."""
+        with self._lock:
+            self.crumb = f"stand-in-crumb-{int(self.crumb.rsplit('-', 1)[1]) + 1}"
+
+    def should_throttle(self):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            self._recent.append(now)
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            throttle = (self.throttle_every and self.requests % self.throttle_every == 0) or \
+                       (self.rate_limit is not None and len(self._recent) > self.rate_limit)
+            if throttle:
+                self.throttled += 1
+            return throttle
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so the client's connection pool is exercised
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_throttle():
+            headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else {}
+            return self._send(429, b'Too Many Requests', 'text/plain', headers)
+
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        try:
+            if url.path == '/v1/test/getcrumb':
+                return self._send(200, server.crumb.encode(), 'text/plain')
+            if parts[:3] in (['v7', 'finance', 'options'], ['v10', 'finance', 'quoteSummary']) \
+                    and params.get('crumb') != server.crumb:
+                server.unauthorized += 1
+                return self._send(401, b'Invalid Crumb', 'text/plain')
+            if parts[:3] == ['v8', 'finance', 'chart'] and len(parts) == 4:
+                return self._json(_chart(server.provider, parts[3], params))
+            if parts[:3] == ['v7', 'finance', 'options'] and len(parts) == 4:
+                return self._json(_options(server.provider, parts[3], params))
+            if parts[:3] == ['v10', 'finance', 'quoteSummary'] and len(parts) == 4:
+                return self._json(_quote_summary(server.provider, parts[3]))
+        except Exception as e:
+            return self._send(500, str(e).encode(), 'text/plain')
+        return self._send(404, b'Not Found', 'text/plain')
+
+    def _json(self, payload):
+        self._send(200, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def _chart(provider, ticker, params):
+    start = pd.Timestamp(int(params.get('period1', 0)), unit='s')
+    interval = params.get('interval', '1d')
+    if interval == '1d':
+        hist = provider.history(ticker, start=start.strftime('%Y-%m-%d'))
+        # Yahoo stamps daily bars with the session open, in UTC seconds
+        opens = hist.index.tz_localize('America/New_York') + pd.Timedelta(hours=9, minutes=30)
+    else:
+        hist = provider.history(ticker, interval=interval, start=start.tz_localize('UTC').tz_convert('America/New_York').tz_localize(None))
+        opens = hist.index
+    return {'chart': {'result': [{
+        'meta': {'symbol': ticker, 'exchangeTimezoneName': 'America/New_York'},
+        'timestamp': ((opens - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).tolist() if len(hist) else None,
+        'indicators': {'quote': [{column.lower(): hist[column].tolist() for column in hist.columns}]},
+    }], 'error': None}}
+
+def _options(provider, ticker, params):
+    expirations = provider.options(ticker)
+    epochs = [int(pd.Timestamp(date, tz='UTC').timestamp()) for date in expirations]
+    date = params.get('date')
+    expiration = pd.Timestamp(int(date), unit='s').strftime('%Y-%m-%d') if date else expirations[0]
+    chain = provider.option_chain(ticker, expiration)
+    return {'optionChain': {'result': [{
+        'underlyingSymbol': ticker,
+        'expirationDates': epochs,
+        'quote': chain.underlying,
+        'options': [{
+            'expirationDate': int(pd.Timestamp(expiration, tz='UTC').timestamp()),
+            'calls': json.loads(chain.calls.to_json(orient='records')),
+            'puts': json.loads(chain.puts.to_json(orient='records')),
+        }],
+    }], 'error': None}}
+
+def _quote_summary(provider, ticker):
+    info = provider.info(ticker)
+    # Numbers come wrapped as {"raw": ..., "fmt": ...} like the real endpoint
+    module = {key: {'raw': value, 'fmt': f"{value:.2f}"} if isinstance(value, (int, float)) else value
+              for key, value in info.items()}
+    return {'quoteSummary': {'result': [{'financialData': module}], 'error': None}}
+
+@contextmanager
+def serve(**options):
+    """Run an UpstreamServer on a free local port for the duration of the block."""
+    server = UpstreamServer(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic market data over a Yahoo-compatible HTTP API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every n-th request with 429.")
+    parser.add_argument("--rate-limit", type=float, help="Answer 429 above this many requests per second.")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with each 429.")
+    args = parser.parse_args()
+
+    server = UpstreamServer(('127.0.0.1', args.port), latency=args.latency, throttle_every=args.throttle_every,
+                            rate_limit=args.rate_limit, retry_after=args.retry_after)
+    print(f"Serving synthetic market data on {server.url} "
+          f"(run the tool with MARKET_DATA_PROVIDER=async MARKET_DATA_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
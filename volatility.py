@@ -0,0 +1,168 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_histories
+from cache_utils import cache, universe_key
+from indicator_engine import build_matrix, latest_values
+from instrumentation import traced
+from stock_data_utils import load_universe
+
+TRADING_DAYS = 252
+WINDOWS = (10, 20, 60, 252)
+RANK_WINDOW = 20
+# Percentile ranks below / above these bounds mark a low / high volatility regime
+REGIME_BOUNDS = (0.2, 0.8)
+
+red_color_start = "\033[91m"
+green_color_start = "\033[92m"
+color_reset = "\033[0m"
+
+def _rolling_mean(values, window):
+    """Trailing means along axis 0, NaN unless all `window` observations are present."""
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        full = counts[window:] - counts[:-window] == window
+        out[window - 1:] = np.where(full, (sums[window:] - sums[:-window]) / window, np.nan)
+    return out
+
+def _rolling_variance(values, window):
+    """Trailing sample variances (ddof=1) along axis 0, from rolling means of x and x^2."""
+    mean = _rolling_mean(values, window)
+    return np.maximum(_rolling_mean(values * values, window) - mean * mean, 0.0) * window / (window - 1)
+
+def close_to_close(logs, window):
+    """Sample variance of close-to-close log returns, as calculate_hv computes it."""
+    return _rolling_variance(logs['close_close'], window)
+
+def parkinson(logs, window):
+    """Parkinson (1980): mean squared high-low range, which ignores gaps and drift."""
+    return _rolling_mean(logs['high_low'] ** 2, window) / (4 * np.log(2))
+
+def garman_klass(logs, window):
+    """Garman-Klass (1980): range plus open-to-close terms, ignoring overnight gaps."""
+    return _rolling_mean(0.5 * logs['high_low'] ** 2 - (2 * np.log(2) - 1) * logs['open_close'] ** 2, window)
+
+def yang_zhang(logs, window):
+    """Yang-Zhang (2000): overnight, open-to-close and Rogers-Satchell variances combined, robust to gaps and drift."""
+    k = 0.34 / (1.34 + (window + 1) / (window - 1))
+    rogers_satchell = _rolling_mean(logs['high_close'] * logs['high_open'] + logs['low_close'] * logs['low_open'], window)
+    return (_rolling_variance(logs['overnight'], window) + k * _rolling_variance(logs['open_close'], window)
+            + (1 - k) * rogers_satchell)
+
+ESTIMATORS = {'cc': close_to_close, 'parkinson': parkinson, 'gk': garman_klass, 'yz': yang_zhang}
+
+def _log_ratios(open_, high, low, close):
+    previous_close = np.full(close.shape, np.nan)
+    previous_close[1:] = close[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'close_close': np.log(close / previous_close),
+            'overnight': np.log(open_ / previous_close),
+            'open_close': np.log(close / open_),
+            'high_low': np.log(high / low),
+            'high_close': np.log(high / close),
+            'high_open': np.log(high / open_),
+            'low_close': np.log(low / close),
+            'low_open': np.log(low / open_),
+        }
+
+def rolling_volatility(open_, high, low, close, windows=WINDOWS, estimators=ESTIMATORS):
+    """
+    Annualized rolling volatility of every ticker for every estimator and window at once.
+
+    :param open_, high, low, close: Aligned (dates x tickers) DataFrames, e.g. from build_matrix.
+    :param windows: Window lengths in bars.
+    :param estimators: Dict of name to estimator, defaults to ESTIMATORS.
+    :return: A dict mapping (estimator name, window) to a (dates x tickers) DataFrame.
+    """
+    logs = _log_ratios(*(frame.to_numpy(dtype=float) for frame in (open_, high, low, close)))
+    return {(name, window): pd.DataFrame(np.sqrt(estimator(logs, window) * TRADING_DAYS),
+                                         index=close.index, columns=close.columns)
+            for name, estimator in estimators.items() for window in windows}
+
+def percentile_rank(series):
+    """Share of each ticker's own history of a (dates x tickers) series at or below its latest value."""
+    values = series.to_numpy(dtype=float)
+    latest = latest_values(series).to_numpy()
+    valid = ~np.isnan(values)
+    with np.errstate(invalid='ignore'):
+        at_or_below = (values <= latest[None, :]).sum(axis=0)
+        return pd.Series(np.where(valid.any(axis=0), at_or_below / valid.sum(axis=0), np.nan), index=series.columns)
+
+def volatility_table(histories, windows=WINDOWS, rank_window=RANK_WINDOW):
+    """
+    Cross-sectional volatility table of many tickers, computed from aligned OHLC arrays.
+
+    :param histories: Dict mapping ticker to its OHLCV DataFrame.
+    :param windows: Window lengths in bars; rank_window must be one of them.
+    :param rank_window: Window of the close-to-close HV used for the percentile rank and regime.
+    :return: A DataFrame indexed by ticker with '<estimator>_<window>' columns of annualized
+             volatility, a 'rank_<window>' percentile rank per window (close-to-close HV against
+             the ticker's own history) and a 'regime' of low, normal or high.
+    """
+    matrices = [build_matrix(histories, column) for column in ('Open', 'High', 'Low', 'Close')]
+    series = rolling_volatility(*matrices, windows=windows)
+    table = pd.DataFrame({f"{name}_{window}": latest_values(frame) for (name, window), frame in series.items()})
+    for window in windows:
+        table[f"rank_{window}"] = percentile_rank(series[('cc', window)])
+    low, high = REGIME_BOUNDS
+    rank = table[f"rank_{rank_window}"]
+    table['regime'] = np.where(rank.isna(), None, np.where(rank < low, 'low', np.where(rank > high, 'high', 'normal')))
+    table.index.name = 'Symbol'
+    return table
+
+@traced('compute')
+def universe_volatility(tickers=None, period='2y', provider=None, max_workers=8):
+    """
+    volatility_table() for the screener universe (or `tickers`), cached until the next market close.
+
+    Two years of history give the 252-day windows a year of their own values to be ranked against.
+    """
+    if tickers is None:
+        tickers = load_universe()['Symbol'].tolist()
+    cache_key = f"{period}_{universe_key(tickers)}"
+    table = cache.get('volatility', cache_key)
+    if table is not None:
+        return table
+
+    histories = {ticker: hist for ticker, (hist, error) in
+                 get_histories(tickers, period=period, provider=provider, max_workers=max_workers).items()
+                 if hist is not None and not hist.empty}
+    if not histories:
+        return pd.DataFrame()
+    table = volatility_table(histories)
+    cache.set('volatility', cache_key, table, expire='session')
+    return table
+
+def print_volatility_table(table, sort_by=f"rank_{RANK_WINDOW}", top=None):
+    colors = {'low': green_color_start, 'high': red_color_start}
+    columns = [column for column in table.columns if column.endswith(f"_{RANK_WINDOW}")] + ['regime']
+    ranked = table.sort_values(sort_by, ascending=False)
+    if top is not None:
+        ranked = ranked.head(top)
+    print(f"\nVolatility by estimator ({RANK_WINDOW}-day, annualized) ranked by {sort_by}:\n")
+    lines = ranked[columns].to_string(float_format=lambda v: f"{v:.2%}").splitlines()
+    header = len(lines) - len(ranked)
+    print("\n".join(lines[:header]))
+    for line, regime in zip(lines[header:], ranked['regime']):
+        print(f"{colors.get(regime, '')}{line}{color_reset if regime in colors else ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the universe by historical volatility regime.")
+    parser.add_argument("--period", default="2y", help="History window, e.g. 2y.")
+    parser.add_argument("--sort-by", default=f"rank_{RANK_WINDOW}", help="Column to rank by, e.g. yz_20 or rank_60.")
+    parser.add_argument("--top", type=int, help="Rows to print.")
+    parser.add_argument("tickers", nargs="*", help="Symbols to rank; defaults to the screener universe.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = universe_volatility(args.tickers or None, period=args.period)
+    print_volatility_table(table, sort_by=args.sort_by, top=args.top)
+    print(f"\nComputed {table.shape[1]} columns for {len(table)} tickers in {time.perf_counter() - start:.2f}s")
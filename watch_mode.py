@@ -0,0 +1,330 @@
+import argparse
+import heapq
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_histories
+from data_providers import ReplayProvider, SyntheticProvider, get_provider
+from instrumentation import span, traced
+from stock_data_utils import load_universe
+from streaming_indicators import IndicatorState
+
+red_color_start = "\033[91m"
+green_color_start = "\033[92m"
+color_reset = "\033[0m"
+
+WatchUpdate = namedtuple('WatchUpdate', ['changed', 'entered', 'left', 'ranking', 'fetch_seconds', 'rank_seconds'])
+
+class RankedSet:
+    """
+    Top-N ranking of scored keys under frequent updates: a max-heap with lazy deletion.
+
+    update() and discard() cost O(log n) and never rebuild the heap. Superseded entries
+    stay in the heap and are dropped when they reach the top, so top(n) costs O(n log n)
+    plus the stale entries it skips. The heap is compacted once stale entries outnumber live ones.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def update(self, key, score):
+        if self._scores.get(key) == score:
+            return
+        self._scores[key] = score
+        heapq.heappush(self._heap, (-score, key))
+        self._compact()
+
+    def discard(self, key):
+        if self._scores.pop(key, None) is not None:
+            self._compact()
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._scores) + 16:
+            self._heap = [(-score, key) for key, score in self._scores.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, n):
+        """The n highest-scoring (key, score) pairs, best first."""
+        found, kept, taken = [], [], set()
+        while self._heap and len(found) < n:
+            entry = heapq.heappop(self._heap)
+            score, key = -entry[0], entry[1]
+            if self._scores.get(key) != score or key in taken:
+                continue  # Superseded (dropped for good), or a second copy of a live entry
+            taken.add(key)
+            found.append((key, score))
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self._heap, entry)
+        return found
+
+class TickerWatch:
+    """
+    Streaming indicators of one ticker, with its latest bar kept apart from the committed ones.
+
+    The latest bar may still be printing, so it is never pushed into the committed state. A
+    new poll either revises it or, once newer bars arrive, commits it.
+    """
+
+    def __init__(self, hist):
+        self.state = IndicatorState()
+        self.live = None  # (date, high, low, close) of the latest bar
+        self.week = None  # Monday of the live bar's week
+        self.week_high = float('-inf')  # Over the committed bars of that week
+        self.week_low = float('inf')
+        self.values = None
+        self.apply(hist)
+
+    @property
+    def last_date(self):
+        return self.live[0] if self.live is not None else None
+
+    def apply(self, bars):
+        """Apply an OHLC DataFrame of bars; returns True if anything changed."""
+        return self.apply_rows(list(zip(bars.index, bars['High'].tolist(), bars['Low'].tolist(), bars['Close'].tolist())))
+
+    def apply_rows(self, rows):
+        """Apply (date, high, low, close) bars dated from the live bar on; returns True if anything changed."""
+        if self.live is not None:
+            rows = [row for row in rows if row[0] >= self.live[0]]
+        if not rows or (len(rows) == 1 and rows[0] == self.live):
+            return False
+
+        # Every bar but the newest is final now
+        final = rows[:-1]
+        if self.live is not None and rows[0][0] != self.live[0]:
+            final.insert(0, self.live)  # The provider no longer lists the old live bar; keep it as it was
+        for row in final:
+            self._commit(row)
+        self.live = rows[-1]
+        self._start_week(self.live[0])
+        self.values = self._evaluate()
+        return True
+
+    def _start_week(self, date):
+        monday = (date - pd.Timedelta(days=date.weekday())).normalize()
+        if monday != self.week:
+            self.week = monday
+            self.week_high, self.week_low = float('-inf'), float('inf')
+
+    def _commit(self, row):
+        date, high, low, close = row
+        self._start_week(date)
+        self.week_high = max(self.week_high, high)
+        self.week_low = min(self.week_low, low)
+        self.state.push(date, high, low, close)
+
+    def _evaluate(self):
+        live = IndicatorState.from_dict(self.state.to_dict())
+        date, high, low, close = self.live
+        live.push(date, high, low, close)
+        latest = live.latest()
+        return {
+            'price': close,
+            'rsi': latest['RSI'],
+            'upper_band': latest['Upper Band'],
+            'lower_band': latest['Lower Band'],
+            'weekly_range': max(self.week_high, high) - min(self.week_low, low),
+        }
+
+def _day(date):
+    date = pd.Timestamp(date)
+    return (date.tz_localize(None) if date.tz is not None else date).normalize().to_datetime64()
+
+def _is_extreme(values, min_move, max_price):
+    # The filter_extreme_stocks conditions
+    if values['rsi'] is None or values['upper_band'] is None:
+        return False
+    return (values['price'] >= values['upper_band'] and values['rsi'] >= 70) or \
+           (values['price'] <= values['lower_band'] and values['rsi'] <= 30)
+
+def _is_volatile(values, min_move, max_price):
+    # The get_top_volatile_stocks conditions, on the live bar
+    return values['weekly_range'] >= min_move and values['price'] <= max_price
+
+# Screen name -> (ranking key, qualifying condition)
+SCREENS = {'extreme': ('rsi', _is_extreme), 'volatile': ('weekly_range', _is_volatile)}
+
+class Watcher:
+    """
+    Keep a screen's top-N list current by polling for new bars.
+
+    Each poll asks the provider for every ticker's latest bar in one batch (latest_bars)
+    and compares it with the watched live bars in a single array comparison. A revised live
+    bar is applied directly. Tickers with a newer bar have the bars since their live bar
+    fetched. Only changed tickers update their indicators and heap entries, so a cycle
+    costs little more for a larger universe.
+
+    :param screen: 'extreme' (filter_extreme_stocks, ranked by RSI) or 'volatile'
+                   (get_top_volatile_stocks, ranked by this week's high-low range).
+    :param tickers: Symbols to watch; defaults to the screener universe.
+    :param top: Length of the list.
+    :param min_move, max_price: The volatile screen's thresholds.
+    :param provider: Read directly, bypassing the bar store, e.g. a ReplayProvider. By
+                     default the initial year comes from the bar store and polls go to get_provider().
+    """
+
+    def __init__(self, screen='extreme', tickers=None, top=10, min_move=0.0, max_price=float('inf'),
+                 provider=None, max_workers=8):
+        self.key, self.qualifies = SCREENS[screen]
+        self.screen = screen
+        self.tickers = tickers if tickers is not None else load_universe()['Symbol'].tolist()
+        self.top = top
+        self.min_move = min_move
+        self.max_price = max_price
+        self.provider = provider
+        self.max_workers = max_workers
+        self.watches = {}
+        self.ranked = RankedSet()
+        self.ranking = []
+
+    @traced('fetch', 'watch.seed')
+    def start(self):
+        """Seed every ticker from a year of bars; returns the initial ranking."""
+        if self.provider is None:
+            histories = {ticker: hist for ticker, (hist, error) in
+                         get_histories(self.tickers, period="1y", max_workers=self.max_workers).items() if hist is not None}
+        else:
+            histories = self._fetch({ticker: None for ticker in self.tickers})
+        for ticker, hist in histories.items():
+            if not hist.empty:
+                self.watches[ticker] = TickerWatch(hist)
+                self._rank(ticker)
+        # Every watched ticker's live bar as arrays, so a poll finds the changed ones in one comparison
+        self._order = list(self.watches)
+        self._positions = {ticker: i for i, ticker in enumerate(self._order)}
+        self._live_dates = np.array([_day(watch.live[0]) for watch in self.watches.values()], dtype='datetime64[ns]')
+        self._live_values = np.array([watch.live[1:] for watch in self.watches.values()], dtype=float).reshape(-1, 3)
+        self.ranking = self.ranked.top(self.top)
+        return self.ranking
+
+    def _fetch(self, starts):
+        provider = self.provider or get_provider()
+
+        def fetch(ticker):
+            start = starts[ticker]
+            try:
+                return provider.history(ticker, period="1y") if start is None else provider.history(ticker, start=start)
+            except Exception as e:
+                print(f"Error fetching data for {ticker}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(starts, executor.map(fetch, starts)))
+        return {ticker: hist for ticker, hist in results.items() if hist is not None}
+
+    def _rank(self, ticker):
+        values = self.watches[ticker].values
+        if values is not None and self.qualifies(values, self.min_move, self.max_price):
+            self.ranked.update(ticker, values[self.key])
+        else:
+            self.ranked.discard(ticker)
+
+    @traced('compute', 'watch.poll')
+    def poll(self):
+        """Fetch the latest bars, update changed tickers and re-rank; returns a WatchUpdate."""
+        started = time.perf_counter()
+        provider = self.provider or get_provider()
+        with span('watch.latest_bars', 'fetch'):
+            latest = provider.latest_bars(self._order).reindex(self._order)
+        dates = pd.DatetimeIndex(latest['Date'])
+        dates = (dates.tz_localize(None) if dates.tz is not None else dates).normalize().to_numpy(dtype='datetime64[ns]')
+        values = latest[['High', 'Low', 'Close']].to_numpy(dtype=float)
+        present = ~np.isnat(dates)
+        with np.errstate(invalid='ignore'):
+            revised = present & (dates == self._live_dates) & (values != self._live_values).any(axis=1)
+        advanced = present & (dates > self._live_dates)
+
+        # A ticker past its live bar may have skipped bars between polls, so read them all
+        advanced_tickers = [self._order[i] for i in np.flatnonzero(advanced)]
+        histories = self._fetch({ticker: self.watches[ticker].last_date for ticker in advanced_tickers})
+        fetched = time.perf_counter()
+
+        changed = []
+        for i in np.flatnonzero(revised):
+            watch = self.watches[self._order[i]]
+            if watch.apply_rows([(watch.live[0], *values[i])]):
+                changed.append(self._order[i])
+        changed += [ticker for ticker, hist in histories.items() if self.watches[ticker].apply(hist)]
+        for ticker in changed:
+            watch = self.watches[ticker]
+            self._live_dates[self._positions[ticker]] = _day(watch.live[0])
+            self._live_values[self._positions[ticker]] = watch.live[1:]
+            self._rank(ticker)
+
+        previous = {ticker for ticker, _ in self.ranking}
+        self.ranking = self.ranked.top(self.top)
+        current = {ticker for ticker, _ in self.ranking}
+        return WatchUpdate(changed=changed,
+                           entered=[(ticker, score) for ticker, score in self.ranking if ticker not in previous],
+                           left=sorted(previous - current),
+                           ranking=self.ranking,
+                           fetch_seconds=fetched - started,
+                           rank_seconds=time.perf_counter() - fetched)
+
+    def describe(self, ticker):
+        values = self.watches[ticker].values
+        rsi = f"{values['rsi']:.2f}" if values['rsi'] is not None else "N/A"
+        return (f"Ticker: {ticker}, Latest Price: {values['price']:.2f}, RSI: {rsi}, "
+                f"Weekly Range: {values['weekly_range']:.2f}")
+
+    def run(self, interval=60.0, cycles=None, on_cycle=None):
+        """
+        Poll every `interval` seconds until interrupted (or for `cycles` polls), printing only
+        the entries that enter or leave the list.
+
+        :param on_cycle: Called before each poll, e.g. to advance a ReplayProvider.
+        """
+        print(f"\nWatching {len(self.watches)} tickers ({self.screen}, top {self.top}); press Ctrl+C to stop.\n")
+        for ticker, _ in self.ranking:
+            print(f"{green_color_start}{self.describe(ticker)}{color_reset}")
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                time.sleep(interval)
+                if on_cycle is not None:
+                    on_cycle()
+                update = self.poll()
+                cycle += 1
+                for ticker, _ in update.entered:
+                    print(f"{green_color_start}+ {self.describe(ticker)}{color_reset}")
+                for ticker in update.left:
+                    print(f"{red_color_start}- {self.describe(ticker)}{color_reset}")
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+        return cycle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a screen and print the tickers entering or leaving its list.")
+    parser.add_argument("screen", choices=sorted(SCREENS))
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls.")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--min-move", type=float, default=0.0, help="Smallest weekly range of the volatile screen.")
+    parser.add_argument("--max-price", type=float, default=float('inf'), help="Highest price of the volatile screen.")
+    parser.add_argument("--replay", type=int, metavar="BARS",
+                        help="Replay the last BARS synthetic bars instead of polling the live provider.")
+    parser.add_argument("--steps-per-bar", type=int, default=4, help="Steps each replayed bar takes to print.")
+    args = parser.parse_args()
+
+    provider = None
+    on_cycle = None
+    tickers = load_universe()['Symbol'].tolist()
+    if args.replay:
+        recorded = ReplayProvider.record(SyntheticProvider(), tickers, period="2y").recorded
+        start = min(bars.index[-args.replay] for bars in recorded.values())
+        provider = ReplayProvider(recorded, start=start, steps_per_bar=args.steps_per_bar)
+        on_cycle = provider.advance
+
+    watcher = Watcher(args.screen, tickers=tickers, top=args.top, min_move=args.min_move,
+                      max_price=args.max_price, provider=provider)
+    watcher.start()
+    cycles = args.replay * args.steps_per_bar if args.replay else None
+    watcher.run(interval=args.interval, cycles=cycles, on_cycle=on_cycle)